@@ -1,9 +1,145 @@
+import itertools
+import math
 import statistics
+import threading
+from array import array
+from collections import OrderedDict
+
+from core.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Nombre de prix moyens conservés par item
+HISTORY_SIZE = 32
+# Nombre d'observations avant de pouvoir juger un prix par rapport à l'historique
+MIN_HISTORY = 5
+# Largeur de bande en nombre de MAD (échelle log), et demi-largeur minimale (log(1.5) ≈ ±50%)
+MAD_BAND_K = 4.0
+MIN_LOG_BAND = math.log(1.5)
+# Poids des moyennes glissantes exponentielles
+EW_ALPHA = 0.2
+# 1.4826 * MAD ≈ écart-type pour une loi normale
+MAD_SCALE = 1.4826
+# Prix bruts ignorés (souvent MAX_INT = bruit)
+NOISE_PRICE = 2000000000
+# Diviseurs des lots x1, x10, x100, x1000
+LOT_SIZES = (1, 10, 100, 1000)
+
+FILTER_PRICES = metrics.counter("tracker_filter_prices_total", "Prix unitaires par étape du filtre (unit, valid, kept)", ("stage",))
+ASSESSMENTS = metrics.counter("tracker_filter_assessments_total", "Prix moyens jugés par rapport à l'historique", ("result",))
+
+
+class PriceHistory:
+    """
+    Historique compact d'un item : tampon circulaire (array de doubles) des derniers
+    prix moyens et estimateurs glissants en échelle logarithmique (les prix couvrent
+    plusieurs ordres de grandeur). Toutes les mises à jour sont en O(1).
+    """
+    __slots__ = ("prices", "head", "count", "ew_mean", "ew_median", "ew_mad")
+
+    def __init__(self):
+        self.prices = array("d", bytes(8 * HISTORY_SIZE))
+        self.head = 0
+        self.count = 0
+        self.ew_mean = 0.0   # Moyenne glissante de log(prix)
+        self.ew_median = 0.0 # Médiane glissante de log(prix) (approximation stochastique)
+        self.ew_mad = 0.0    # Déviation absolue glissante autour de la médiane
+
+    def update(self, price):
+        x = math.log(price)
+        self.prices[self.head] = price
+        self.head = (self.head + 1) % HISTORY_SIZE
+
+        if self.count == 0:
+            self.ew_mean = x
+            self.ew_median = x
+            self.ew_mad = 0.0
+        else:
+            self.ew_mean += EW_ALPHA * (x - self.ew_mean)
+            deviation = x - self.ew_median
+            # La médiane avance d'un pas proportionnel à la dispersion, dans le sens de l'écart
+            step = EW_ALPHA * max(self.ew_mad, MIN_LOG_BAND / MAD_BAND_K)
+            self.ew_median += min(step, abs(deviation)) * (1 if deviation > 0 else -1)
+            self.ew_mad += EW_ALPHA * (abs(deviation) - self.ew_mad)
+        self.count += 1
+
+    def band(self):
+        """Bornes (basse, haute) en prix, autour de la médiane glissante."""
+        half_width = max(MAD_BAND_K * MAD_SCALE * self.ew_mad, MIN_LOG_BAND)
+        return math.exp(self.ew_median - half_width), math.exp(self.ew_median + half_width)
+
+    def recent(self):
+        """Derniers prix enregistrés, du plus ancien au plus récent."""
+        n = min(self.count, HISTORY_SIZE)
+        start = (self.head - n) % HISTORY_SIZE
+        return [self.prices[(start + i) % HISTORY_SIZE] for i in range(n)]
+
+
+class PriceStatsStore:
+    """
+    Statistiques glissantes par (server, gid), bornées en nombre d'items
+    (les moins récemment vus sont évincés). Environ 650 octets par item.
+    """
+    def __init__(self, max_items=50000):
+        self.max_items = max_items
+        self.histories = OrderedDict()
+        self.lock = threading.Lock()
+
+    def assess(self, server, gid, price):
+        """
+        Compare un prix moyen à l'historique de l'item, puis l'enregistre.
+        Retourne un dict {"suspicious", "expected", "lower", "upper", "samples"}.
+        Un prix suspect est tout de même enregistré : un vrai changement de marché
+        finit ainsi par déplacer la bande au lieu d'être rejeté indéfiniment.
+        """
+        key = (server, gid)
+        with self.lock:
+            history = self.histories.get(key)
+            if history is None:
+                history = PriceHistory()
+                self.histories[key] = history
+                if len(self.histories) > self.max_items:
+                    self.histories.popitem(last=False)
+            else:
+                self.histories.move_to_end(key)
+
+            result = {"suspicious": False, "expected": None, "lower": None, "upper": None, "samples": history.count}
+            if price <= 0:
+                return result
+
+            if history.count >= MIN_HISTORY:
+                lower, upper = history.band()
+                result.update(
+                    suspicious=not (lower <= price <= upper),
+                    expected=math.exp(history.ew_median),
+                    lower=lower,
+                    upper=upper
+                )
+            history.update(price)
+            return result
+
+    def get(self, server, gid):
+        with self.lock:
+            return self.histories.get((server, gid))
+
+    def __len__(self):
+        return len(self.histories)
+
 
 class AnomalyFilter:
     def __init__(self, min_price=0, max_price=1000000000):
         self.min_price = min_price
         self.max_price = max_price
+        self.history = PriceStatsStore()
+
+    def assess(self, server, gid, average):
+        """Juge un prix moyen par rapport à l'historique récent de l'item (voir PriceStatsStore.assess)."""
+        result = self.history.assess(server, gid, average)
+        ASSESSMENTS.inc("suspicious" if result["suspicious"] else "normal")
+        return result
 
     def filter_prices(self, prices):
         """
@@ -36,7 +172,7 @@ class AnomalyFilter:
         # Also filter out MAX_INT values (2147483647) which are often noise
         valid_prices = [
             p for p in unit_prices 
-            if self.min_price <= p <= self.max_price and p < 2000000000
+            if self.min_price <= p <= self.max_price and p < NOISE_PRICE
         ]
         
         if not valid_prices:
@@ -65,6 +201,11 @@ class AnomalyFilter:
         if not final_prices:
             return [], 0
 
+        if metrics.enabled:
+            FILTER_PRICES.inc("unit", amount=len(unit_prices))
+            FILTER_PRICES.inc("valid", amount=len(valid_prices))
+            FILTER_PRICES.inc("kept", amount=len(final_prices))
+
         average = sum(final_prices) / len(final_prices)
         
         # Round to 2 decimal places for unit prices < 1, otherwise integer is fine?
@@ -76,3 +217,116 @@ class AnomalyFilter:
         # But for now let's stick to fixing the outlier issue.
         
         return final_prices, round(average, 2) if average < 10 else round(average)
+
+    def filter_prices_many(self, price_lists):
+        """
+        Applique filter_prices à une série de snapshots (rejeu de session, scan de catégorie).
+        Utilise le chemin vectorisé si NumPy est disponible. Retourne [(filtered_prices, average), ...].
+        """
+        if np is None:
+            return [self.filter_prices(prices) for prices in price_lists]
+
+        flat, offsets = pack_price_lists(price_lists)
+        values, value_offsets, averages = self.filter_prices_batch(flat, offsets)
+        values = values.tolist()
+        bounds = value_offsets.tolist()
+        return [(values[bounds[i]:bounds[i + 1]], averages[i]) for i in range(len(averages))]
+
+    def filter_prices_batch(self, flat, offsets):
+        """
+        Version vectorisée de filter_prices sur N snapshots à la fois.
+
+        `flat` contient les prix bruts de tous les snapshots bout à bout et `offsets`
+        (longueur N + 1) leurs bornes, comme produit par pack_price_lists().
+        Retourne (valeurs filtrées à plat, offsets des valeurs, moyennes) avec des
+        résultats identiques à filter_prices : mêmes valeurs, même ordre, et des
+        sommes effectuées dans le même ordre que sum() pour des moyennes identiques au bit près.
+        """
+        if np is None:
+            raise ImportError("NumPy est requis pour filter_prices_batch")
+
+        flat = np.asarray(flat, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        n_items = len(offsets) - 1
+        items = np.arange(n_items)
+
+        # 1. Alignement de chaque snapshot sur un multiple de 4 (x1, x10, x100, x1000), complété par des 0
+        lengths = np.diff(offsets)
+        padded_lengths = (lengths + 3) // 4 * 4
+        padded_offsets = np.zeros(n_items + 1, dtype=np.int64)
+        np.cumsum(padded_lengths, out=padded_offsets[1:])
+        raw_item = np.repeat(items, lengths)
+        padded = np.zeros(padded_offsets[-1])
+        padded[np.arange(len(flat)) - offsets[raw_item] + padded_offsets[raw_item]] = flat
+
+        # Conversion en prix unitaires
+        unit = padded / np.tile(np.array(LOT_SIZES, dtype=np.float64), len(padded) // 4)
+        unit_item = np.repeat(items, padded_lengths)
+
+        # 2. Anomalies absolues
+        valid = (padded > 0) & (unit >= self.min_price) & (unit <= self.max_price) & (unit < NOISE_PRICE)
+        values = unit[valid]
+        value_item = unit_item[valid]
+        counts = np.bincount(value_item, minlength=n_items)
+        starts = np.zeros(n_items + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+
+        # 3. Anomalies statistiques : médiane par snapshot (tri segmenté, value_item est déjà trié)
+        by_value = np.argsort(values)
+        sorted_values = values[by_value[np.argsort(value_item[by_value], kind="stable")]]
+        has_values = counts > 0
+        lo = np.where(has_values, starts[:-1] + (counts - 1) // 2, 0)
+        hi = np.where(has_values, starts[:-1] + counts // 2, 0)
+        if len(sorted_values):
+            median = (sorted_values[lo] + sorted_values[hi]) / 2
+            smallest = sorted_values[np.where(has_values, starts[:-1], 0)]
+            largest = sorted_values[np.where(has_values, starts[1:] - 1, 0)]
+        else:
+            median = smallest = largest = np.zeros(n_items)
+
+        count_of = counts[value_item]
+        in_band = (values >= (median / 5)[value_item]) & (values <= (median * 5)[value_item])
+        # Deux prix très éloignés (x10) : on garde le plus petit
+        disparity = (counts == 2) & (smallest > 0) & (largest > smallest * 10)
+        keep_pair = ~disparity[value_item] | (values == smallest[value_item])
+        keep = np.where(count_of >= 3, in_band, np.where(count_of == 2, keep_pair, True))
+
+        final_values = values[keep]
+        final_item = value_item[keep]
+        final_counts = np.bincount(final_item, minlength=n_items)
+        final_offsets = np.zeros(n_items + 1, dtype=np.int64)
+        np.cumsum(final_counts, out=final_offsets[1:])
+
+        # Sommes séquentielles (même ordre que sum()) : une passe vectorisée par rang dans le snapshot,
+        # sur les snapshots triés par nombre de valeurs décroissant (les actifs sont toujours en tête)
+        by_count = np.argsort(-final_counts, kind="stable")
+        sorted_counts = final_counts[by_count]
+        sorted_starts = final_offsets[:-1][by_count]
+        sums = np.zeros(n_items)
+        partial = np.zeros(n_items)
+        max_count = int(sorted_counts[0]) if n_items else 0
+        for k in range(max_count):
+            active = int(np.count_nonzero(sorted_counts > k))
+            partial[:active] += final_values[sorted_starts[:active] + k]
+        sums[by_count] = partial
+
+        averages = []
+        for total, count in zip(sums.tolist(), final_counts.tolist()):
+            if count == 0:
+                averages.append(0)
+            else:
+                average = total / count
+                averages.append(round(average, 2) if average < 10 else round(average))
+
+        return final_values, final_offsets, averages
+
+
+def pack_price_lists(price_lists):
+    """Concatène des listes de prix brutes en (tableau à plat, offsets) pour filter_prices_batch."""
+    if np is None:
+        raise ImportError("NumPy est requis pour pack_price_lists")
+    lengths = np.fromiter((len(prices) for prices in price_lists), dtype=np.int64, count=len(price_lists))
+    offsets = np.zeros(len(price_lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.fromiter(itertools.chain.from_iterable(price_lists), dtype=np.float64, count=int(offsets[-1]))
+    return flat, offsets
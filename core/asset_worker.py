@@ -1,50 +1,74 @@
+import asyncio
 import threading
-import time
 import requests
 import io
 from utils.config import config_manager
+from network.async_core import network_core, LANES
+from utils.logger import get_logger
+from core.metrics import metrics
 
-class AssetWorker(threading.Thread):
+logger = get_logger("asset_worker")
+
+ICONS = metrics.counter("tracker_asset_worker_icons_total", "Images d'items traitées, par issue", ("outcome",))
+ICON_SECONDS = metrics.histogram("tracker_asset_worker_item_seconds", "Durée de traitement d'une image (lecture + envoi)")
+QUEUE_SIZE = metrics.gauge("tracker_asset_worker_queue_size", "Images en attente d'envoi")
+
+class AssetWorker:
+    """
+    Envoi des images d'items manquantes au backend. Les consommateurs sont des
+    coroutines hébergées par network_core (voie "assets") : aucun thread dédié,
+    et réveil immédiat quand un GID est ajouté au lieu d'un polling.
+    """
     def __init__(self, game_data_instance):
-        super().__init__()
         self.game_data = game_data_instance
         self.queue = [] # List of GIDs to process
         self.lock = threading.Lock()
         self.running = False
-        self.daemon = True
+        self.wakeup = None
         self.processed_gids = set() # To avoid re-queueing same GID in same session
+        QUEUE_SIZE.set_function(self.get_queue_size)
 
     def add_to_queue(self, gid):
         with self.lock:
-            if gid not in self.processed_gids:
-                if gid not in self.queue:
-                    self.queue.append(gid)
-                    print(f"[AssetWorker] Item {gid} ajouté à la file d'upload d'images.")
+            if gid in self.processed_gids or gid in self.queue:
+                return
+            self.queue.append(gid)
+        logger.info("[AssetWorker] Item %s ajouté à la file d'upload d'images.", gid)
+        if self.wakeup is not None:
+            network_core.call_soon(self.wakeup.set)
 
     def get_queue_size(self):
         with self.lock:
             return len(self.queue)
 
+    def start(self):
+        self.running = True
+        network_core.submit(self._run())
+
     def stop(self):
         self.running = False
+        if self.wakeup is not None:
+            network_core.call_soon(self.wakeup.set)
 
-    def run(self):
-        self.running = True
-        print("[AssetWorker] Service d'upload d'assets démarré.")
-        
+    async def _run(self):
+        self.wakeup = asyncio.Event()
+        logger.info("[AssetWorker] Service d'upload d'assets démarré.")
+        await asyncio.gather(*(self._consume() for _ in range(LANES["assets"])))
+
+    async def _consume(self):
         while self.running:
-            gid_to_process = None
-            
+            self.wakeup.clear()
             with self.lock:
-                if self.queue:
-                    gid_to_process = self.queue.pop(0)
-            
-            if gid_to_process:
-                self.process_item(gid_to_process)
-                # Small delay to be nice to the API/CPU
-                time.sleep(0.5)
-            else:
-                time.sleep(1)
+                gid_to_process = self.queue.pop(0) if self.queue else None
+
+            if gid_to_process is None:
+                await self.wakeup.wait()
+                continue
+
+            with ICON_SECONDS.time():
+                await network_core.blocking("assets", self.process_item, gid_to_process)
+            # Small delay to be nice to the API/CPU
+            await asyncio.sleep(0.5)
 
     def process_item(self, gid):
         try:
@@ -53,7 +77,8 @@ class AssetWorker(threading.Thread):
             image_data = self.game_data.get_item_icon_data(gid)
             
             if not image_data:
-                print(f"[AssetWorker] Impossible de récupérer l'image pour {gid}. Abandon.")
+                logger.error("[AssetWorker] Impossible de récupérer l'image pour %s. Abandon.", gid)
+                ICONS.inc("missing")
                 with self.lock:
                     self.processed_gids.add(gid) # Mark as processed to avoid infinite retry loop
                 return
@@ -66,7 +91,7 @@ class AssetWorker(threading.Thread):
                 self.processed_gids.add(gid)
                 
         except Exception as e:
-            print(f"[AssetWorker] Erreur lors du traitement de {gid}: {e}")
+            logger.error("[AssetWorker] Erreur lors du traitement de %s: %s", gid, e)
 
     def upload_icon(self, gid, image_data):
         api_url = config_manager.get("api_url")
@@ -89,15 +114,15 @@ class AssetWorker(threading.Thread):
             response = requests.post(upload_url, data=data, files=files, timeout=30)
             
             if response.status_code == 200:
-                print(f"[AssetWorker] Image {gid} uploadée avec succès.")
+                logger.info("[AssetWorker] Image %s uploadée avec succès.", gid)
+                ICONS.inc("uploaded")
                 # Update local knowledge
                 if str(gid) in self.game_data.known_items_images:
                      self.game_data.known_items_images[str(gid)] = True
             else:
-                print(f"[AssetWorker] Échec upload {gid}: {response.status_code} - {response.text}")
+                logger.error("[AssetWorker] Échec upload %s: %s - %s", gid, response.status_code, response.text)
+                ICONS.inc("rejected")
                 
         except Exception as e:
-            print(f"[AssetWorker] Exception upload {gid}: {e}")
-
-    def stop(self):
-        self.running = False
+            logger.error("[AssetWorker] Exception upload %s: %s", gid, e)
+            ICONS.inc("error")
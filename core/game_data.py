@@ -6,8 +6,20 @@ from core.d2o_reader import D2OReader
 from core.d2i_reader import D2IReader
 from core.d2p_reader import D2PReader
 from core.asset_worker import AssetWorker
+from network.async_core import network_core
+from core.metrics import metrics
 from utils.paths import get_resource_path
 from utils.config import config_manager
+from utils.logger import get_logger
+
+logger = get_logger("game_data")
+
+NAME_LOOKUPS = metrics.counter("tracker_game_data_name_lookups_total", "Résolutions de noms d'items, par source", ("source",))
+CATEGORY_LOOKUPS = metrics.counter("tracker_game_data_category_lookups_total", "Résolutions de catégories, par source", ("source",))
+
+# Journal append-only des items appris, compacté dans user_items.json
+USER_ITEMS_JOURNAL = "dofus_data/user_items.journal"
+JOURNAL_COMPACTION_THRESHOLD = 50
 
 EQUIPMENT_CATEGORIES = {
     "Amulette", "Arc", "Baguette", "Bâton", "Dague", "Epée", "Épée", "Marteau", "Pelle", "Hache", "Faux", "Pioche", "Lance",
@@ -20,6 +32,8 @@ class GameData:
         self.items = {}
         self.i18n = {}
         self.user_items = {} # Mapping GID -> Name défini par l'utilisateur
+        self.user_items_lock = threading.RLock()
+        self.journal_entries = 0 # Entrées du journal pas encore compactées
         self.known_items = {} # Mapping GID -> Name récupéré du serveur (communauté)
         self.known_items_images = {} # Mapping GID -> bool (has_image)
         self.known_categories = {} # Mapping GID -> Category
@@ -32,7 +46,7 @@ class GameData:
 
     def load(self):
         try:
-            print("Chargement des données de jeu...")
+            logger.info("Chargement des données de jeu...")
             
             d2o_path = get_resource_path("dofus_data/common/Items.d2o")
             item_types_path = get_resource_path("dofus_data/common/ItemTypes.d2o")
@@ -45,19 +59,19 @@ class GameData:
             # Chargement des lecteurs binaires si disponibles
             if os.path.exists(d2o_path):
                 self.d2o_reader = D2OReader(d2o_path)
-                print("Lecteur D2O initialisé.")
+                logger.info("Lecteur D2O initialisé.")
             
             if os.path.exists(item_types_path):
                 self.item_types_reader = D2OReader(item_types_path)
-                print("Lecteur ItemTypes D2O initialisé.")
+                logger.info("Lecteur ItemTypes D2O initialisé.")
                 
             if os.path.exists(d2i_path):
                 self.d2i_reader = D2IReader(d2i_path)
-                print("Lecteur D2I initialisé.")
+                logger.info("Lecteur D2I initialisé.")
 
             if os.path.exists(content_path):
                 self.d2p_reader = D2PReader(content_path)
-                print("Lecteur D2P initialisé.")
+                logger.info("Lecteur D2P initialisé.")
 
             # Chargement des textes (i18n) - Fallback JSON
             if os.path.exists(json_path):
@@ -71,10 +85,11 @@ class GameData:
                     for item in items_list:
                         self.items[item["id"]] = item
 
-            # Chargement des items utilisateur (apprentissage)
+            # Chargement des items utilisateur (apprentissage) : snapshot + journal
             if os.path.exists(user_items_path):
                 with open(user_items_path, "r", encoding="utf-8") as f:
                     self.user_items = json.load(f)
+            self._replay_user_items_journal()
             
             # Chargement des items communautaires
             self.fetch_remote_items()
@@ -88,10 +103,10 @@ class GameData:
             # self.check_missing_images()
                 
             self.loaded = True
-            print(f"Données chargées : {len(self.items)} items officiels (JSON), {len(self.user_items)} items appris, {len(self.known_items)} items communautaires.")
+            logger.info("Données chargées : %s items officiels (JSON), %s items appris, %s items communautaires.", len(self.items), len(self.user_items), len(self.known_items))
             
         except Exception as e:
-            print(f"Erreur lors du chargement des données : {e}")
+            logger.error("Erreur lors du chargement des données : %s", e)
 
     def check_missing_images(self):
         """Vérifie les items connus qui n'ont pas d'image et les ajoute à la file."""
@@ -101,7 +116,7 @@ class GameData:
                 self.queue_image_upload(gid)
                 count += 1
         if count > 0:
-            print(f"Planification de l'upload de {count} images manquantes.")
+            logger.info("Planification de l'upload de %s images manquantes.", count)
 
     def queue_image_upload(self, gid):
         """Ajoute un item à la file d'attente d'upload d'image."""
@@ -118,7 +133,7 @@ class GameData:
             base_url = api_url.replace("/ingest", "")
             url = f"{base_url}/data?resource=known_items"
             
-            print(f"Récupération des items connus depuis {url}...")
+            logger.info("Récupération des items connus depuis %s...", url)
             response = requests.get(url, timeout=10)
             if response.status_code == 200:
                 remote_items = response.json()
@@ -132,18 +147,17 @@ class GameData:
                     if category:
                         self.known_categories[gid] = category
             else:
-                print(f"Erreur récupération items: {response.status_code}")
+                logger.error("Erreur récupération items: %s", response.status_code)
         except Exception as e:
-            print(f"Impossible de récupérer les items distants: {e}")
+            logger.error("Impossible de récupérer les items distants: %s", e)
 
     def save_user_item(self, gid, name):
-        """Enregistre un nouveau mapping GID -> Nom."""
-        self.user_items[str(gid)] = name
+        """Enregistre un nouveau mapping GID -> Nom (ajout au journal, sans réécrire tout le fichier)."""
+        with self.user_items_lock:
+            self.user_items[str(gid)] = name
         try:
-            user_items_path = get_resource_path("dofus_data/user_items.json")
-            with open(user_items_path, "w", encoding="utf-8") as f:
-                json.dump(self.user_items, f, indent=4, ensure_ascii=False)
-            print(f"Item appris : {name} ({gid})")
+            self._append_user_items_journal(gid, name)
+            logger.info("Item appris : %s (%s)", name, gid)
             
             # Récupération de la catégorie
             category = self.get_item_category(gid)
@@ -151,27 +165,70 @@ class GameData:
                 category = "Catégorie Inconnue"
             
             # Push to server in background
-            threading.Thread(target=self._push_item_to_server, args=(gid, name, category), daemon=True).start()
+            network_core.submit(self._push_item_to_server(gid, name, category))
             
             # Queue image upload immediately
             self.queue_image_upload(gid)
                 
         except Exception as e:
-            print(f"Erreur sauvegarde item : {e}")
+            logger.error("Erreur sauvegarde item : %s", e)
+
+    def _append_user_items_journal(self, gid, name):
+        """Ajoute une ligne au journal et compacte quand il devient trop long."""
+        journal_path = get_resource_path(USER_ITEMS_JOURNAL)
+        with self.user_items_lock:
+            with open(journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"gid": str(gid), "name": name}, ensure_ascii=False) + "\n")
+            self.journal_entries += 1
+            if self.journal_entries >= JOURNAL_COMPACTION_THRESHOLD:
+                self.compact_user_items()
+
+    def _replay_user_items_journal(self):
+        """Rejoue le journal par-dessus user_items.json, puis compacte s'il contenait des entrées."""
+        journal_path = get_resource_path(USER_ITEMS_JOURNAL)
+        if not os.path.exists(journal_path):
+            return
+        with self.user_items_lock:
+            with open(journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.user_items[str(entry["gid"])] = entry["name"]
+                        self.journal_entries += 1
+                    except (ValueError, KeyError):
+                        # Dernière ligne tronquée (arrêt brutal pendant l'écriture)
+                        continue
+            if self.journal_entries:
+                self.compact_user_items()
+
+    def compact_user_items(self):
+        """Réécrit user_items.json de manière atomique puis vide le journal."""
+        user_items_path = get_resource_path("dofus_data/user_items.json")
+        journal_path = get_resource_path(USER_ITEMS_JOURNAL)
+        with self.user_items_lock:
+            try:
+                tmp_path = user_items_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.user_items, f, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, user_items_path)
+                open(journal_path, "w", encoding="utf-8").close()
+                self.journal_entries = 0
+            except Exception as e:
+                logger.error("Erreur compaction user_items : %s", e)
 
-    def _push_item_to_server(self, gid, name, category):
+    async def _push_item_to_server(self, gid, name, category):
         try:
             api_url = config_manager.get("api_url")
             if api_url:
                 base_url = api_url.replace("/ingest", "")
                 url = f"{base_url}/data?resource=known_items"
                 payload = {"gid": int(gid), "name": name, "category": category}
-                requests.post(url, json=payload, timeout=10)
+                await network_core.request("POST", url, json=payload, timeout=10)
                 
                 # Update local cache
                 self.known_categories[str(gid)] = category
         except Exception as e:
-            print(f"Erreur envoi item serveur: {e}")
+            logger.error("Erreur envoi item serveur: %s", e)
 
     def get_item_category(self, gid):
         if not self.loaded:
@@ -179,6 +236,7 @@ class GameData:
             
         # 1. Check known categories (from backend)
         if str(gid) in self.known_categories:
+            CATEGORY_LOOKUPS.inc("cache")
             return self.known_categories[str(gid)]
 
         # 2. Check D2O
@@ -194,16 +252,19 @@ class GameData:
                         if type_details:
                             type_name_id = type_details.get("name_id")
                             if type_name_id:
+                                CATEGORY_LOOKUPS.inc("d2o")
                                 return self.d2i_reader.get_text(type_name_id)
             except Exception as e:
-                print(f"Erreur lecture catégorie pour {gid}: {e}")
+                logger.error("Erreur lecture catégorie pour %s: %s", gid, e)
         
         # 3. Fallback DofusDB
         category = self.fetch_category_from_dofusdb(gid)
         if category:
+            CATEGORY_LOOKUPS.inc("dofusdb")
             self.known_categories[str(gid)] = category
             return category
 
+        CATEGORY_LOOKUPS.inc("miss")
         return None
 
     def is_equipment(self, gid):
@@ -228,7 +289,7 @@ class GameData:
                     if data:
                         return data
             except Exception as e:
-                print(f"Erreur récupération icône locale pour {gid}: {e}")
+                logger.error("Erreur récupération icône locale pour %s: %s", gid, e)
         
         # 2. Fallback: DofusDB API
         return self.fetch_icon_from_dofusdb(gid)
@@ -261,7 +322,7 @@ class GameData:
                             return img_response.content
                             
         except Exception as e:
-            print(f"Erreur récupération DofusDB pour {gid}: {e}")
+            logger.error("Erreur récupération DofusDB pour %s: %s", gid, e)
             
         return None
 
@@ -271,10 +332,12 @@ class GameData:
             
         # Priorité aux items appris par l'utilisateur
         if str(gid) in self.user_items:
+            NAME_LOOKUPS.inc("user")
             return self.user_items[str(gid)]
             
         # Ensuite les items communautaires
         if str(gid) in self.known_items:
+            NAME_LOOKUPS.inc("known")
             return self.known_items[str(gid)]
             
         # Essai via D2O/D2I
@@ -284,24 +347,28 @@ class GameData:
                 if name_id:
                     name = self.d2i_reader.get_text(name_id)
                     if name:
+                        NAME_LOOKUPS.inc("d2o")
                         return name
             except Exception as e:
-                print(f"Erreur lecture D2O/D2I pour {gid}: {e}")
+                logger.error("Erreur lecture D2O/D2I pour %s: %s", gid, e)
 
         # Fallback JSON
         item = self.items.get(gid)
         if item:
             name_id = item.get("nameId")
             if name_id:
+                NAME_LOOKUPS.inc("json")
                 return self.i18n.get(str(name_id), f"Unknown Name ({name_id})")
         
         # Fallback DofusDB
         name = self.fetch_name_from_dofusdb(gid)
         if name:
+            NAME_LOOKUPS.inc("dofusdb")
             # Cache it in known_items to avoid re-fetching
             self.known_items[str(gid)] = name
             return name
 
+        NAME_LOOKUPS.inc("miss")
         return None # Retourne None si inconnu pour déclencher l'apprentissage
 
     def fetch_name_from_dofusdb(self, gid):
@@ -318,7 +385,7 @@ class GameData:
                     if "name" in item_data and "fr" in item_data["name"]:
                         return item_data["name"]["fr"]
         except Exception as e:
-            print(f"Erreur récupération nom DofusDB pour {gid}: {e}")
+            logger.error("Erreur récupération nom DofusDB pour %s: %s", gid, e)
             
         return None
 
@@ -336,7 +403,7 @@ class GameData:
                     if "type" in item_data and "name" in item_data["type"] and "fr" in item_data["type"]["name"]:
                         return item_data["type"]["name"]["fr"]
         except Exception as e:
-            print(f"Erreur récupération catégorie DofusDB pour {gid}: {e}")
+            logger.error("Erreur récupération catégorie DofusDB pour %s: %s", gid, e)
             
         return None
 
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from network.async_core import network_core
+from utils.logger import get_logger
+
+logger = get_logger("game_data")
+
+# Nombre d'échantillons de prix conservés par item en attente
+MAX_PRICE_SAMPLES = 5
+# Délais (s) entre les tentatives de résolution automatique en arrière-plan
+RESOLVE_BACKOFF = [0, 3, 10, 30]
+
+
+class PendingLearningStore:
+    """
+    Items inconnus en attente d'identification, dédupliqués par GID.
+
+    Un GID vu plusieurs fois pendant que l'utilisateur répond n'est demandé
+    qu'une fois : ses relevés de prix sont fusionnés. En parallèle, une coroutine
+    (network_core, voie "lookup") retente la résolution du nom (Items.d2o local puis DofusDB) ; si elle
+    réussit avant la réponse de l'utilisateur, l'entrée est résolue
+    automatiquement et `on_resolved(gid, name, samples)` est appelé.
+    """
+    def __init__(self, game_data_instance, on_resolved=None):
+        self.game_data = game_data_instance
+        self.on_resolved = on_resolved
+        self.entries = OrderedDict() # gid -> {"gid", "samples", "count", "first_seen", "last_seen"}
+        self.lock = threading.Lock()
+
+    def add(self, gid, prices):
+        """
+        Ajoute un relevé pour un GID inconnu.
+        Retourne True si le GID est nouveau (une demande à l'utilisateur est nécessaire).
+        """
+        gid = int(gid)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(gid)
+            if entry:
+                entry["samples"].append((int(now * 1000), list(prices)))
+                del entry["samples"][:-MAX_PRICE_SAMPLES]
+                entry["count"] += 1
+                entry["last_seen"] = now
+                return False
+
+            self.entries[gid] = {
+                "gid": gid,
+                "samples": [(int(now * 1000), list(prices))],
+                "count": 1,
+                "first_seen": now,
+                "last_seen": now,
+            }
+        network_core.submit(self._resolve(gid))
+        return True
+
+    def next_pending(self, exclude=None):
+        """Retourne la plus ancienne entrée en attente (sans la retirer)."""
+        with self.lock:
+            for gid, entry in self.entries.items():
+                if gid != exclude:
+                    return entry
+        return None
+
+    def is_pending(self, gid):
+        with self.lock:
+            return int(gid) in self.entries
+
+    def resolve(self, gid):
+        """Retire l'entrée et retourne ses relevés de prix (None si déjà résolue)."""
+        with self.lock:
+            entry = self.entries.pop(int(gid), None)
+        return entry["samples"] if entry else None
+
+    def discard(self, gid):
+        """L'utilisateur a ignoré l'item : l'entrée est abandonnée."""
+        self.resolve(gid)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    async def _resolve(self, gid):
+        # Chaque GID a sa coroutine : une attente de backoff ne bloque pas les autres
+        for delay in RESOLVE_BACKOFF:
+            if delay:
+                await asyncio.sleep(delay)
+            if not self.is_pending(gid):
+                return
+
+            name = await network_core.blocking("lookup", self._lookup_name, gid)
+            if name:
+                samples = self.resolve(gid)
+                if samples is not None:
+                    logger.info("Item %s résolu automatiquement : %s", gid, name)
+                    if self.on_resolved:
+                        self.on_resolved(gid, name, samples)
+                return
+
+    def _lookup_name(self, gid):
+        """Recherche le nom sans déclencher l'apprentissage (D2O/D2I local, puis DofusDB)."""
+        game_data = self.game_data
+        if game_data.d2o_reader and game_data.d2i_reader:
+            try:
+                name_id = game_data.d2o_reader.get_name_id(gid)
+                if name_id:
+                    name = game_data.d2i_reader.get_text(name_id)
+                    if name:
+                        return name
+            except Exception as e:
+                logger.debug("Lecture D2O/D2I impossible pour %s: %s", gid, e)
+        return game_data.fetch_name_from_dofusdb(gid)
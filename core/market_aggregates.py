@@ -0,0 +1,124 @@
+"""
+Agrégats de marché par (serveur, item, fenêtre de temps).
+
+Chaque fenêtre garde un sketch de quantiles (KLL) des prix unitaires retenus
+après filtrage : médiane, p10 et p90 sur des heures de capture en mémoire bornée.
+Les fenêtres terminées sont sérialisées et envoyées avec les lots d'observations ;
+les sketches étant fusionnables, le backend peut les combiner entre clients.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from core.quantile_sketch import KLLSketch
+from utils.config import config_manager
+
+# Quantiles calculés côté client et joints à chaque agrégat
+REPORTED_QUANTILES = (0.1, 0.5, 0.9)
+# Nombre maximal de fenêtres ouvertes (les plus anciennes sont clôturées en premier)
+MAX_OPEN_WINDOWS = 20000
+# Nombre maximal de fenêtres clôturées en attente d'envoi (les plus anciennes sont perdues)
+MAX_CLOSED_WINDOWS = 50000
+
+
+class MarketAggregator:
+    def __init__(self, max_open=MAX_OPEN_WINDOWS, max_closed=MAX_CLOSED_WINDOWS):
+        self.max_open = max_open
+        self.max_closed = max_closed
+        self.open = OrderedDict()  # (server, gid, window_start_ms) -> KLLSketch
+        self.closed = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _window_ms(self):
+        return max(60, int(config_manager.get("aggregate_window", 3600))) * 1000
+
+    def add(self, server, gid, prices, timestamp_ms=None):
+        """Ajoute les prix unitaires d'une observation à la fenêtre courante de l'item."""
+        if not server or not prices:
+            return
+        if timestamp_ms is None:
+            timestamp_ms = int(time.time() * 1000)
+        window_ms = self._window_ms()
+        key = (server, gid, timestamp_ms - timestamp_ms % window_ms)
+
+        with self.lock:
+            sketch = self.open.get(key)
+            if sketch is None:
+                sketch = KLLSketch()
+                self.open[key] = sketch
+                if len(self.open) > self.max_open:
+                    self._close(*self.open.popitem(last=False))
+            sketch.extend(prices)
+
+    def _close(self, key, sketch):
+        """Déplace une fenêtre vers la file d'envoi, en la fusionnant si elle y est déjà (lock acquis)."""
+        pending = self.closed.get(key)
+        if pending is not None:
+            pending.merge(sketch)
+            return
+        self.closed[key] = sketch
+        if len(self.closed) > self.max_closed:
+            self.closed.popitem(last=False)
+
+    def collect(self, now_ms=None, include_open=False):
+        """
+        Retire et retourne les agrégats des fenêtres terminées (toutes si include_open),
+        sérialisés pour l'envoi.
+        """
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        window_ms = self._window_ms()
+
+        with self.lock:
+            for key in [key for key in self.open if include_open or key[2] + window_ms <= now_ms]:
+                self._close(key, self.open.pop(key))
+            closed, self.closed = self.closed, OrderedDict()
+
+        return [serialize(key, sketch, window_ms) for key, sketch in closed.items()]
+
+    def restore(self, aggregates):
+        """Remet en file des agrégats dont l'envoi a échoué (fusionnés avec ceux arrivés depuis)."""
+        with self.lock:
+            for aggregate in aggregates:
+                key = (aggregate["server"], aggregate["gid"], aggregate["window_start"])
+                self._close(key, KLLSketch.from_dict(aggregate["sketch"]))
+
+    def summary(self, server, gid):
+        """
+        Quantiles d'un item sur toutes ses fenêtres connues (ouvertes et en attente d'envoi).
+        Retourne {"n", "min", "max", "p10", "p50", "p90"} ou None.
+        """
+        merged = KLLSketch()
+        with self.lock:
+            for windows in (self.open, self.closed):
+                for key, sketch in windows.items():
+                    if key[0] == server and key[1] == gid:
+                        merged.merge(KLLSketch.from_dict(sketch.to_dict()))
+        if merged.n == 0:
+            return None
+        return _describe(merged)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.open) + len(self.closed)
+
+
+def _describe(sketch):
+    p10, p50, p90 = sketch.quantiles(REPORTED_QUANTILES)
+    return {"n": sketch.n, "min": sketch.min, "max": sketch.max, "p10": p10, "p50": p50, "p90": p90}
+
+
+def serialize(key, sketch, window_ms):
+    server, gid, window_start = key
+    aggregate = {
+        "server": server,
+        "gid": gid,
+        "window_start": window_start,
+        "window": window_ms // 1000,
+        "sketch": sketch.to_dict(),
+    }
+    aggregate.update(_describe(sketch))
+    return aggregate
+
+
+market_aggregates = MarketAggregator()
@@ -0,0 +1,309 @@
+"""
+Compteurs, jauges et histogrammes de latence du pipeline capture → envoi.
+
+Les métriques sont déclarées au niveau module là où elles sont mesurées :
+
+    SEGMENTS = metrics.counter("tracker_sniffer_segments_total", "Segments TCP reçus du port 5555")
+    SEGMENTS.inc()
+
+Désactivées (par défaut, "metrics_enabled"), chaque appel se résume à un test
+de booléen. Activées, elles sont exposées au format texte Prometheus sur
+http://127.0.0.1:<metrics_port>/metrics et résumées dans le panneau de l'interface.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.config import config_manager
+from utils.logger import get_logger
+
+logger = get_logger("ui")
+
+# Bornes (s) des histogrammes de latence par défaut
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    def samples(self):
+        """[(nom, labels formatés, valeur)] pour l'export texte."""
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in items]
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def total(self):
+        with self.lock:
+            return sum(self.values.values())
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, registry, name, help_text, labelnames=(), function=None):
+        super().__init__(registry, name, help_text, labelnames)
+        # Jauge calculée à la lecture (ex: taille d'une file) : aucun coût sur le chemin chaud
+        self.function = function
+
+    def set(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function):
+        self.function = function
+
+    def _refresh(self):
+        if self.function is None:
+            return
+        try:
+            value = self.function()
+        except Exception:
+            return
+        with self.lock:
+            self.values[()] = value
+
+    def samples(self):
+        self._refresh()
+        return super().samples()
+
+    def snapshot(self):
+        self._refresh()
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                # [compteurs par borne (+Inf en dernier), somme, nombre]
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.values[labels] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels):
+        """Context manager : observe la durée du bloc."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, (list(state[0]), state[1], state[2])) for labels, state in self.values.items()]
+        samples = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", _format_labels(self.labelnames, labels, ("le", _format_value(float(bound)))), cumulative))
+            samples.append((self.name + "_sum", _format_labels(self.labelnames, labels), total))
+            samples.append((self.name + "_count", _format_labels(self.labelnames, labels), count))
+        return samples
+
+    def snapshot(self):
+        """{labels: {"count", "avg", "p50", "p95"}} (quantiles estimés à partir des bornes)."""
+        with self.lock:
+            items = [(labels, (list(state[0]), state[1], state[2])) for labels, state in self.values.items()]
+        result = {}
+        for labels, (counts, total, count) in items:
+            result[labels] = {
+                "count": count,
+                "avg": total / count if count else 0.0,
+                "p50": self._quantile(counts, count, 0.5),
+                "p95": self._quantile(counts, count, 0.95),
+            }
+        return result
+
+    def _quantile(self, counts, count, q):
+        if not count:
+            return 0.0
+        target = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.server_port = None
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(self, name, *args, **kwargs)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), function=None):
+        return self._register(Gauge, name, help_text, labelnames, function=function)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    def render(self):
+        """Export au format texte Prometheus (version 0.0.4)."""
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """{nom: {labels: valeur}} pour l'affichage (valeurs résumées pour les histogrammes)."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def reset(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    # --- Configuration et endpoint HTTP ---
+
+    def apply_config(self, snapshot):
+        self.enabled = bool(snapshot.get("metrics_enabled", False))
+        port = snapshot.get("metrics_port", 9464) if self.enabled else None
+        if port != self.server_port:
+            self.stop_server()
+            if port:
+                self.start_server(port)
+
+    def start_server(self, port, host="127.0.0.1"):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logger.warning("Endpoint de métriques indisponible sur le port %s: %s", port, e)
+            return
+        self.server_port = port
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Métriques exposées sur http://%s:%s/metrics", host, port)
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.server_port = None
+
+
+metrics = MetricsRegistry()
+metrics.apply_config(config_manager.config)
+config_manager.subscribe(lambda changes, snapshot: metrics.apply_config(snapshot), keys=["metrics_enabled", "metrics_port"])
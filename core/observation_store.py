@@ -0,0 +1,291 @@
+"""
+Historique local des observations capturées (SQLite, mode WAL).
+
+- Un fichier par jour (UTC) : dofus_data/observations/obs-AAAAMMJJ.sqlite,
+  indexé par (server, gid, ts) pour des requêtes par plage de temps rapides.
+- Les écritures passent par une file et sont insérées par lots, dans une seule
+  transaction, par un thread dédié : le sniffer ne touche jamais au disque.
+- Les segments des jours précédents sont compactés (checkpoint WAL + VACUUM)
+  et supprimés au-delà de "observation_retention_days".
+"""
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.config import config_manager
+from utils.logger import get_logger
+from utils.paths import get_resource_path
+
+logger = get_logger("game_data")
+
+STORE_DIR = "dofus_data/observations"
+SEGMENT_PREFIX = "obs-"
+SEGMENT_SUFFIX = ".sqlite"
+# Nombre maximal de lignes par transaction, et délai maximal (s) avant écriture
+WRITE_BATCH_SIZE = 500
+WRITE_INTERVAL = 1.0
+DAY_MS = 86400 * 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    server TEXT NOT NULL,
+    gid INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    average_price REAL NOT NULL,
+    nb_lots INTEGER NOT NULL,
+    suspicious INTEGER NOT NULL DEFAULT 0,
+    prices TEXT,
+    PRIMARY KEY (server, gid, ts)
+) WITHOUT ROWID;
+"""
+
+
+def segment_day(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc).strftime("%Y%m%d")
+
+
+def _day_start_ms(day):
+    return int(datetime.strptime(day, "%Y%m%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class ObservationStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = get_resource_path(directory)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.writers = {}  # jour -> connexion (thread d'écriture uniquement)
+        self.stats = {"written": 0, "batches": 0, "errors": 0}
+
+    # --- Écriture ---
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self.running = True
+            self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.thread.start()
+        # Les segments des jours passés sont compactés en arrière-plan au démarrage
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def add(self, server, observation, keep_prices=False):
+        """Met une observation en file d'écriture (non bloquant). keep_prices conserve les prix bruts (debug)."""
+        if not server or not config_manager.get("observation_store", True):
+            return
+        if not self.running:
+            self.start()
+        self.queue.put((
+            server,
+            int(observation["gid"]),
+            int(observation["timestamp"]),
+            float(observation["average_price"]),
+            len([p for p in observation.get("prices", []) if p > 0]),
+            1 if observation.get("suspicious") else 0,
+            json.dumps(observation.get("prices", [])) if keep_prices else None,
+        ))
+
+    def _writer_loop(self):
+        while self.running or not self.queue.empty():
+            try:
+                rows = [self.queue.get(timeout=WRITE_INTERVAL)]
+            except queue.Empty:
+                continue
+            # Regroupe ce qui arrive pendant WRITE_INTERVAL dans la même transaction
+            deadline = time.monotonic() + WRITE_INTERVAL
+            while len(rows) < WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    remaining = 0
+                try:
+                    rows.append(self.queue.get(timeout=remaining) if remaining else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(rows)
+
+        for connection in self.writers.values():
+            connection.close()
+        self.writers = {}
+
+    def _write(self, rows):
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(segment_day(row[2]), []).append(row)
+        for day, day_rows in by_day.items():
+            try:
+                connection = self._writer(day)
+                with connection:
+                    connection.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?)", day_rows)
+                self.stats["written"] += len(day_rows)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error("Erreur écriture historique (%s, %d lignes): %s", day, len(day_rows), e)
+
+    def _writer(self, day):
+        connection = self.writers.get(day)
+        if connection is None:
+            # Changement de jour : le segment de la veille n'est plus écrit
+            for old_day in [d for d in self.writers if d < day]:
+                self.writers.pop(old_day).close()
+            connection = self._connect(self._segment_path(day))
+            connection.executescript(SCHEMA)
+            self.writers[day] = connection
+        return connection
+
+    def _connect(self, path, readonly=False):
+        if readonly:
+            connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        else:
+            connection = sqlite3.connect(path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def flush(self, timeout=5.0):
+        """Attend que la file d'écriture soit vide."""
+        deadline = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def close(self):
+        """Vide la file puis arrête le thread d'écriture."""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        if self.thread:
+            self.thread.join(timeout=10)
+
+    # --- Segments ---
+
+    def _segment_path(self, day):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{day}{SEGMENT_SUFFIX}")
+
+    def segments(self):
+        """Jours disponibles, du plus ancien au plus récent."""
+        pattern = os.path.join(self.directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+        days = [os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)] for path in glob.glob(pattern)]
+        return sorted(day for day in days if day.isdigit())
+
+    def compact(self):
+        """
+        Compacte les segments des jours passés (checkpoint du WAL, VACUUM, retour au
+        journal classique) et supprime ceux plus anciens que la rétention.
+        """
+        today = segment_day(time.time() * 1000)
+        retention_days = config_manager.get("observation_retention_days", 90)
+        oldest_kept = segment_day(time.time() * 1000 - retention_days * DAY_MS) if retention_days else None
+
+        for day in self.segments():
+            if day >= today:
+                continue
+            path = self._segment_path(day)
+            try:
+                if oldest_kept and day < oldest_kept:
+                    for suffix in ("", "-wal", "-shm"):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+                    logger.info("Segment d'historique %s supprimé (rétention %s jours).", day, retention_days)
+                    continue
+                # Le fichier -wal disparaît à chaque fermeture propre : seul le mode
+                # de journal enregistré dans le segment indique s'il reste à compacter
+                connection = sqlite3.connect(path, timeout=5)
+                try:
+                    journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+                    if str(journal_mode).lower() != "wal":
+                        continue # Déjà compacté
+                    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    connection.execute("PRAGMA journal_mode=DELETE")
+                    connection.execute("VACUUM")
+                finally:
+                    connection.close()
+                logger.debug("Segment d'historique %s compacté.", day)
+            except Exception as e:
+                logger.warning("Compaction du segment %s impossible: %s", day, e)
+
+    # --- Lecture ---
+
+    def _segments_between(self, start_ms, end_ms):
+        first, last = segment_day(start_ms), segment_day(end_ms)
+        for day in self.segments():
+            if first <= day <= last:
+                yield day, self._segment_path(day)
+
+    def query(self, server, gid, start_ms=None, end_ms=None):
+        """
+        Observations d'un item entre start_ms et end_ms (inclus), par ordre chronologique.
+        Retourne une liste de dicts {timestamp, average_price, nb_lots, suspicious}.
+        """
+        end_ms = int(time.time() * 1000) if end_ms is None else end_ms
+        start_ms = end_ms - 7 * DAY_MS if start_ms is None else start_ms
+        results = []
+        for _, path in self._segments_between(start_ms, end_ms):
+            connection = self._connect(path, readonly=True)
+            try:
+                rows = connection.execute(
+                    "SELECT ts, average_price, nb_lots, suspicious FROM observations "
+                    "WHERE server = ? AND gid = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                    (server, int(gid), start_ms, end_ms)
+                ).fetchall()
+            finally:
+                connection.close()
+            results.extend(
+                {"timestamp": ts, "average_price": price, "nb_lots": nb_lots, "suspicious": bool(suspicious)}
+                for ts, price, nb_lots, suspicious in rows
+            )
+        return results
+
+    def series(self, server, gid, start_ms=None, end_ms=None, bucket_seconds=3600, include_suspicious=False):
+        """
+        Série sous-échantillonnée d'un item : un point par intervalle de bucket_seconds.
+        Retourne une liste de dicts {timestamp, avg, min, max, count} (timestamp = début d'intervalle).
+        Les prix suspects sont exclus par défaut.
+        """
+        end_ms = int(time.time() * 1000) if end_ms is None else end_ms
+        start_ms = end_ms - 7 * DAY_MS if start_ms is None else start_ms
+        bucket_ms = max(1, int(bucket_seconds * 1000))
+        suspicious_clause = "" if include_suspicious else "AND suspicious = 0 "
+
+        buckets = {}
+        for _, path in self._segments_between(start_ms, end_ms):
+            connection = self._connect(path, readonly=True)
+            try:
+                rows = connection.execute(
+                    "SELECT ts - ts % ? AS bucket, SUM(average_price), MIN(average_price), MAX(average_price), COUNT(*) "
+                    "FROM observations WHERE server = ? AND gid = ? AND ts BETWEEN ? AND ? "
+                    + suspicious_clause + "GROUP BY bucket",
+                    (bucket_ms, server, int(gid), start_ms, end_ms)
+                ).fetchall()
+            finally:
+                connection.close()
+            # Un intervalle peut chevaucher deux segments journaliers
+            for bucket, total, low, high, count in rows:
+                current = buckets.get(bucket)
+                if current is None:
+                    buckets[bucket] = [total, low, high, count]
+                else:
+                    current[0] += total
+                    current[1] = min(current[1], low)
+                    current[2] = max(current[2], high)
+                    current[3] += count
+
+        return [
+            {"timestamp": bucket, "avg": total / count, "min": low, "max": high, "count": count}
+            for bucket, (total, low, high, count) in sorted(buckets.items())
+        ]
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["pending"] = self.queue.qsize()
+        return stats
+
+
+observation_store = ObservationStore()
@@ -0,0 +1,297 @@
+"""
+Adaptation du sniffer aux deux générations de protocole serveur.
+
+Chaque flux TCP (ip:port source -> ip:port destination) a son propre tampon
+d'octets (labot.data.Buffer) et un protocole :
+- "envelope" : messages protobuf dans une enveloppe Any (préfixe type.ankama.com/).
+  Tout segment contenant le préfixe bascule le flux en enveloppe, même s'il
+  était attribué à labot ;
+- "labot" : trames Dofus 2 header/len-type (+ count côté client), découpées
+  par labot.data.Msg.fromRaw et décodées par les décodeurs compilés de labot.
+  Un flux sans préfixe n'est attribué à labot qu'après une suite cohérente de
+  LABOT_MIN_FRAMES trames complètes, dont au moins un message connu, sur plus
+  d'un segment : une suite d'enveloppe vue en cours de session ne suffit pas.
+
+Les deux décodeurs incrémentaux lisent le même tampon de flux : un segment est
+ajouté une fois, sans recopie, et les corps de messages labot sont des vues.
+"""
+import time
+
+from labot import protocol as labot_protocol
+from labot.data import Buffer, Msg
+from core.metrics import metrics
+from core.packet_parser import read_varint
+from utils.logger import get_logger
+
+logger = get_logger("sniffer")
+
+ENVELOPE = "envelope"
+LABOT = "labot"
+ENVELOPE_PREFIX = b"type.ankama.com/"
+
+# Délai (s) avant d'abandonner un message incomplet
+REASSEMBLY_TIMEOUT = 5
+# Flux sans segment depuis ce délai (s) oubliés à la création d'un nouveau flux
+FLOW_IDLE_TIMEOUT = 300
+# Taille maximale plausible d'un message labot : au-delà, le flux est désynchronisé
+MAX_LABOT_MESSAGE = 1 << 20
+# Preuves exigées avant d'attribuer un flux à labot (trames complètes cohérentes)
+LABOT_MIN_FRAMES = 4
+# Octets gardés au plus pendant la détection (au-delà, on repart du dernier segment)
+MAX_LABOT_CANDIDATE = 1 << 18
+# Distance maximale entre le préfixe et le tag 0x12 (suffixe de type)
+MAX_SUFFIX_LENGTH = 20
+
+# Renvoyé par EnvelopeDecoder.next_message quand le message attend des octets
+INCOMPLETE = "incomplete"
+
+FLOWS = metrics.counter("tracker_sniffer_flows_total", "Flux TCP détectés, par protocole", ("protocol",))
+
+
+def _len_type(length):
+    """Nombre d'octets de longueur écrit par l'encodeur labot (le minimum, cf. Msg.lenlenData)."""
+    if length > 0xFFFF:
+        return 3
+    if length > 0xFF:
+        return 2
+    if length > 0:
+        return 1
+    return 0
+
+
+def scan_labot_frames(data, pos=0, from_client=False):
+    """
+    Parcourt les trames labot complètes de data à partir de pos. Retourne
+    (position de la première trame incomplète, trames complètes, messages connus),
+    ou None si une trame est incohérente : identifiant nul, longueur implausible
+    ou codée sur plus d'octets que le minimum écrit par l'encodeur.
+    """
+    size = len(data)
+    header_size = 6 if from_client else 2
+    frames = 0
+    known = 0
+    while pos + 2 <= size:
+        header = (data[pos] << 8) | data[pos + 1]
+        msg_id = header >> 2
+        if not msg_id:
+            return None
+        len_type = header & 3
+        body = pos + header_size + len_type
+        if body > size:
+            break
+        length = int.from_bytes(data[body - len_type:body], "big")
+        if length > MAX_LABOT_MESSAGE or _len_type(length) != len_type:
+            return None
+        if body + length > size:
+            break
+        pos = body + length
+        frames += 1
+        if msg_id in labot_protocol.msg_from_id:
+            known += 1
+    return pos, frames, known
+
+
+class FlowStream:
+    """Tampon et état de réassemblage d'un flux TCP, partagés par les décodeurs."""
+    __slots__ = ("key", "from_client", "protocol", "buffer", "started", "started_ns", "last_seen",
+                 "scan_pos", "scan_frames", "scan_known", "scan_segments")
+
+    def __init__(self, key, from_client):
+        self.key = key
+        self.from_client = from_client
+        self.protocol = None
+        self.buffer = Buffer()
+        self.started = 0  # time.time() du premier segment du message en cours
+        self.started_ns = 0  # perf_counter_ns du même segment (traces)
+        self.last_seen = 0
+        self._reset_scan()
+
+    def _reset_scan(self):
+        # Détection labot : prochaine trame à lire dans le tampon et preuves accumulées
+        self.scan_pos = 0
+        self.scan_frames = 0
+        self.scan_known = 0
+        self.scan_segments = 0
+
+    def restart(self, payload, now):
+        """Abandonne les octets en attente : payload ouvre un nouveau message."""
+        self.buffer.reset()
+        self.buffer += payload
+        self.started = now
+        self.started_ns = time.perf_counter_ns()
+        self._reset_scan()
+
+    def clear(self):
+        self.buffer.reset()
+        self.started = 0
+        self._reset_scan()
+
+    def set_protocol(self, protocol):
+        self.protocol = protocol
+        FLOWS.inc(protocol)
+        logger.info("[FLOW] %s : protocole %s", self.label(), protocol)
+
+    def label(self):
+        src, sport, dst, dport = self.key
+        return f"{src}:{sport} -> {dst}:{dport}"
+
+
+class EnvelopeDecoder:
+    """
+    Enveloppe Any : un segment contenant le préfixe ouvre un nouveau message,
+    les segments suivants le complètent jusqu'à la longueur annoncée.
+    """
+
+    def feed(self, flow, payload, now):
+        """Ajoute un segment ; retourne l'événement de réassemblage."""
+        if ENVELOPE_PREFIX in payload:
+            flow.restart(payload, now)
+            return "start"
+        if not flow.buffer:
+            # Pas de message en cours et pas d'en-tête -> ignoré
+            return "orphan"
+        if now - flow.started > REASSEMBLY_TIMEOUT:
+            flow.clear()
+            logger.debug("Buffer timeout, clearing.")
+            return "timeout"
+        flow.buffer += payload
+        return "append"
+
+    def next_message(self, flow):
+        """
+        (suffixe, charge utile) du message en tampon, qui est alors consommé ;
+        INCOMPLETE s'il manque des octets, None si le message n'est pas reconnu.
+        """
+        data = flow.buffer.peek()
+        idx = data.find(ENVELOPE_PREFIX)
+        if idx == -1:
+            return None
+
+        # Heuristique : le suffixe de type se termine au tag 0x12 (champ 2)
+        suffix_start = idx + len(ENVELOPE_PREFIX)
+        type_end = data.find(b"\x12", suffix_start, suffix_start + MAX_SUFFIX_LENGTH)
+        if type_end == -1:
+            return None
+        type_suffix = data[suffix_start:type_end]
+        logger.debug("[PARSE] Suffix: %s, buffer: %d bytes", type_suffix, len(data))
+
+        msg_len, curr = read_varint(data, type_end + 1)
+        logger.debug("[PARSE] Message length: %d, have: %d", msg_len, len(data) - curr)
+        if curr + msg_len > len(data):
+            logger.debug("[PARSE] Waiting for more data... (%d/%d)", len(data), curr + msg_len)
+            return INCOMPLETE
+
+        # Un seul message par tampon : un gros message découpé en segments
+        flow.clear()
+        return type_suffix, data[curr:curr + msg_len]
+
+
+class LabotDetector:
+    """
+    Flux de protocole inconnu, segments sans préfixe d'enveloppe : ils sont gardés
+    dans le tampon du flux tant qu'ils forment une suite de trames labot cohérente.
+    Le flux passe à labot une fois les preuves réunies ; les messages gardés sont
+    alors décodés comme les suivants.
+    """
+
+    def feed(self, flow, payload, now):
+        """Ajoute un segment candidat ; retourne l'événement de réassemblage."""
+        if flow.buffer:
+            flow.buffer += payload
+        else:
+            flow.restart(payload, now)
+        data = flow.buffer.peek()
+        scan = None
+        if len(data) <= MAX_LABOT_CANDIDATE:
+            scan = scan_labot_frames(data, flow.scan_pos, flow.from_client)
+        if scan is None:
+            # Pas une suite de trames depuis le début du tampon : on repart de ce segment seul
+            flow.restart(payload, now)
+            scan = scan_labot_frames(payload, 0, flow.from_client)
+            if scan is None:
+                flow.clear()
+                return "orphan"
+
+        flow.scan_pos, frames, known = scan
+        flow.scan_frames += frames
+        flow.scan_known += known
+        flow.scan_segments += 1
+        if flow.scan_frames >= LABOT_MIN_FRAMES and flow.scan_known and flow.scan_segments > 1:
+            flow.set_protocol(LABOT)
+            return "detected"
+        return "candidate"
+
+
+class LabotDecoder:
+    """Trames Dofus 2 : flux continu de messages header/len-type."""
+
+    def feed(self, flow, payload, now):
+        """Ajoute un segment ; retourne l'événement de réassemblage."""
+        if flow.buffer:
+            pending = len(flow.buffer) - flow.buffer.start
+            if now - flow.started > REASSEMBLY_TIMEOUT or pending > MAX_LABOT_MESSAGE + 8:
+                # Segment perdu ou trame incohérente : on redétecte sur les prochains segments
+                flow.clear()
+                flow.protocol = None
+                return "timeout"
+            flow.buffer += payload
+            return "append"
+        flow.restart(payload, now)
+        return "start"
+
+    def messages(self, flow):
+        """Itère sur les messages complets du tampon (Msg, corps en vue sur le tampon)."""
+        buffer = flow.buffer
+        msg = Msg.fromRaw(buffer, flow.from_client)
+        if msg is None:
+            return
+        while msg is not None:
+            if not msg.id:
+                # Aucun message n'a l'identifiant 0 : flux désynchronisé, on redétecte
+                flow.clear()
+                flow.protocol = None
+                return
+            yield msg
+            msg = Msg.fromRaw(buffer, flow.from_client)
+        if buffer:
+            # Début du message suivant : son délai part de maintenant
+            flow.started = time.time()
+            flow.started_ns = time.perf_counter_ns()
+        else:
+            flow.started = 0
+
+
+class ProtocolAdapter:
+    """Flux TCP en cours, leur protocole et le décodeur associé."""
+
+    def __init__(self):
+        self.flows = {}  # (src, sport, dst, dport) -> FlowStream
+        self.decoders = {ENVELOPE: EnvelopeDecoder(), LABOT: LabotDecoder()}
+        self.detector = LabotDetector()
+
+    def flow(self, key, from_client, now):
+        flow = self.flows.get(key)
+        if flow is None:
+            self.prune(now)
+            flow = self.flows[key] = FlowStream(key, from_client)
+        flow.last_seen = now
+        return flow
+
+    def prune(self, now):
+        """Oublie les flux inactifs (connexions fermées, changement de serveur)."""
+        idle = [key for key, flow in self.flows.items() if now - flow.last_seen > FLOW_IDLE_TIMEOUT]
+        for key in idle:
+            del self.flows[key]
+
+    def route(self, flow, payload):
+        """
+        Décodeur du segment : enveloppe dès que le préfixe apparaît, sinon celui du
+        protocole du flux, ou le détecteur labot tant que le protocole est inconnu.
+        """
+        if ENVELOPE_PREFIX in payload:
+            if flow.protocol != ENVELOPE:
+                flow.clear()
+                flow.set_protocol(ENVELOPE)
+        elif flow.protocol is None:
+            return self.detector
+        return self.decoders[flow.protocol]
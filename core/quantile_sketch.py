@@ -0,0 +1,139 @@
+import math
+
+# Capacité du niveau le plus haut (précision ~1.7/k sur les rangs)
+DEFAULT_K = 128
+# Capacité minimale d'un niveau
+MIN_CAPACITY = 8
+# Décroissance des capacités d'un niveau au suivant (vers le bas)
+CAPACITY_DECAY = 2 / 3
+
+
+class KLLSketch:
+    """
+    Sketch de quantiles KLL (Karnin, Lang, Liberty) : résumé d'un flux de prix en
+    mémoire bornée (O(k) valeurs), fusionnable et sérialisable.
+
+    Le niveau h contient des valeurs de poids 2^h. Quand un niveau dépasse sa
+    capacité, il est trié et une valeur sur deux (paire ou impaire, en alternance)
+    monte au niveau suivant : le poids total reste exactement égal au nombre de valeurs.
+    """
+    __slots__ = ("k", "n", "min", "max", "levels", "_parity")
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+        self._parity = 0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, int(math.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def extend(self, values):
+        for value in values:
+            self.update(value)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # Un élément reste au niveau courant si le nombre est impair
+                leftover = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self._parity::2])
+                self._parity ^= 1
+                self.levels[level] = leftover
+            level += 1
+
+    def merge(self, other):
+        """Fusionne un autre sketch dans celui-ci (le résultat résume l'union des deux flux)."""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        weighted = []
+        for level, items in enumerate(self.levels):
+            weight = 1 << level
+            weighted.extend((value, weight) for value in items)
+        weighted.sort()
+        return weighted
+
+    def quantiles(self, fractions):
+        """Valeurs approchées aux quantiles demandés (ex: [0.1, 0.5, 0.9]). None si le sketch est vide."""
+        if self.n == 0:
+            return [None for _ in fractions]
+        weighted = self._weighted()
+        results = []
+        for q in fractions:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * self.n
+            cumulative = 0
+            value = self.max
+            for candidate, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    value = candidate
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def rank(self, value):
+        """Fraction approchée des valeurs inférieures ou égales à `value`."""
+        if self.n == 0:
+            return 0.0
+        below = sum(weight for candidate, weight in self._weighted() if candidate <= value)
+        return below / self.n
+
+    def size(self):
+        """Nombre de valeurs réellement conservées."""
+        return sum(len(items) for items in self.levels)
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "levels": [list(items) for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data.get("k", DEFAULT_K))
+        sketch.n = data.get("n", 0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch.levels = [list(items) for items in data.get("levels") or [[]]]
+        return sketch
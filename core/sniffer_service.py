@@ -1,11 +1,28 @@
 import threading
 import time
-import json
+import logging
 from scapy.all import sniff, TCP, IP, Raw
 from core.packet_parser import parse_iqb_packet, parse_jbo_packet, parse_jcg_packet, parse_hyp_packet, parse_jeu_packet, parse_hzm_packet, read_varint
 from core.game_data import game_data
 from core.anomaly_filter import AnomalyFilter
+from core.market_aggregates import market_aggregates
+from core.observation_store import observation_store
+from core.metrics import metrics
+from core.tracing import tracer
+from core.protocol_adapter import ProtocolAdapter, INCOMPLETE, ENVELOPE, LABOT
 from utils.config import config_manager
+from utils.logger import get_logger
+
+logger = get_logger("sniffer")
+
+LOG_LEVELS = {"ERROR": logging.ERROR, "WARNING": logging.WARNING, "INFO": logging.INFO, "DEBUG": logging.DEBUG}
+
+SEGMENTS = metrics.counter("tracker_sniffer_segments_total", "Segments TCP avec données reçus du port 5555")
+REASSEMBLY = metrics.counter("tracker_sniffer_reassembly_total", "Événements de réassemblage TCP", ("event",))
+MESSAGES = metrics.counter("tracker_sniffer_messages_total", "Messages complets réassemblés, par type", ("suffix",))
+OBSERVATIONS = metrics.counter("tracker_sniffer_observations_total", "Issue des messages contenant des prix", ("outcome",))
+CALLBACK_SECONDS = metrics.histogram("tracker_sniffer_callback_seconds", "Durée de traitement d'un segment")
+PARSE_SECONDS = metrics.histogram("tracker_parse_seconds", "Durée de décodage d'un message, par type", ("suffix",))
 
 class SnifferService(threading.Thread):
     def __init__(self, callback=None, on_error=None, on_unknown_item=None, on_bank_content=None):
@@ -22,15 +39,18 @@ class SnifferService(threading.Thread):
         )
         self.daemon = True # Kill thread when main app closes
 
+        # Debug flag cached locally, kept in sync by the config subscription
+        self.debug_mode = config_manager.get("debug_mode", False)
+        self._config_subscription = config_manager.subscribe(self._on_config_change, keys=["debug_mode"])
+
         # State for multi-packet parsing (v3 protocol)
         self.last_gid = 0
         self.last_prices = []
         self.last_gid_time = 0
         self.last_price_time = 0
         
-        # Buffer for TCP reassembly (Simple)
-        self.buffer = b""
-        self.buffer_time = 0
+        # Per-flow TCP reassembly, routed to the envelope or labot decoder
+        self.protocols = ProtocolAdapter()
         
         # Special buffer for jcr packets (bank content wrapper)
         self.jcr_buffer = b""
@@ -38,7 +58,7 @@ class SnifferService(threading.Thread):
 
     def run(self):
         self.running = True
-        self.log("Sniffer thread started.", "INFO")
+        logger.info("Sniffer thread started.")
         try:
             # Load game data if not loaded
             if not game_data.loaded:
@@ -48,24 +68,21 @@ class SnifferService(threading.Thread):
             sniff(filter="tcp port 5555", prn=self.packet_callback, store=0, stop_filter=lambda x: not self.running)
         except Exception as e:
             error_msg = f"Sniffer error: {e}"
-            self.log(error_msg, "ERROR")
+            logger.error(error_msg)
             self.running = False
             if self.on_error:
                 self.on_error(str(e))
 
     def stop(self):
         self.running = False
+        config_manager.unsubscribe(self._config_subscription)
+
+    def _on_config_change(self, changes, snapshot):
+        self.debug_mode = snapshot.get("debug_mode", False)
 
     def log(self, message, level="INFO"):
-        """Affiche un log si le niveau est suffisant."""
-        debug_mode = config_manager.get("debug_mode", False)
-        
-        if level == "ERROR":
-            print(f"[ERROR] {message}")
-        elif level == "INFO":
-            print(f"[INFO] {message}")
-        elif level == "DEBUG" and debug_mode:
-            print(f"[DEBUG] {message}")
+        """Affiche un log si le niveau est suffisant (préférer logger.debug("...%s", arg) dans les chemins chauds)."""
+        logger.log(LOG_LEVELS.get(level, logging.INFO), message)
 
     def log_protobuf_structure(self, data, indent=0):
         """Affiche la structure Protobuf d'un paquet inconnu."""
@@ -77,20 +94,20 @@ class SnifferService(threading.Thread):
                 wire_type = tag & 7
                 
                 prefix = "  " * indent
-                self.log(f"{prefix}Field {field_number} (Wire {wire_type})", "DEBUG")
+                logger.debug("%sField %s (Wire %s)", prefix, field_number, wire_type)
                 
                 if wire_type == 0: # VarInt
                     val, new_pos = read_varint(data, new_pos)
-                    self.log(f"{prefix}  Value: {val}", "DEBUG")
+                    logger.debug("%s  Value: %s", prefix, val)
                     pos = new_pos
                 elif wire_type == 2: # Length Delimited
                     length, new_pos = read_varint(data, new_pos)
-                    self.log(f"{prefix}  Length: {length}", "DEBUG")
+                    logger.debug("%s  Length: %s", prefix, length)
                     sub_data = data[new_pos : new_pos + length]
-                    self.log(f"{prefix}  Data (hex): {sub_data.hex()}", "DEBUG")
+                    logger.debug("%s  Data (hex): %s", prefix, sub_data.hex())
                     # Recursive attempt
                     if length > 0:
-                        self.log(f"{prefix}  -> Sub-message analysis:", "DEBUG")
+                        logger.debug("%s  -> Sub-message analysis:", prefix)
                         self.log_protobuf_structure(sub_data, indent + 1)
                     pos = new_pos + length
                 elif wire_type == 1: # 64-bit
@@ -98,16 +115,16 @@ class SnifferService(threading.Thread):
                 elif wire_type == 5: # 32-bit
                     pos = new_pos + 4
                 else:
-                    self.log(f"{prefix}  Unknown wire type {wire_type}", "DEBUG")
+                    logger.debug("%s  Unknown wire type %s", prefix, wire_type)
                     break
             except Exception as e:
-                self.log(f"{'  ' * indent}Error parsing: {e}", "DEBUG")
+                logger.debug("%sError parsing: %s", '  ' * indent, e)
                 break
 
     def dump_packet_structure(self, gid, data):
         """Dumps the full protobuf structure to a file for analysis."""
         filename = f"packet_structure_{gid}.txt"
-        self.log(f"Dumping packet structure to {filename}...", "INFO")
+        logger.info("Dumping packet structure to %s...", filename)
         with open(filename, "w", encoding="utf-8") as f:
             f.write(f"Packet Structure for GID {gid}\n")
             f.write("================================\n")
@@ -168,6 +185,15 @@ class SnifferService(threading.Thread):
         return bytes(out)
 
     def packet_callback(self, packet):
+        if not metrics.enabled:
+            return self._handle_packet(packet)
+        start = time.perf_counter()
+        try:
+            self._handle_packet(packet)
+        finally:
+            CALLBACK_SECONDS.observe(time.perf_counter() - start)
+
+    def _handle_packet(self, packet):
         if not self.running:
             return
 
@@ -180,11 +206,29 @@ class SnifferService(threading.Thread):
         # Only process server traffic (5555)
         if src_port == 5555 and packet.haslayer(Raw):
             payload = packet[Raw].load
+            SEGMENTS.inc()
+            if tracer.enabled:
+                # Capture stage: from the pcap timestamp to the start of processing (scapy queue)
+                received_ns = time.perf_counter_ns()
+                lag_ns = max(0, int((time.time() - float(packet.time)) * 1e9))
+                tracer.add("capture", received_ns - lag_ns, received_ns, bytes=len(payload))
             
             if self.dump_packets:
                 with open("packet_dump.bin", "ab") as f:
                     f.write(payload)
             
+            now = time.time()
+            ip = packet.getlayer(IP)
+            flow_key = (ip.src if ip else None, src_port, ip.dst if ip else None, dst_port)
+            flow = self.protocols.flow(flow_key, False, now)
+            decoder = self.protocols.route(flow, payload)
+            if flow.protocol != ENVELOPE:
+                # Labot framing (or detection still running): continuous per-flow stream
+                REASSEMBLY.inc(decoder.feed(flow, payload, now))
+                if flow.protocol == LABOT:
+                    self._handle_labot(flow)
+                return
+
             # --- Special handling for jcr packets (bank content wrapper) ---
             # jcr packets are fragmented and contain embedded hzm messages
             jcr_prefix = b'type.ankama.com/jcr'
@@ -194,15 +238,16 @@ class SnifferService(threading.Thread):
                 # Start of jcr packet
                 self.jcr_buffer = payload
                 self.jcr_buffer_time = time.time()
-                self.log(f"[JCR] Started buffering jcr packet: {len(payload)} bytes", "DEBUG")
+                logger.debug("[JCR] Started buffering jcr packet: %d bytes", len(payload))
             elif self.jcr_buffer:
                 # Continue buffering jcr fragments
                 if time.time() - self.jcr_buffer_time > 10:
-                    self.log("[JCR] Buffer timeout, clearing.", "DEBUG")
+                    logger.debug("[JCR] Buffer timeout, clearing.")
+                    REASSEMBLY.inc("jcr_timeout")
                     self.jcr_buffer = b""
                 else:
                     self.jcr_buffer += payload
-                    self.log(f"[JCR] Appended fragment: +{len(payload)} bytes, total: {len(self.jcr_buffer)} bytes", "DEBUG")
+                    logger.debug("[JCR] Appended fragment: +%d bytes, total: %d bytes", len(payload), len(self.jcr_buffer))
                     
                     # Check if we have the complete hzm inside
                     if hzm_prefix in self.jcr_buffer:
@@ -213,14 +258,14 @@ class SnifferService(threading.Thread):
                             hzm_pos = hzm_start + 1
                             try:
                                 hzm_len, hzm_pos = read_varint(self.jcr_buffer, hzm_pos)
-                                self.log(f"[JCR] Found hzm: len={hzm_len}, have={len(self.jcr_buffer) - hzm_pos}", "DEBUG")
+                                logger.debug("[JCR] Found hzm: len=%d, have=%d", hzm_len, len(self.jcr_buffer) - hzm_pos)
                                 
                                 if hzm_pos + hzm_len <= len(self.jcr_buffer):
                                     # We have the complete hzm!
                                     hzm_payload = self.jcr_buffer[hzm_pos:hzm_pos + hzm_len]
                                     bank_items = parse_hzm_packet(hzm_payload)
                                     if bank_items:
-                                        self.log(f"[BANK] Received storage content: {len(bank_items)} items", "INFO")
+                                        logger.info("[BANK] Received storage content: %d items", len(bank_items))
                                         if self.on_bank_content:
                                             self.on_bank_content(bank_items)
                                     self.jcr_buffer = b""
@@ -231,240 +276,254 @@ class SnifferService(threading.Thread):
                     return
             
             # --- Regular TCP Reassembly Logic ---
-            prefix = b'type.ankama.com/'
-            idx = payload.find(prefix)
-            
-            if idx != -1:
-                # New message start found
-                self.buffer = payload
-                self.buffer_time = time.time()
-                # self.log("New message start detected, buffering...", "DEBUG")
-            else:
-                # No header found
-                if self.buffer:
-                    # Check timeout (5s)
-                    if time.time() - self.buffer_time > 5:
-                        self.buffer = b""
-                        self.log("Buffer timeout, clearing.", "DEBUG")
-                        return
-                        
-                    # Append to buffer
-                    self.buffer += payload
-                    # self.log(f"Appended {len(payload)} bytes to buffer (Total: {len(self.buffer)})", "DEBUG")
-                else:
-                    # No buffer and no header -> Ignore
+            event = decoder.feed(flow, payload, now)
+            REASSEMBLY.inc(event)
+            if event == "orphan" or event == "timeout":
+                return
+
+            try:
+                message = decoder.next_message(flow)
+                if message is None:
                     return
+                if message == INCOMPLETE:
+                    REASSEMBLY.inc("incomplete")
+                    return # Wait for next packet
 
-            # Work with the buffer
-            full_data = self.buffer
-            
-            # Re-find prefix in full_data (it must be there if buffer is set)
-            idx = full_data.find(prefix)
-            
-            if idx != -1:
-                # self.log(f"Found Ankama prefix at index {idx}", "DEBUG")
-                try:
-                    # Determine type suffix
-                    # Heuristic: Scan for 0x12 (Tag for field 2) within reasonable distance
-                    type_end = -1
-                    for i in range(20):  # Extended to 20 bytes for longer suffixes
-                        check_pos = idx + len(prefix) + i
-                        if check_pos < len(full_data) and full_data[check_pos] == 0x12:
-                            type_end = check_pos
-                            break
-                    
-                    if type_end != -1:
-                        type_suffix = full_data[idx + len(prefix) : type_end]
-                        self.log(f"[PARSE] Suffix: {type_suffix}, buffer: {len(full_data)} bytes", "DEBUG")
-                        
-                        curr = type_end + 1 # Skip Tag 0x12
-                        msg_len, curr = read_varint(full_data, curr)
-                        self.log(f"[PARSE] Message length: {msg_len}, have: {len(full_data) - curr}", "DEBUG")
-                        
-                        # Check if we have the full message
-                        if curr + msg_len > len(full_data):
-                            self.log(f"[PARSE] Waiting for more data... ({len(full_data)}/{curr + msg_len})", "DEBUG")
-                            return # Wait for next packet
-                        
-                        # We have the full message!
-                        msg_payload = full_data[curr : curr + msg_len]
-                        
-                        # Clear buffer (we consumed the message)
-                        # Note: If there are multiple messages in buffer, we lose them here. 
-                        # But usually it's one large message split.
-                        self.buffer = b""
-                        
-                        gid = 0
-                        prices = []
-                        
-                        if type_suffix == b'iqb':
-                            gid, prices = parse_iqb_packet(msg_payload)
-                        elif type_suffix == b'jbo':
-                            gid, prices = parse_jbo_packet(msg_payload)
-                        elif type_suffix == b'jcg':
-                            # Previously ignored, but seems to be the new price packet (v2)
-                            gid, prices = parse_jcg_packet(msg_payload)
-                        elif type_suffix == b'iqw':
-                            # Chat / Social packet - Ignore
-                            pass
-                        elif type_suffix == b'jbl':
-                            # Stats / Map info - Ignore
-                            pass
-                        elif type_suffix == b'jeu' or type_suffix == b'jet':
-                            g, p = parse_jeu_packet(msg_payload)
-                            if g:
-                                if g == 104:
-                                    self.log(f"Ignored GID 104 (Eliby/Noise)", "DEBUG")
-                                    return
-
-                                self.log(f"[{type_suffix.decode().upper()}] Found GID: {g}", "DEBUG")
-                                
-                                if p:
-                                    self.log(f"[{type_suffix.decode().upper()}] Found {len(p)} prices directly in packet!", "DEBUG")
-                                    gid = g
-                                    prices = p
-                                    
-                                    # DEBUG: Dump structure for Dofus Ocre or specific items
-                                    # if gid == 7754 or gid == 6980: # Ocre or Vulbis
-                                    #    self.dump_packet_structure(gid, msg_payload)
-                                else:
-                                    self.last_gid = g
-                                    self.last_gid_time = time.time()
-                                    
-                                    if self.last_prices and (time.time() - self.last_price_time < 20.0):
-                                        # Check if we have multiple price lists in memory (from multiple HYP packets)
-                                        # and try to find the one that matches best (heuristic?)
-                                        # For now, we just take the most recent one.
-                                        
-                                        self.log(f"[COMBINE] Linking GID {g} with {len(self.last_prices)} prices", "INFO")
-                                        gid = g
-                                        prices = self.last_prices
-                                        
-                                        # Clear cache immediately to avoid reusing these prices for another item
-                                        self.last_prices = []
-                                        self.last_gid = 0
-                                    else:
-                                        if not self.last_prices:
-                                            self.log(f"[WARNING] GID {g} found but no prices in memory. (Cache active?)", "DEBUG")
-                                        else:
-                                            self.log(f"[WARNING] GID {g} found but prices expired ({time.time() - self.last_price_time:.1f}s ago).", "DEBUG")
-
-                        elif type_suffix == b'hyp':
-                            # HYP packets contain unreliable prices (often averages or history, not current HDV)
-                            # We ignore them to avoid polluting the data with incorrect values.
-                            # _, p = parse_hyp_packet(msg_payload)
-                            pass
-                        elif type_suffix == b'hzm':
-                            # Bank/Storage content packet - contains all items in player's bank
-                            bank_items = parse_hzm_packet(msg_payload)
-                            if bank_items:
-                                self.log(f"[BANK] Received storage content: {len(bank_items)} items", "INFO")
-                                if self.on_bank_content:
-                                    self.on_bank_content(bank_items)
-                        elif type_suffix == b'jcr':
-                            # JCR packets are handled separately above with special buffering
-                            # This case should not be reached for bank content
-                            pass
+                # We have the full message!
+                type_suffix, msg_payload = message
+                gid = 0
+                prices = []
+                suffix_label = type_suffix.decode("ascii", errors="replace")
+                MESSAGES.inc(suffix_label)
+                msg_id = tracer.next_id() if tracer.enabled else 0
+                parse_started = time.perf_counter_ns()
+                if msg_id:
+                    tracer.add("reassemble", flow.started_ns, parse_started, msg=msg_id, bytes=len(msg_payload))
+
+                if type_suffix == b'iqb':
+                    gid, prices = parse_iqb_packet(msg_payload)
+                elif type_suffix == b'jbo':
+                    gid, prices = parse_jbo_packet(msg_payload)
+                elif type_suffix == b'jcg':
+                    # Previously ignored, but seems to be the new price packet (v2)
+                    gid, prices = parse_jcg_packet(msg_payload)
+                elif type_suffix == b'iqw':
+                    # Chat / Social packet - Ignore
+                    pass
+                elif type_suffix == b'jbl':
+                    # Stats / Map info - Ignore
+                    pass
+                elif type_suffix == b'jeu' or type_suffix == b'jet':
+                    g, p = parse_jeu_packet(msg_payload)
+                    if g:
+                        if g == 104:
+                            logger.debug("Ignored GID 104 (Eliby/Noise)")
+                            return
+
+                        logger.debug("[%s] Found GID: %s", type_suffix.decode().upper(), g)
+
+                        if p:
+                            logger.debug("[%s] Found %d prices directly in packet!", type_suffix.decode().upper(), len(p))
+                            gid = g
+                            prices = p
+
+                            # DEBUG: Dump structure for Dofus Ocre or specific items
+                            # if gid == 7754 or gid == 6980: # Ocre or Vulbis
+                            #    self.dump_packet_structure(gid, msg_payload)
                         else:
-                            # Heuristic check for GID 15715 in raw payload to find missing packets
-                            # if b'\xe3\x7a' in msg_payload:
-                            #      self.log(f"[HEURISTIC] Found GID 15715 (VarInt) in packet {type_suffix}", "DEBUG")
+                            self.last_gid = g
+                            self.last_gid_time = time.time()
 
-                            # Only analyze interesting packets (likely price lists > 50 bytes)
-                            if len(msg_payload) > 50:
-                                pass
-                                # self.log(f"[CANDIDATE] Unknown suffix {type_suffix} (len={len(msg_payload)})", "INFO")
-                                # self.log("--- PROTOBUF STRUCTURE ANALYSIS ---", "INFO")
-                                # self.log_protobuf_structure(msg_payload)
-                                # self.log("-----------------------------------", "INFO")
+                            if self.last_prices and (time.time() - self.last_price_time < 20.0):
+                                # Check if we have multiple price lists in memory (from multiple HYP packets)
+                                # and try to find the one that matches best (heuristic?)
+                                # For now, we just take the most recent one.
+
+                                logger.info("[COMBINE] Linking GID %s with %d prices", g, len(self.last_prices))
+                                gid = g
+                                prices = self.last_prices
+
+                                # Clear cache immediately to avoid reusing these prices for another item
+                                self.last_prices = []
+                                self.last_gid = 0
                             else:
-                                pass
-                                # self.log(f"Ignored small unknown packet: {type_suffix} (len={len(msg_payload)})", "DEBUG")
-
-                            # Try all just in case
-                            gid, prices = parse_jcg_packet(msg_payload)
-                            if not gid or not prices:
-                                gid, prices = parse_jbo_packet(msg_payload)
-                            if not gid or not prices:
-                                gid, prices = parse_iqb_packet(msg_payload)
-                            # if not gid or not prices:
-                            #    gid, prices = parse_iqw_packet(msg_payload)
-                            # if not gid or not prices:
-                            #    gid, prices = parse_jeu_packet(msg_payload)
-                        
-                        if gid and prices:
-                            self.log(f"Packet parsed: GID={gid}, Prices={len(prices)}", "DEBUG")
-                            
-                            # DEBUG: Dump packet for analysis
-                            if config_manager.get("debug_mode"):
-                                try:
-                                    suffix_str = type_suffix.decode('utf-8', errors='ignore')
-                                    filename = f"debug_packets/{gid}_{suffix_str}_{int(time.time())}.bin"
-                                    with open(filename, "wb") as f:
-                                        f.write(msg_payload)
-                                except Exception as e:
-                                    self.log(f"Error dumping packet: {e}", "ERROR")
-
-                            name = game_data.get_item_name(gid)
-                            
-                            if not name:
-                                self.log(f"Unknown item: {gid}", "DEBUG")
-                                if self.on_unknown_item:
-                                    self.on_unknown_item(gid, prices)
-                                    return
-                                else:
-                                    return
-                                
-                            # Determine processing strategy based on item type
-                            is_equipment = game_data.is_equipment(gid)
-                            category = game_data.get_item_category(gid)
-                            if not category:
-                                category = "Catégorie Inconnue"
-
-                            if is_equipment:
-                                # For equipment, we only take the minimum price (cheapest)
-                                # because each item is unique (stats vary)
-                                # Filter out zeros (artifacts/placeholders)
-                                valid_prices = [p for p in prices if p > 0]
-                                if valid_prices:
-                                    min_price = min(valid_prices)
-                                    self.log(f"Item {name} is Equipment ({category}). Using min price: {min_price}", "DEBUG")
-                                    filtered_prices = [min_price]
-                                    average = min_price
+                                if not self.last_prices:
+                                    logger.debug("[WARNING] GID %s found but no prices in memory. (Cache active?)", g)
                                 else:
-                                    self.log(f"Item {name} is Equipment ({category}) but no valid prices found.", "DEBUG")
-                                    average = 0
-                            else:
-                                # For resources, we filter anomalies and calculate average
-                                filtered_prices, average = self.filter.filter_prices(prices)
-                                self.log(f"Filtered: {len(filtered_prices)} prices, Avg={average}", "DEBUG")
-                            
-                            if average > 0:
-                                observation = {
-                                    "gid": gid,
-                                    "name": name,
-                                    "category": category,
-                                    "prices": prices, # Keep original prices for debug/upload?
-                                    "average_price": average,
-                                    "timestamp": int(time.time() * 1000)
-                                }
-
-                                # DEBUG: Dump raw observation to file
-                                if config_manager.get("debug_mode"):
-                                    try:
-                                        with open("observations.json", "a", encoding="utf-8") as f:
-                                            f.write(json.dumps(observation, ensure_ascii=False) + "\n")
-                                    except Exception as e:
-                                        self.log(f"Error dumping observation: {e}", "ERROR")
-                                
-                                if self.callback:
-                                    self.log(f"Sending observation for {name}", "INFO")
-                                    self.callback(observation)
-                            else:
-                                self.log(f"Average price is 0 or less, ignoring", "DEBUG")
-                        else:
-                            pass
-                            # self.log("Failed to parse GID or prices", "DEBUG")
-                                    
-                except Exception as e:
-                    self.log(f"Error processing packet: {e}", "ERROR")
+                                    logger.debug("[WARNING] GID %s found but prices expired (%.1fs ago).", g, time.time() - self.last_price_time)
+
+                elif type_suffix == b'hyp':
+                    # HYP packets contain unreliable prices (often averages or history, not current HDV)
+                    # We ignore them to avoid polluting the data with incorrect values.
+                    # _, p = parse_hyp_packet(msg_payload)
+                    pass
+                elif type_suffix == b'hzm':
+                    # Bank/Storage content packet - contains all items in player's bank
+                    bank_items = parse_hzm_packet(msg_payload)
+                    if bank_items:
+                        logger.info("[BANK] Received storage content: %d items", len(bank_items))
+                        if self.on_bank_content:
+                            self.on_bank_content(bank_items)
+                elif type_suffix == b'jcr':
+                    # JCR packets are handled separately above with special buffering
+                    # This case should not be reached for bank content
+                    pass
+                else:
+                    # Heuristic check for GID 15715 in raw payload to find missing packets
+                    # if b'\xe3\x7a' in msg_payload:
+                    #      self.log(f"[HEURISTIC] Found GID 15715 (VarInt) in packet {type_suffix}", "DEBUG")
+
+                    # Only analyze interesting packets (likely price lists > 50 bytes)
+                    if len(msg_payload) > 50:
+                        pass
+                        # self.log(f"[CANDIDATE] Unknown suffix {type_suffix} (len={len(msg_payload)})", "INFO")
+                        # self.log("--- PROTOBUF STRUCTURE ANALYSIS ---", "INFO")
+                        # self.log_protobuf_structure(msg_payload)
+                        # self.log("-----------------------------------", "INFO")
+                    else:
+                        pass
+                        # self.log(f"Ignored small unknown packet: {type_suffix} (len={len(msg_payload)})", "DEBUG")
+
+                    # Try all just in case
+                    gid, prices = parse_jcg_packet(msg_payload)
+                    if not gid or not prices:
+                        gid, prices = parse_jbo_packet(msg_payload)
+                    if not gid or not prices:
+                        gid, prices = parse_iqb_packet(msg_payload)
+                    # if not gid or not prices:
+                    #    gid, prices = parse_iqw_packet(msg_payload)
+                    # if not gid or not prices:
+                    #    gid, prices = parse_jeu_packet(msg_payload)
+
+                parsed_at = time.perf_counter_ns()
+                PARSE_SECONDS.observe((parsed_at - parse_started) / 1e9, suffix_label)
+                if msg_id:
+                    tracer.add("parse", parse_started, parsed_at, msg=msg_id, suffix=suffix_label, gid=gid)
+
+                if gid and prices:
+                    self._process_prices(gid, prices, suffix_label, msg_payload, msg_id)
+            except Exception as e:
+                logger.error("Error processing packet: %s", e)
+
+    def _handle_labot(self, flow):
+        """Flux Dofus 2 (framing labot) : découpe les messages et traite ceux qui portent des prix."""
+        try:
+            for msg in self.protocols.decoders[LABOT].messages(flow):
+                msg_type = msg.msgType
+                if msg_type is None:
+                    # Message sans définition : seulement compté, jamais décodé
+                    MESSAGES.inc(LABOT)
+                    continue
+                label = msg_type["name"]
+                MESSAGES.inc(label)
+                msg_id = tracer.next_id() if tracer.enabled else 0
+                parse_started = time.perf_counter_ns()
+                if msg_id:
+                    tracer.add("reassemble", flow.started_ns, parse_started, msg=msg_id, bytes=len(msg.data))
+
+                entries = msg.json().get("itemTypeDescriptions", ())
+
+                parsed_at = time.perf_counter_ns()
+                PARSE_SECONDS.observe((parsed_at - parse_started) / 1e9, label)
+                if msg_id:
+                    tracer.add("parse", parse_started, parsed_at, msg=msg_id, suffix=label, lots=len(entries))
+
+                # Une entrée par item de la catégorie consultée à l'HDV
+                for entry in entries:
+                    gid = entry["objectGID"]
+                    prices = entry["prices"]
+                    if gid and prices:
+                        self._process_prices(gid, prices, label, msg.data.data, msg_id)
+        except Exception as e:
+            logger.error("Error processing packet: %s", e)
+
+    def _process_prices(self, gid, prices, label, payload, msg_id):
+        """Enrichit, filtre et publie une liste de prix décodée (quel que soit le protocole)."""
+        logger.debug("Packet parsed: GID=%s, Prices=%d", gid, len(prices))
+
+        # DEBUG: Dump packet for analysis
+        if self.debug_mode:
+            try:
+                filename = f"debug_packets/{gid}_{label}_{int(time.time())}.bin"
+                with open(filename, "wb") as f:
+                    f.write(payload)
+            except Exception as e:
+                logger.error("Error dumping packet: %s", e)
+
+        enrich_started = time.perf_counter_ns()
+        name = game_data.get_item_name(gid)
+
+        if not name:
+            logger.debug("Unknown item: %s", gid)
+            OBSERVATIONS.inc("unknown_item")
+            if self.on_unknown_item:
+                self.on_unknown_item(gid, prices)
+                return
+            else:
+                return
+
+        # Determine processing strategy based on item type
+        is_equipment = game_data.is_equipment(gid)
+        category = game_data.get_item_category(gid)
+        if not category:
+            category = "Catégorie Inconnue"
+
+        filter_started = time.perf_counter_ns()
+        if msg_id:
+            tracer.add("enrich", enrich_started, filter_started, msg=msg_id, gid=gid)
+
+        if is_equipment:
+            # For equipment, we only take the minimum price (cheapest)
+            # because each item is unique (stats vary)
+            # Filter out zeros (artifacts/placeholders)
+            valid_prices = [p for p in prices if p > 0]
+            if valid_prices:
+                min_price = min(valid_prices)
+                logger.debug("Item %s is Equipment (%s). Using min price: %s", name, category, min_price)
+                filtered_prices = [min_price]
+                average = min_price
+            else:
+                logger.debug("Item %s is Equipment (%s) but no valid prices found.", name, category)
+                average = 0
+        else:
+            # For resources, we filter anomalies and calculate average
+            filtered_prices, average = self.filter.filter_prices(prices)
+            logger.debug("Filtered: %d prices, Avg=%s", len(filtered_prices), average)
+
+        if average > 0:
+            # Compare with this item's recent history: suspicious prices are flagged, not dropped
+            server = config_manager.get("server")
+            timestamp = int(time.time() * 1000)
+            assessment = self.filter.assess(server, gid, average)
+            if msg_id:
+                tracer.add("filter", filter_started, time.perf_counter_ns(), msg=msg_id, gid=gid, lots=len(prices))
+            # Quantiles par fenêtre : alimentés par les prix unitaires retenus
+            market_aggregates.add(server, gid, filtered_prices, timestamp)
+            if assessment["suspicious"]:
+                logger.info("[ANOMALY] %s: %s outside [%.0f, %.0f] (expected ~%.0f)",
+                            name, average, assessment["lower"], assessment["upper"], assessment["expected"])
+
+            observation = {
+                "gid": gid,
+                "name": name,
+                "category": category,
+                "prices": prices, # Keep original prices for debug/upload?
+                "average_price": average,
+                "timestamp": timestamp,
+                "suspicious": assessment["suspicious"],
+                "expected_price": assessment["expected"]
+            }
+
+            # Local history (batched writes on the store thread); raw prices kept in debug mode
+            enqueue_started = time.perf_counter_ns()
+            observation_store.add(server, observation, keep_prices=self.debug_mode)
+
+            OBSERVATIONS.inc("suspicious" if assessment["suspicious"] else "emitted")
+            if self.callback:
+                logger.info("Sending observation for %s", name)
+                self.callback(observation)
+            if msg_id:
+                tracer.add("enqueue", enqueue_started, time.perf_counter_ns(), msg=msg_id, gid=gid)
+        else:
+            logger.debug("Average price is 0 or less, ignoring")
+            OBSERVATIONS.inc("filtered_out")
@@ -0,0 +1,213 @@
+"""
+Traces de performance optionnelles ("trace_enabled").
+
+Chaque message traité par le sniffer produit des spans horodatés avec
+time.perf_counter_ns() (capture → reassemble → parse → enrich → filter → enqueue),
+gardés dans un tampon circulaire. Le tout s'exporte au format Chrome trace
+(chrome://tracing, Perfetto) : un fichier que l'utilisateur peut nous envoyer.
+
+Un profileur par échantillonnage peut en plus relever la pile des threads de
+capture pendant N secondes ; les échantillons sont inclus dans l'export.
+"""
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+from utils.config import config_manager
+from utils.logger import get_logger
+
+logger = get_logger("sniffer")
+
+TRACE_DIR = "traces"
+DEFAULT_BUFFER_SIZE = 20000
+# Intervalle (s) entre deux échantillons du profileur
+SAMPLE_INTERVAL = 0.005
+# Profondeur maximale des piles échantillonnées
+MAX_STACK_DEPTH = 64
+
+
+class _NoopSpan:
+    """Span renvoyé quand les traces sont désactivées : aucune mesure, aucune allocation."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start, time.perf_counter_ns(), **self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    def __init__(self, capacity=DEFAULT_BUFFER_SIZE):
+        self.enabled = False
+        # deque.append est atomique : pas de verrou côté producteur
+        self.spans = collections.deque(maxlen=capacity)
+        self.samples = collections.deque(maxlen=capacity * 5)
+        self.thread_names = {}
+        self.profiler = None
+        self._next_id = 0
+
+    def apply_config(self, snapshot):
+        self.enabled = bool(snapshot.get("trace_enabled", False))
+        capacity = snapshot.get("trace_buffer_size", DEFAULT_BUFFER_SIZE)
+        if capacity != self.spans.maxlen:
+            self.spans = collections.deque(self.spans, maxlen=capacity)
+            self.samples = collections.deque(self.samples, maxlen=capacity * 5)
+
+    def next_id(self):
+        """Identifiant de message, pour relier les spans d'un même message."""
+        self._next_id += 1
+        return self._next_id
+
+    def span(self, name, **args):
+        """Context manager mesurant un bloc (NOOP_SPAN si les traces sont désactivées)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self, name, args)
+
+    def add(self, name, start_ns, end_ns, **args):
+        """Enregistre un span déjà mesuré (horloge time.perf_counter_ns())."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        self.thread_names[thread.ident] = thread.name
+        self.spans.append((name, start_ns, end_ns - start_ns, thread.ident, args))
+
+    def clear(self):
+        self.spans.clear()
+        self.samples.clear()
+
+    # --- Profileur ---
+
+    def start_profiler(self, seconds, threads=None, interval=SAMPLE_INTERVAL):
+        """
+        Échantillonne les piles des threads donnés (tous sauf le profileur si None)
+        pendant `seconds` secondes. Retourne False si un profilage est déjà en cours.
+        """
+        if self.profiler is not None and self.profiler.is_alive():
+            return False
+        idents = None if threads is None else {thread.ident for thread in threads if thread is not None}
+        self.profiler = SamplingProfiler(self, seconds, idents, interval)
+        self.profiler.start()
+        return True
+
+    # --- Export ---
+
+    def export_chrome_trace(self, path=None):
+        """Écrit les spans (et échantillons) au format Chrome trace JSON. Retourne le chemin du fichier."""
+        if path is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            path = os.path.join(TRACE_DIR, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+
+        pid = os.getpid()
+        events = [
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self.thread_names.items())
+        ]
+        for name, start_ns, duration_ns, tid, args in list(self.spans):
+            events.append({
+                "ph": "X", "name": name, "cat": "pipeline", "pid": pid, "tid": tid,
+                "ts": start_ns / 1000.0, "dur": duration_ns / 1000.0, "args": args,
+            })
+
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        samples = list(self.samples)
+        if samples:
+            trace["stackFrames"], trace["samples"] = _encode_samples(samples)
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, separators=(",", ":"), default=str)
+        logger.info("Trace exportée: %s (%d spans, %d échantillons)", path, len(self.spans), len(samples))
+        return path
+
+
+class SamplingProfiler(threading.Thread):
+    """Relève périodiquement la pile des threads ciblés via sys._current_frames()."""
+    def __init__(self, tracer, seconds, idents=None, interval=SAMPLE_INTERVAL):
+        super().__init__(name="trace-profiler", daemon=True)
+        self.tracer = tracer
+        self.seconds = seconds
+        self.idents = idents
+        self.interval = interval
+        self.count = 0
+
+    def run(self):
+        logger.info("Profilage par échantillonnage pendant %ss...", self.seconds)
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        self.tracer.thread_names.update(names)
+        deadline = time.monotonic() + self.seconds
+
+        while time.monotonic() < deadline:
+            now_ns = time.perf_counter_ns()
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.idents is not None and ident not in self.idents):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append((code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self.tracer.samples.append((now_ns, ident, tuple(stack)))
+                self.count += 1
+            time.sleep(self.interval)
+
+        logger.info("Profilage terminé: %d échantillons.", self.count)
+
+
+def _encode_samples(samples):
+    """Convertit des piles en (stackFrames, samples) du format Chrome trace (cadres partagés par préfixe)."""
+    frames = {}
+    frame_ids = {}
+    encoded = []
+    for timestamp_ns, tid, stack in samples:
+        parent = None
+        for function, filename, line in stack:
+            key = (parent, function, filename, line)
+            frame_id = frame_ids.get(key)
+            if frame_id is None:
+                frame_id = str(len(frame_ids) + 1)
+                frame_ids[key] = frame_id
+                frame = {"name": f"{function} ({filename}:{line})", "category": filename}
+                if parent is not None:
+                    frame["parent"] = parent
+                frames[frame_id] = frame
+            parent = frame_id
+        if parent is not None:
+            encoded.append({"cpu": 0, "tid": tid, "ts": timestamp_ns / 1000.0, "name": "sample", "sf": parent, "weight": 1})
+    return frames, encoded
+
+
+tracer = Tracer()
+tracer.apply_config(config_manager.config)
+config_manager.subscribe(lambda changes, snapshot: tracer.apply_config(snapshot), keys=["trace_enabled", "trace_buffer_size"])
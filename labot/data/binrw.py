@@ -1,6 +1,68 @@
 from zlib import decompress
 import struct
 
+_BYTE = struct.Struct("!b")
+_UBYTE = struct.Struct("!B")
+_SHORT = struct.Struct("!h")
+_USHORT = struct.Struct("!H")
+_INT = struct.Struct("!i")
+_UINT = struct.Struct("!I")
+_FLOAT = struct.Struct("!f")
+_DOUBLE = struct.Struct("!d")
+
+
+def _printable(data):
+    """Views are shown as the bytes they cover"""
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return data
+
+
+def read_var(data, pos, bits):
+    """Decode a varint (7 bits per byte, little-endian groups) at pos.
+    Returns (value, position after it)."""
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    ans = b & 0x7F
+    shift = 7
+    while shift < bits:
+        b = data[pos]
+        pos += 1
+        ans |= (b & 0x7F) << shift
+        if b < 0x80:
+            return ans, pos
+        shift += 7
+    raise Exception("Too much data")
+
+
+def read_vars(data, pos, count, bits):
+    """Decode `count` consecutive varints in one loop (vectors of VarUhLong,
+    VarUhInt...). Returns (values, position after them)."""
+    values = []
+    append = values.append
+    for _ in range(count):
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            append(b)
+            continue
+        ans = b & 0x7F
+        shift = 7
+        while True:
+            if shift >= bits:
+                raise Exception("Too much data")
+            b = data[pos]
+            pos += 1
+            ans |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        append(ans)
+    return values, pos
+
+
 class Data:
     def __init__(self, data=None):
         if data is None:
@@ -27,7 +89,7 @@ class Data:
         )
 
     def __repr__(self):
-        return str.format("{}({!r})", self.__class__.__name__, self.data)
+        return str.format("{}({!r})", self.__class__.__name__, _printable(self.data))
 
     def remaining(self):
         return len(self) - self.pos
@@ -52,6 +114,19 @@ class Data:
         self.pos += l
         return self.data[pos : pos + l]
 
+    def readView(self, l):
+        """Next l bytes as a memoryview of the underlying buffer (no copy)"""
+        self.verif(l)
+        pos = self.pos
+        self.pos += l
+        return memoryview(self.data)[pos : pos + l]
+
+    def _unpack(self, compiled):
+        self.verif(compiled.size)
+        pos = self.pos
+        self.pos = pos + compiled.size
+        return compiled.unpack_from(self.data, pos)[0]
+
     def write(self, l):
         self.data += l
 
@@ -59,9 +134,9 @@ class Data:
         self.data = bytearray(decompress(self.data))
 
     def readBoolean(self):
-        ans = self.read(1)
-        assert ans[0] in [0, 1]
-        return bool(ans[0])
+        ans = self._unpack(_UBYTE)
+        assert ans in [0, 1]
+        return bool(ans)
 
     def writeBoolean(self, b):
         if b:
@@ -70,7 +145,7 @@ class Data:
             self.data += b"\x00"
 
     def readByte(self):
-        return int.from_bytes(self.read(1), "big", signed=True)
+        return self._unpack(_BYTE)
 
     def writeByte(self, b):
         self.data += b.to_bytes(1, "big", signed=True)
@@ -84,32 +159,32 @@ class Data:
         self.data += ba
 
     def readDouble(self):
-        return struct.unpack("!d", self.read(8))[0]
+        return self._unpack(_DOUBLE)
 
     def writeDouble(self, d):
         self.data += struct.pack("!d", d)
 
     def readFloat(self):
-        return struct.unpack("!f", self.read(4))[0]
+        return self._unpack(_FLOAT)
 
     def writeFloat(self, f):
         self.data += struct.pack("!f", f)
 
     def readInt(self):
-        return int.from_bytes(self.read(4), "big", signed=True)
+        return self._unpack(_INT)
 
     def writeInt(self, i):
         self.data += i.to_bytes(4, "big", signed=True)
 
     def readShort(self):
-        return int.from_bytes(self.read(2), "big", signed=True)
+        return self._unpack(_SHORT)
 
     def writeShort(self, s):
         self.data += s.to_bytes(2, "big", signed=True)
 
     def readUTF(self):
         lon = self.readUnsignedShort()
-        return self.read(lon).decode()
+        return str(self.read(lon), "utf-8")
 
     def writeUTF(self, ch):
         dat = ch.encode()
@@ -117,19 +192,19 @@ class Data:
         self.data += dat
 
     def readUnsignedByte(self):
-        return int.from_bytes(self.read(1), "big")
+        return self._unpack(_UBYTE)
 
     def writeUnsignedByte(self, b):
         self.data += b.to_bytes(1, "big")
 
     def readUnsignedInt(self):
-        return int.from_bytes(self.read(4), "big")
+        return self._unpack(_UINT)
 
     def writeUnsignedInt(self, ui):
         self.data += ui.to_bytes(4, "big")
 
     def readUnsignedShort(self):
-        return int.from_bytes(self.read(2), "big")
+        return self._unpack(_USHORT)
 
     def writeUnsignedShort(self, us):
         self.data += us.to_bytes(2, "big")
@@ -144,14 +219,23 @@ class Data:
                 b |= 0b10000000
             self.writeUnsignedByte(b)
 
+    def _readVar(self, bits):
+        try:
+            ans, self.pos = read_var(self.data, self.pos, bits)
+        except IndexError:
+            raise IndexError(self.pos, 1, len(self))
+        return ans
+
+    def readVars(self, count, bits=64):
+        """`count` consecutive varints, decoded in a single pass"""
+        try:
+            ans, self.pos = read_vars(self.data, self.pos, count, bits)
+        except IndexError:
+            raise IndexError(self.pos, count, len(self))
+        return ans
+
     def readVarInt(self):
-        ans = 0
-        for i in range(0, 32, 7):
-            b = self.readUnsignedByte()
-            ans += (b & 0b01111111) << i
-            if not b & 0b10000000:
-                return ans
-        raise Exception("Too much data")
+        return self._readVar(32)
 
     def writeVarInt(self, i):
         assert i.bit_length() <= 32
@@ -164,13 +248,7 @@ class Data:
         self.writeVarInt(i)
 
     def readVarLong(self):
-        ans = 0
-        for i in range(0, 64, 7):
-            b = self.readUnsignedByte()
-            ans += (b & 0b01111111) << i
-            if not b & 0b10000000:
-                return ans
-        raise Exception("Too much data")
+        return self._readVar(64)
 
     def writeVarLong(self, i):
         assert i.bit_length() <= 64
@@ -183,13 +261,7 @@ class Data:
         self.writeVarLong(i)
 
     def readVarShort(self):
-        ans = 0
-        for i in range(0, 16, 7):
-            b = self.readByte()
-            ans += (b & 0b01111111) << i
-            if not b & 0b10000000:
-                return ans
-        raise Exception("Too much data")
+        return self._readVar(16)
 
     def writeVarShort(self, i):
         assert i.bit_length() <= 16
@@ -203,11 +275,77 @@ class Data:
 
 
 class Buffer(Data):
+    """Framing buffer. Appended bytes are queued as chunks and only joined
+    when a read needs them; parsed messages are dropped by moving a consumed
+    offset. The remaining bytes are copied (compacted) at the next join, so
+    each byte is moved a bounded number of times, and the head is an
+    immutable bytes object: views handed out by readView() stay valid."""
+    def __init__(self, data=None):
+        super().__init__(bytes(data) if data else b"")
+        self.start = 0
+        self._chunks = []
+        self._chunks_len = 0
+
+    def __len__(self):
+        return len(self.data) + self._chunks_len
+
+    def __bool__(self):
+        return len(self) > self.start
+
+    def __iadd__(self, by):
+        if self.start >= len(self.data) and not self._chunks:
+            # Everything consumed: the new bytes become the head
+            self.data = bytes(by)
+            self.pos -= self.start
+            self.start = 0
+        else:
+            self._chunks.append(bytes(by))
+            self._chunks_len += len(by)
+        return self
+
+    def write(self, l):
+        self += l
+
+    def _join(self):
+        """Compact: head without its consumed bytes + queued chunks"""
+        parts = [self.data[self.start:]] if self.start < len(self.data) else []
+        self.data = b"".join(parts + self._chunks)
+        self.pos -= self.start
+        self.start = 0
+        self._chunks = []
+        self._chunks_len = 0
+
+    def verif(self, l):
+        if self._chunks and self.pos + l > len(self.data):
+            self._join()
+        super().verif(l)
+
+    def _readVar(self, bits):
+        if self._chunks:
+            self._join()
+        return super()._readVar(bits)
+
+    def readVars(self, count, bits=64):
+        if self._chunks:
+            self._join()
+        return super().readVars(count, bits)
+
+    def peek(self):
+        """Unconsumed bytes (joined), position unchanged"""
+        if self._chunks:
+            self._join()
+        return self.data[self.start:]
+
+    def rewind(self):
+        """Back to the first unconsumed byte (incomplete message)"""
+        self.pos = self.start
+
     def end(self):
-        """Very efficient
-        """
-        del self.data[: self.pos]
-        self.pos = 0
+        """Mark everything read so far as consumed (no bytes are moved)"""
+        self.start = self.pos
+        if self.start >= len(self.data) and not self._chunks:
+            self.data = b""
+            self.pos = self.start = 0
 
     def reset(self):
         self.__init__()
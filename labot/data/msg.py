@@ -1,10 +1,10 @@
-from .binrw import Data, Buffer
+from .binrw import Data, Buffer, _printable
 from .. import protocol
 
 class Msg:
     def __init__(self, m_id, data, count=None):
         self.id = m_id
-        if isinstance(data, bytearray):
+        if isinstance(data, (bytes, bytearray, memoryview)):
             data = Data(data)
         self.data = data
         self.count = count
@@ -14,7 +14,7 @@ class Msg:
             "{}(m_id={}, data={}, count={})",
             self.__class__.__name__,
             self.id,
-            self.data.data,
+            _printable(self.data.data),
             self.count,
         )
         return ans
@@ -24,7 +24,7 @@ class Msg:
             "{}(m_id={}, data={!r}, count={})",
             self.__class__.__name__,
             self.id,
-            self.data.data,
+            _printable(self.data.data),
             self.count,
         )
         return ans
@@ -37,12 +37,12 @@ class Msg:
         if not buf:
             return
         try:
-            if len(buf) < 2:
+            if buf.remaining() < 2:
                 return None
             header = buf.readUnsignedShort()
             if from_client:
                 if len(buf) < buf.pos + 4:
-                    buf.pos = 0
+                    buf.rewind()
                     return None
                 count = buf.readUnsignedInt()
             else:
@@ -50,19 +50,20 @@ class Msg:
             
             len_type = header & 3
             if len(buf) < buf.pos + len_type:
-                buf.pos = 0
+                buf.rewind()
                 return None
                 
             lenData = int.from_bytes(buf.read(len_type), "big")
             id = header >> 2
             
             if len(buf) < buf.pos + lenData:
-                buf.pos = 0
+                buf.rewind()
                 return None
                 
-            data = Data(buf.read(lenData))
+            # Body as a view of the buffer: no copy per message
+            data = Data(buf.readView(lenData))
         except IndexError:
-            buf.pos = 0
+            buf.rewind()
             # logger.debug("Could not parse message: Not complete")
             return None
         else:
@@ -99,5 +100,5 @@ class Msg:
 
     def json(self):
         if not hasattr(self, "parsed"):
-            self.parsed = protocol.read(self.msgType, self.data)
+            self.parsed = protocol.decode(self.msgType, self.data)
         return self.parsed
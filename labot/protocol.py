@@ -1,5 +1,6 @@
 from .data.binrw import Data
 import logging
+import struct
 
 logger = logging.getLogger("labot")
 
@@ -56,3 +57,154 @@ def read(type_def, data: Data):
             ans[var["name"]] = read(var["type"], data)
             
     return ans
+
+
+# --- Compiled decoders ---
+#
+# Each type/message definition is turned into a Python function
+# decode_<Name>(buf, pos) -> (dict, new pos), specialized for its fields:
+# no string comparison or definition lookup per field at decode time.
+
+# Fixed-size primitives: struct format
+_STRUCT_TYPES = {
+    "Int": ">i",
+    "UnsignedInt": ">I",
+    "Short": ">h",
+    "UnsignedShort": ">H",
+    "Byte": ">b",
+    "UnsignedByte": ">B",
+    "Double": ">d",
+    "Float": ">f",
+}
+
+# Varints: maximum number of bits
+_VAR_TYPES = {
+    "VarInt": 32,
+    "VarUhInt": 32,
+    "VarLong": 64,
+    "VarUhLong": 64,
+    "VarShort": 16,
+    "VarUhShort": 16,
+}
+
+_decoders = {}
+
+
+def _struct_name(type_name):
+    return "_S_" + type_name
+
+
+def _emit_value(lines, indent, target, type_name):
+    """Lines reading one value of type_name from buf at pos into target"""
+    pad = " " * indent
+    if type_name in _STRUCT_TYPES:
+        fmt = struct.Struct(_STRUCT_TYPES[type_name])
+        lines.append(f"{pad}{target} = {_struct_name(type_name)}(buf, pos)[0]")
+        lines.append(f"{pad}pos += {fmt.size}")
+    elif type_name in _VAR_TYPES:
+        # Single-byte fast path inlined, longer varints through read_var
+        lines.append(f"{pad}b = buf[pos]")
+        lines.append(f"{pad}if b < 0x80:")
+        lines.append(f"{pad}    {target} = b")
+        lines.append(f"{pad}    pos += 1")
+        lines.append(f"{pad}else:")
+        lines.append(f"{pad}    {target}, pos = read_var(buf, pos, {_VAR_TYPES[type_name]})")
+    elif type_name == "Boolean":
+        lines.append(f"{pad}{target} = buf[pos] != 0")
+        lines.append(f"{pad}pos += 1")
+    elif type_name == "UTF":
+        lines.append(f"{pad}n = _S_UnsignedShort(buf, pos)[0]")
+        lines.append(f"{pad}{target} = bytes(buf[pos + 2:pos + 2 + n]).decode()")
+        lines.append(f"{pad}pos += 2 + n")
+    elif type_name in types:
+        lines.append(f"{pad}{target}, pos = decode_{type_name}(buf, pos)")
+    else:
+        raise Exception(f"Unknown type: {type_name}")
+
+
+def _emit_decoder(type_def):
+    """Python source of the decoder of a type or message definition"""
+    name = type_def["name"]
+    lines = [f"def decode_{name}(buf, pos):", f"    ans = {{'__type__': {name!r}}}"]
+    for var in type_def["vars"]:
+        target = f"ans[{var['name']!r}]"
+        if var["type"] != "Vector":
+            _emit_value(lines, 4, target, var["type"])
+            continue
+        _emit_value(lines, 4, "count", var["length_type"])
+        inner = var["inner_type"]
+        if inner in _VAR_TYPES:
+            lines.append(f"    {target}, pos = read_vars(buf, pos, count, {_VAR_TYPES[inner]})")
+        elif inner in _STRUCT_TYPES:
+            size = struct.calcsize(_STRUCT_TYPES[inner])
+            fmt = _STRUCT_TYPES[inner][0] + "%d" + _STRUCT_TYPES[inner][1:]
+            lines.append(f"    {target} = list(struct.unpack_from({fmt!r} % count, buf, pos))")
+            lines.append(f"    pos += count * {size}")
+        else:
+            lines.append("    items = []")
+            lines.append("    for _ in range(count):")
+            _emit_value(lines, 8, "item", inner)
+            lines.append("        items.append(item)")
+            lines.append(f"    {target} = items")
+    lines.append("    return ans, pos")
+    return "\n".join(lines) + "\n"
+
+
+def generate_source():
+    """Source of a module holding the decoders of every known type and message"""
+    parts = [
+        "# Generated by labot.protocol.generate_source(), do not edit.",
+        "import struct",
+        "from labot.data.binrw import read_var, read_vars",
+        "",
+    ]
+    for type_name, fmt in _STRUCT_TYPES.items():
+        parts.append(f"{_struct_name(type_name)} = struct.Struct({fmt!r}).unpack_from")
+    parts.append("")
+    definitions = list(types.values()) + list(msg_from_id.values())
+    for type_def in definitions:
+        parts.append("")
+        parts.append(_emit_decoder(type_def))
+    return "\n".join(parts)
+
+
+def emit_module(path):
+    """Write the generated decoders to a module file"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(generate_source())
+
+
+def compile_decoders():
+    """(Re)build the decoders from the current definitions"""
+    namespace = {}
+    exec(compile(generate_source(), "<labot.protocol decoders>", "exec"), namespace)
+    _decoders.clear()
+    for type_def in list(types.values()) + list(msg_from_id.values()):
+        _decoders[type_def["name"]] = namespace["decode_" + type_def["name"]]
+
+
+def decoder(type_def):
+    """Compiled decoder (buf, pos) -> (value, pos) of a definition or type name"""
+    name = type_def if isinstance(type_def, str) else type_def["name"]
+    fn = _decoders.get(name)
+    if fn is None:
+        compile_decoders()
+        fn = _decoders.get(name)
+        if fn is None:
+            raise Exception(f"Unknown type: {name}")
+    return fn
+
+
+def decode(type_def, data: Data):
+    """Same result as read(type_def, data), through the compiled decoder"""
+    fn = decoder(type_def)
+    start = data.pos
+    try:
+        ans, data.pos = fn(data.data, start)
+    except (IndexError, struct.error):
+        # Error path only: re-read with the interpreter so the IndexError
+        # carries the failing offset, as raised by Data.verif
+        data.pos = start
+        read(type_def, data)
+        raise IndexError(data.pos, 0, len(data))
+    return ans
@@ -0,0 +1,166 @@
+"""
+Boucle asyncio unique pour le travail réseau de l'application.
+
+Un seul thread héberge la boucle ; l'uploader, l'envoi des images, la
+résolution des noms d'items, le chargement des profils et la vérification des
+mises à jour y tournent comme des coroutines. Chaque type de travail a sa
+"voie", avec une concurrence maximale : un envoi d'images lent ne bloque pas
+les recherches de noms, et le backend ne reçoit jamais plus de N requêtes d'un type.
+
+Les requêtes HTTP passent par aiohttp s'il est installé, sinon par requests
+dans un pool de threads borné. Le sniffer et l'interface Tk soumettent leur
+travail via submit() / run_in_lane(), utilisables depuis n'importe quel thread.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import json
+import threading
+
+import requests
+
+from utils.logger import get_logger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = get_logger("uploader")
+
+# Concurrence maximale par voie
+LANES = {
+    "upload": 2,     # Lots d'observations, banque
+    "assets": 2,     # Images d'items
+    "lookup": 4,     # DofusDB, items appris
+    "background": 2, # Profils, mises à jour
+}
+
+
+class Response:
+    """Réponse HTTP minimale (interface compatible avec requests.Response pour notre usage)."""
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class NetworkCore:
+    def __init__(self, lanes=LANES):
+        self.lanes = dict(lanes)
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.session = None
+        # Un thread par place de voie : un appel bloquant n'attend jamais un thread libre
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=sum(self.lanes.values()), thread_name_prefix="network"
+        )
+
+    def start(self):
+        """Démarre la boucle (idempotent, appelé automatiquement à la première soumission)."""
+        with self.lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(loop, ready), name="network-loop", daemon=True)
+            self.thread.start()
+            ready.wait()
+            self.loop = loop
+
+    def _run(self, loop, ready):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Planifie une coroutine sur la boucle. Retourne un concurrent.futures.Future."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def call_soon(self, func, *args):
+        """Exécute une fonction dans le thread de la boucle (ex: réveiller une coroutine). Ignoré si la boucle est arrêtée."""
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(func, *args)
+
+    def run_in_lane(self, lane, func, *args, **kwargs):
+        """Exécute une fonction bloquante dans une voie, depuis n'importe quel thread. Retourne un Future."""
+        return self.submit(self.blocking(lane, func, *args, **kwargs))
+
+    def _semaphore(self, lane):
+        semaphore = self.semaphores.get(lane)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.lanes.get(lane, 1))
+            self.semaphores[lane] = semaphore
+        return semaphore
+
+    async def blocking(self, lane, func, *args, **kwargs):
+        """Coroutine : exécute une fonction bloquante dans le pool, dans la limite de la voie."""
+        async with self._semaphore(lane):
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def request(self, method, url, lane="lookup", **kwargs):
+        """
+        Coroutine : requête HTTP dans la limite de la voie.
+        Accepte les arguments de requests (json, data, headers, params, timeout, files).
+        """
+        if aiohttp is None or "files" in kwargs:
+            return await self.blocking(lane, requests.request, method, url, **kwargs)
+
+        async with self._semaphore(lane):
+            if self.session is None:
+                self.session = aiohttp.ClientSession()
+            timeout = aiohttp.ClientTimeout(total=kwargs.pop("timeout", None))
+            async with self.session.request(method, url, timeout=timeout, **kwargs) as response:
+                content = await response.read()
+                return Response(response.status, response.headers, content)
+
+    def stop(self, timeout=5.0):
+        """Ferme la session HTTP et arrête la boucle."""
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.debug("Arrêt de la boucle réseau: %s", e)
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=False)
+
+    async def _shutdown(self):
+        """Annule les coroutines encore actives (boucles d'attente) et ferme la session HTTP."""
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def _log_failure(future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error("Tâche réseau en échec: %s", error, exc_info=error)
+
+
+network_core = NetworkCore()
@@ -0,0 +1,115 @@
+"""
+Synchronisation incrémentale du contenu de la banque.
+
+Le dernier contenu accepté par le serveur est conservé par (serveur, profil),
+avec son numéro de version. À l'ouverture suivante de la banque, seul le diff
+(emplacements ajoutés, retirés ou dont la quantité a changé) est envoyé, avec
+la version de base ; le serveur refuse le patch si sa version diffère et le
+client renvoie alors le contenu complet.
+"""
+import json
+import os
+import threading
+
+from utils.logger import get_logger
+from utils.paths import get_resource_path
+
+logger = get_logger("uploader")
+
+BANK_SNAPSHOTS_FILE = "dofus_data/bank_snapshots.json"
+
+
+def slot_key(item):
+    """Clé d'un emplacement : l'uid de l'instance si connu, sinon le GID."""
+    uid = item.get("uid")
+    return f"u{uid}" if uid else f"g{item['gid']}"
+
+
+def snapshot_from_items(bank_items):
+    """Construit {clé: [gid, quantité]} à partir de la liste décodée du paquet banque."""
+    snapshot = {}
+    for item in bank_items:
+        key = slot_key(item)
+        if key in snapshot:
+            # Même GID sans uid sur plusieurs emplacements : quantités cumulées
+            snapshot[key][1] += item["quantity"]
+        else:
+            snapshot[key] = [item["gid"], item["quantity"]]
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    """
+    Diff par emplacement entre deux snapshots.
+    Retourne {"added": [...], "removed": [...], "changed": [...]} ; chaque entrée
+    est {"key", "gid", "quantity"} (quantité absente pour les emplacements retirés).
+    """
+    added = []
+    changed = []
+    for key, (gid, quantity) in new.items():
+        previous = old.get(key)
+        if previous is None:
+            added.append({"key": key, "gid": gid, "quantity": quantity})
+        elif previous[1] != quantity or previous[0] != gid:
+            changed.append({"key": key, "gid": gid, "quantity": quantity})
+    removed = [{"key": key, "gid": gid} for key, (gid, _) in old.items() if key not in new]
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def is_empty_diff(diff):
+    return not (diff["added"] or diff["removed"] or diff["changed"])
+
+
+class BankSnapshotStore:
+    """Derniers contenus de banque acquittés, par (serveur, profil), persistés sur disque."""
+    def __init__(self, path=BANK_SNAPSHOTS_FILE):
+        self.path = get_resource_path(path)
+        self.lock = threading.Lock()
+        self.snapshots = None # Chargés au premier accès
+
+    @staticmethod
+    def _key(server, profile_id):
+        return f"{server}|{profile_id or ''}"
+
+    def _load(self):
+        if self.snapshots is not None:
+            return
+        self.snapshots = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.snapshots = json.load(f)
+        except Exception as e:
+            logger.warning("[Uploader] Snapshots de banque illisibles, envoi complet au prochain passage: %s", e)
+
+    def get(self, server, profile_id):
+        """Retourne {"version", "items"} ou None si aucun contenu n'a encore été acquitté."""
+        with self.lock:
+            self._load()
+            return self.snapshots.get(self._key(server, profile_id))
+
+    def put(self, server, profile_id, version, items):
+        with self.lock:
+            self._load()
+            self.snapshots[self._key(server, profile_id)] = {"version": version, "items": items}
+            self._save()
+
+    def forget(self, server, profile_id):
+        with self.lock:
+            self._load()
+            if self.snapshots.pop(self._key(server, profile_id), None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshots, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error("[Uploader] Erreur sauvegarde snapshots de banque: %s", e)
+
+
+bank_snapshots = BankSnapshotStore()
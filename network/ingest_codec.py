@@ -0,0 +1,164 @@
+"""
+Encodage des lots d'observations envoyés à l'API d'ingestion.
+
+Deux formats sont supportés :
+- "json"    : le format historique (une liste d'objets verbeux, non compressée)
+- "compact" : un en-tête partagé + des colonnes (gid, prix, lots, deltas de temps),
+              compressé en zstd (si disponible) ou gzip.
+"""
+import gzip
+import json
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SOURCE_CLIENT = "dofus-tracker-client-v3"
+CLIENT_VERSION = "3.0.0"
+
+COMPACT_CONTENT_TYPE = "application/vnd.dofus-tracker.ingest-columnar+json"
+COMPACT_FORMAT_VERSION = 1
+
+
+def supported_encodings():
+    """Encodages de contenu disponibles localement, par ordre de préférence."""
+    if zstandard is not None:
+        return ["zstd", "gzip"]
+    return ["gzip"]
+
+
+def parse_accept_encoding(header):
+    """Retourne la liste des encodages annoncés par le serveur (header Accept-Encoding)."""
+    if not header:
+        return []
+    encodings = []
+    for part in header.split(","):
+        token = part.split(";")[0].strip().lower()
+        if token:
+            encodings.append(token)
+    return encodings
+
+
+def choose_encoding(server_encodings=None):
+    """
+    Choisit l'encodage de compression à utiliser.
+    Si le serveur a annoncé ses encodages, on prend le premier que l'on sait produire.
+    """
+    local = supported_encodings()
+    if not server_encodings:
+        return local[0]
+    for encoding in local:
+        if encoding in server_encodings:
+            return encoding
+    return None
+
+
+def to_iso(timestamp_ms):
+    """Formate un timestamp (ms) en ISO 8601 UTC (ex: 2023-10-27T10:00:00Z)."""
+    captured_dt = datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc)
+    return captured_dt.isoformat().replace("+00:00", "Z")
+
+
+def build_json_rows(batch):
+    """Construit le payload historique (une ligne complète par observation)."""
+    return [
+        {
+            "item_name": row["name"],
+            "ankama_id": row["gid"],
+            "server": row["server"],
+            "captured_at": to_iso(row["timestamp"]),
+            "price_unit_avg": row["average_price"],
+            "nb_lots": row["nb_lots"],
+            "source_client": SOURCE_CLIENT,
+            "client_version": CLIENT_VERSION,
+            "raw_item_name": row["name"], # Pour l'instant identique
+            "category": row["category"]
+        }
+        for row in batch
+    ]
+
+
+def build_compact_payload(batch, aggregates=None):
+    """
+    Construit le payload colonnaire.
+
+    Les champs constants sont factorisés dans l'en-tête. Les timestamps sont
+    encodés en deltas (ms) par rapport à l'observation précédente, à partir de "t0".
+    Un lot peut contenir plusieurs serveurs : le serveur le plus fréquent va dans
+    l'en-tête et une colonne "server" n'est ajoutée que si nécessaire (idem pour "suspect").
+    Les agrégats de quantiles terminés (voir core.market_aggregates) sont joints tels quels.
+    """
+    if not batch:
+        return None
+
+    servers = [row["server"] for row in batch]
+    main_server = max(set(servers), key=servers.count)
+
+    t0 = batch[0]["timestamp"]
+    previous = t0
+    deltas = []
+    for row in batch:
+        deltas.append(row["timestamp"] - previous)
+        previous = row["timestamp"]
+
+    columns = {
+        "gid": [row["gid"] for row in batch],
+        "name": [row["name"] for row in batch],
+        "category": [row["category"] for row in batch],
+        "avg": [row["average_price"] for row in batch],
+        "nb_lots": [row["nb_lots"] for row in batch],
+        "dt": deltas,
+    }
+    if any(server != main_server for server in servers):
+        columns["server"] = servers
+    # Prix jugés suspects par rapport à l'historique local de l'item (1 = suspect)
+    if any(row.get("suspicious") for row in batch):
+        columns["suspect"] = [1 if row.get("suspicious") else 0 for row in batch]
+
+    payload = {
+        "v": COMPACT_FORMAT_VERSION,
+        "server": main_server,
+        "source_client": SOURCE_CLIENT,
+        "client_version": CLIENT_VERSION,
+        "t0": t0,
+        "count": len(batch),
+        "columns": columns,
+    }
+    if aggregates:
+        payload["aggregates"] = aggregates
+    return payload
+
+
+def compress(body, encoding):
+    """Compresse un corps de requête selon l'encodage demandé."""
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstandard n'est pas installé")
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"Encodage inconnu: {encoding}")
+
+
+def encode_compact(batch, encoding, aggregates=None):
+    """
+    Encode un lot au format compact.
+    Retourne (body, headers) prêts à passer à requests.post(data=..., headers=...).
+    """
+    payload = build_compact_payload(batch, aggregates)
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body = compress(raw, encoding)
+    headers = {
+        "Content-Type": COMPACT_CONTENT_TYPE,
+        "Content-Encoding": encoding,
+    }
+    return body, headers
+
+
+def encode_json(batch):
+    """Encode un lot au format JSON historique (non compressé)."""
+    body = json.dumps(build_json_rows(batch), ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    return body, headers
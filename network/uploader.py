@@ -1,25 +1,72 @@
+import asyncio
 import threading
 import time
 import requests
-import json
 from datetime import datetime, timezone
 from utils.config import config_manager
 from core.game_data import game_data
+from core.market_aggregates import market_aggregates
+from network.async_core import network_core
+from network.bank_sync import bank_snapshots, snapshot_from_items, diff_snapshots, is_empty_diff
+from network.ingest_codec import encode_compact, encode_json, choose_encoding, parse_accept_encoding
+from utils.logger import get_logger
+from core.metrics import metrics
 
-class BatchUploader(threading.Thread):
-    def __init__(self, batch_size=50, interval=10):
-        super().__init__()
+logger = get_logger("uploader")
+
+ROWS = metrics.counter("tracker_uploader_rows_total", "Observations reçues, fusionnées, envoyées ou perdues", ("event",))
+BATCHES = metrics.counter("tracker_uploader_batches_total", "Lots envoyés, par code HTTP", ("status",))
+UPLOAD_SECONDS = metrics.histogram("tracker_uploader_request_seconds", "Durée des requêtes d'envoi de lots")
+QUEUE_SIZE = metrics.gauge("tracker_uploader_queue_size", "Observations en attente d'envoi")
+
+class BatchUploader:
+    """
+    File d'observations envoyée par lots. La boucle d'envoi est une coroutine
+    hébergée par network_core ; les envois eux-mêmes passent par la voie "upload".
+    """
+    def __init__(self, batch_size=50, interval=10, on_ack=None):
         self.queue = []
         self.lock = threading.Lock()
+        # Réveille la coroutine d'envoi (première observation, lot plein, arrêt) au lieu d'un polling
+        self.wakeup = None
+        self.task = None
         self.running = False
         self.batch_size = batch_size
         self.interval = interval
-        self.daemon = True
+
+        # Callback appelé après accusé de réception du backend : on_ack(batch, latency_stats)
+        self.on_ack = on_ack
+
+        # Adaptation dynamique : taille de lot et temps d'attente (linger) selon
+        # le débit d'arrivée observé et la latence des réponses du serveur
+        self.linger = interval
+        self.queue_started_at = 0
+        self.last_arrival = None
+        self.arrival_interval_ewma = None
+        self.upload_latency_ewma = None
+        self.last_ack = None
         
         self.api_url = config_manager.get("api_url")
         self.api_token = config_manager.get("api_token")
         self.server = config_manager.get("server")
 
+        # Négociation du format compact : None = inconnu, True/False = résultat connu
+        self.compact_supported = None
+        self.server_encodings = []
+
+        # Fusion des doublons : (server, gid) -> ligne en attente dans la file
+        self.pending_by_key = {}
+        self.stats = {
+            "observations_received": 0,
+            "duplicates_absorbed": 0,
+        }
+
+        # Banque : envois sérialisés, patchs désactivés si le serveur les refuse
+        self.bank_lock = threading.Lock()
+        self.bank_delta_supported = None
+
+        QUEUE_SIZE.set_function(self.get_queue_size)
+
     def add_observation(self, obs):
         """
         Transforme l'observation brute du sniffer vers le format attendu par l'API
@@ -29,55 +76,150 @@ class BatchUploader(threading.Thread):
         self.server = config_manager.get("server")
         
         if not self.server:
-            print("[Uploader] Serveur non configuré, observation ignorée.")
+            logger.info("[Uploader] Serveur non configuré, observation ignorée.")
             return
 
         # Calcul du nombre de lots (prix non nuls)
         nb_lots = len([p for p in obs['prices'] if p > 0])
-        
-        # Formatage de la date en ISO 8601 UTC (ex: 2023-10-27T10:00:00Z)
-        captured_dt = datetime.fromtimestamp(obs['timestamp'] / 1000.0, tz=timezone.utc)
-        captured_iso = captured_dt.isoformat().replace("+00:00", "Z")
 
+        # Ligne interne : le format d'envoi (JSON historique ou compact) est choisi à l'upload
         payload = {
-            "item_name": obs['name'],
-            "ankama_id": obs.get('gid'),
+            "gid": obs.get('gid'),
+            "name": obs['name'],
+            "category": obs.get('category'),
             "server": self.server,
-            "captured_at": captured_iso,
-            "price_unit_avg": obs['average_price'],
+            "timestamp": obs['timestamp'],
+            "average_price": obs['average_price'],
             "nb_lots": nb_lots,
-            "source_client": "dofus-tracker-client-v3",
-            "client_version": "3.0.0",
-            "raw_item_name": obs['name'], # Pour l'instant identique
-            "category": obs.get('category')
+            "suspicious": obs.get('suspicious', False)
         }
         
         with self.lock:
+            self.stats["observations_received"] += 1
+            self._record_arrival()
+            ROWS.inc("received")
+            if self._coalesce(payload):
+                ROWS.inc("coalesced")
+                return
             self.queue.append(payload)
+            self.pending_by_key[(payload["server"], payload["gid"])] = payload
+
+            if len(self.queue) == 1:
+                self.queue_started_at = time.monotonic()
+            notify = len(self.queue) == 1 or len(self.queue) >= self.batch_size
+
+        if notify:
+            self._notify()
+
+    def _notify(self):
+        """Réveille la coroutine d'envoi (depuis n'importe quel thread)."""
+        if self.wakeup is not None:
+            network_core.call_soon(self.wakeup.set)
+
+    def _record_arrival(self):
+        """Met à jour la moyenne glissante de l'intervalle entre observations (lock acquis)."""
+        now = time.monotonic()
+        if self.last_arrival is not None:
+            # Borné pour qu'une longue pause ne fige pas l'estimation
+            gap = min(now - self.last_arrival, self._bounds()["linger_max"])
+            if self.arrival_interval_ewma is None:
+                self.arrival_interval_ewma = gap
+            else:
+                self.arrival_interval_ewma = 0.8 * self.arrival_interval_ewma + 0.2 * gap
+        self.last_arrival = now
+
+    def _bounds(self):
+        return {
+            "batch_min": config_manager.get("upload_batch_min", 10),
+            "batch_max": config_manager.get("upload_batch_max", 500),
+            "linger_min": config_manager.get("upload_linger_min", 1.0),
+            "linger_max": config_manager.get("upload_linger_max", 10.0),
+        }
+
+    def _adapt(self, upload_latency):
+        """
+        Recalcule linger et batch_size après un envoi.
+        Un serveur lent pousse vers des lots plus gros et plus espacés ; un serveur
+        rapide vers des envois plus fréquents. La taille de lot vise le nombre
+        d'observations attendues pendant le linger au débit courant.
+        """
+        bounds = self._bounds()
+
+        if self.upload_latency_ewma is None:
+            self.upload_latency_ewma = upload_latency
+        else:
+            self.upload_latency_ewma = 0.7 * self.upload_latency_ewma + 0.3 * upload_latency
+
+        linger = max(bounds["linger_min"], min(bounds["linger_max"], 5 * self.upload_latency_ewma))
 
-    def run(self):
+        with self.lock:
+            self.linger = linger
+            if self.arrival_interval_ewma:
+                expected = int(linger / self.arrival_interval_ewma)
+                self.batch_size = max(bounds["batch_min"], min(bounds["batch_max"], expected))
+
+    def _coalesce(self, payload):
+        """
+        Fusionne l'observation avec une ligne déjà en file pour le même (server, gid)
+        si elle a été capturée dans la fenêtre "coalesce_window" (secondes).
+        La ligne existante garde sa place dans la file et prend les valeurs les plus récentes ;
+        en mode "merge", le nombre de lots conservé est le maximum des deux.
+        Doit être appelé avec self.lock acquis. Retourne True si l'observation a été absorbée.
+        """
+        window_ms = config_manager.get("coalesce_window", 30) * 1000
+        if window_ms <= 0:
+            return False
+
+        existing = self.pending_by_key.get((payload["server"], payload["gid"]))
+        if existing is None or payload["timestamp"] - existing["timestamp"] > window_ms:
+            return False
+
+        nb_lots = payload["nb_lots"]
+        if config_manager.get("coalesce_mode", "latest") == "merge":
+            nb_lots = max(nb_lots, existing["nb_lots"])
+
+        existing.update(payload)
+        existing["nb_lots"] = nb_lots
+        self.stats["duplicates_absorbed"] += 1
+        return True
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def start(self):
         self.running = True
-        print("[Uploader] Service de téléversement démarré.")
-        
-        last_upload_time = time.time()
-        
+        self.task = network_core.submit(self._run())
+
+    async def _run(self):
+        self.wakeup = asyncio.Event()
+        logger.info("[Uploader] Service de téléversement démarré.")
+
         while self.running:
-            time.sleep(1)
-            
-            should_upload = False
+            # Attente passive tant que la file est vide
+            self.wakeup.clear()
+            if not self.get_queue_size():
+                await self.wakeup.wait()
+                continue
+
+            # Puis jusqu'à ce que le lot soit plein ou que le linger soit écoulé
             with self.lock:
-                queue_len = len(self.queue)
-                time_since_last = time.time() - last_upload_time
-                
-                if queue_len >= self.batch_size or (queue_len > 0 and time_since_last >= self.interval):
-                    should_upload = True
-            
-            if should_upload:
-                self.upload_batch()
-                last_upload_time = time.time()
+                deadline = self.queue_started_at + self.linger
+            while self.running:
+                self.wakeup.clear()
+                with self.lock:
+                    if len(self.queue) >= self.batch_size:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
 
-    def stop(self):
-        self.running = False
+            if self.running:
+                await network_core.blocking("upload", self.upload_batch)
 
     def get_queue_size(self):
         with self.lock:
@@ -89,39 +231,41 @@ class BatchUploader(threading.Thread):
             # On prend tout ce qu'il y a (ou limité au batch_size si on veut être strict)
             batch = self.queue[:]
             self.queue = []
+            self.pending_by_key = {}
             
         if not batch:
             return
 
-        # Force reload config from disk to pick up changes
+        # Reload config from disk only if the file changed
         try:
-            config_manager.load()
+            config_manager.reload_if_changed()
         except Exception as e:
-            print(f"[Uploader] Erreur rechargement config: {e}")
+            logger.error("[Uploader] Erreur rechargement config: %s", e)
 
         # Refresh token from config
         self.api_token = config_manager.get("api_token")
 
         if not self.api_token:
-            print(f"[Uploader] ⚠️ Erreur: Token API manquant dans config.json. Envoi annulé.")
+            logger.error("[Uploader] ⚠️ Erreur: Token API manquant dans config.json. Envoi annulé.")
             # Debug: print current config keys/values to understand why
             # print(f"[Debug] Config actuelle: {config_manager.config}")
             return
 
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_token}"
-            }
-            
-            # Debug (à retirer plus tard)
-            # print(f"[Uploader] Token utilisé: {self.api_token[:5]}...{self.api_token[-5:]}")
-
-            # print(f"[Uploader] Envoi vers {self.api_url}")
-            response = requests.post(self.api_url, json=batch, headers=headers, timeout=10)
+            sent_at = time.monotonic()
+            response = self._post_batch(batch)
+            self._adapt(time.monotonic() - sent_at)
+            UPLOAD_SECONDS.observe(time.monotonic() - sent_at)
+            BATCHES.inc(str(response.status_code))
+            ROWS.inc("sent" if response.status_code in [200, 201] else "failed", amount=len(batch))
             
             if response.status_code in [200, 201]:
-                print(f"[Uploader] {len(batch)} observations envoyées avec succès.")
+                absorbed = self.get_stats()["duplicates_absorbed"]
+                latency = self._record_ack(batch)
+                logger.info("[Uploader] %d observations envoyées avec succès (%d doublons absorbés depuis le démarrage, "
+                            "latence capture→serveur moy. %.1fs / max %.1fs).",
+                            len(batch), absorbed, latency["avg"], latency["max"],
+                            extra={"fields": {"batch": len(batch), "latency_avg": latency["avg"], "latency_max": latency["max"]}})
                 
                 # Traitement des images manquantes demandées par le serveur
                 try:
@@ -129,51 +273,122 @@ class BatchUploader(threading.Thread):
                     if "missing_images" in resp_json and isinstance(resp_json["missing_images"], list):
                         missing_gids = resp_json["missing_images"]
                         if missing_gids:
-                            print(f"[Uploader] Le serveur demande {len(missing_gids)} images manquantes.")
+                            logger.info("[Uploader] Le serveur demande %s images manquantes.", len(missing_gids))
                             for gid in missing_gids:
                                 game_data.queue_image_upload(gid)
                 except Exception as e:
-                    print(f"[Uploader] Erreur lecture réponse JSON: {e}")
+                    logger.error("[Uploader] Erreur lecture réponse JSON: %s", e)
                     
             else:
-                print(f"[Uploader] Erreur envoi ({response.status_code}): {response.text}")
+                logger.error("[Uploader] Erreur envoi (%s): %s", response.status_code, response.text)
                 if response.status_code == 401:
-                     print(f"[Uploader] Vérifiez que votre token dans config.json correspond à celui du backend.")
+                     logger.warning("[Uploader] Vérifiez que votre token dans config.json correspond à celui du backend.")
                 # En cas d'erreur, on pourrait remettre dans la queue, mais attention aux boucles infinies
                 # Pour l'instant on perd les données (ou on pourrait les dumper dans un fichier fail)
                 
         except Exception as e:
-            print(f"[Uploader] Exception réseau: {e}")
+            logger.error("[Uploader] Exception réseau: %s", e)
+            BATCHES.inc("exception")
+            ROWS.inc("failed", amount=len(batch))
             # Remettre dans la queue ?
             # with self.lock:
             #    self.queue.extend(batch)
 
+    def _record_ack(self, batch):
+        """Calcule la latence capture → accusé de réception et notifie on_ack."""
+        acked_ms = time.time() * 1000
+        latencies = [(acked_ms - row["timestamp"]) / 1000.0 for row in batch]
+        latency = {
+            "count": len(batch),
+            "avg": sum(latencies) / len(latencies),
+            "max": max(latencies),
+            "acked_at": acked_ms,
+        }
+        self.last_ack = latency
+
+        if self.on_ack:
+            try:
+                self.on_ack(batch, latency)
+            except Exception as e:
+                logger.error("[Uploader] Erreur callback on_ack: %s", e)
+        return latency
+
+    def _post_batch(self, batch):
+        """
+        Envoie un lot en choisissant le format selon "ingest_format" (auto, compact, json).
+        En mode auto, le format compact est tenté puis abandonné au profit du JSON
+        historique si le serveur le refuse (400/406/415).
+        """
+        ingest_format = config_manager.get("ingest_format", "auto")
+        use_compact = ingest_format == "compact" or (ingest_format == "auto" and self.compact_supported is not False)
+
+        if use_compact:
+            encoding = choose_encoding(self.server_encodings)
+            if encoding:
+                # Agrégats de quantiles des fenêtres terminées, remis en file si l'envoi échoue
+                aggregates = market_aggregates.collect() if config_manager.get("aggregate_upload", False) else []
+                body, headers = encode_compact(batch, encoding, aggregates)
+                headers["Authorization"] = f"Bearer {self.api_token}"
+                try:
+                    response = requests.post(self.api_url, data=body, headers=headers, timeout=10)
+                except Exception:
+                    market_aggregates.restore(aggregates)
+                    raise
+
+                if response.status_code in [200, 201]:
+                    self.compact_supported = True
+                    if aggregates:
+                        logger.debug("[Uploader] %d agrégats de quantiles envoyés.", len(aggregates))
+                    return response
+                market_aggregates.restore(aggregates)
+                if response.status_code not in [400, 406, 415]:
+                    return response
+
+                # Le serveur peut annoncer les encodages qu'il accepte (RFC 7694)
+                announced = parse_accept_encoding(response.headers.get("Accept-Encoding"))
+                if announced and announced != self.server_encodings and choose_encoding(announced) not in (None, encoding):
+                    self.server_encodings = announced
+                    return self._post_batch(batch)
+
+                logger.info("[Uploader] Format compact refusé (%s), repli sur JSON.", response.status_code)
+                self.compact_supported = False
+
+        body, headers = encode_json(batch)
+        headers["Authorization"] = f"Bearer {self.api_token}"
+        return requests.post(self.api_url, data=body, headers=headers, timeout=10)
+
     def stop(self):
         self.running = False
+        self._notify()
         # Tenter un dernier upload ?
         self.upload_batch()
 
     def upload_bank_content(self, bank_items):
         """
-        Envoie le contenu de la banque au serveur.
+        Envoie le contenu de la banque au serveur : le contenu complet, ou un patch par
+        rapport au dernier contenu acquitté pour (serveur, profil) si "bank_delta_upload"
+        est activé (le endpoint doit accepter mode=delta).
         
         Args:
             bank_items: Liste de {gid: int, quantity: int, uid: int}
+
+        Returns:
+            True si le serveur a acquitté un envoi, False sinon (y compris banque inchangée).
         """
         if not bank_items:
-            print("[Uploader] Contenu banque vide, envoi annulé.")
+            logger.info("[Uploader] Contenu banque vide, envoi annulé.")
             return False
         
         # Vérifier si l'upload est désactivé
         if config_manager.get("disable_upload", False):
-            print(f"[Uploader] Upload désactivé, banque non envoyée ({len(bank_items)} items)")
+            logger.info("[Uploader] Upload désactivé, banque non envoyée (%s items)", len(bank_items))
             return False
             
-        # Refresh config
+        # Refresh config (only if the file changed)
         try:
-            config_manager.load()
+            config_manager.reload_if_changed()
         except Exception as e:
-            print(f"[Uploader] Erreur rechargement config: {e}")
+            logger.error("[Uploader] Erreur rechargement config: %s", e)
             
         self.api_token = config_manager.get("api_token")
         self.server = config_manager.get("server")
@@ -181,21 +396,94 @@ class BatchUploader(threading.Thread):
         profile_name = config_manager.get("profile_name")
         
         if not profile_id:
-            print(f"[Uploader] ⚠️ Aucun profil sélectionné. La banque sera stockée sans profil.")
+            logger.warning("[Uploader] ⚠️ Aucun profil sélectionné. La banque sera stockée sans profil.")
         else:
-            print(f"[Uploader] Profil: {profile_name} ({profile_id[:8]}...)")
+            logger.info("[Uploader] Profil: %s (%s...)", profile_name, profile_id[:8])
         
         if not self.api_token:
-            print("[Uploader] ⚠️ Token API manquant. Banque non envoyée.")
+            logger.warning("[Uploader] ⚠️ Token API manquant. Banque non envoyée.")
             return False
             
         if not self.server:
-            print("[Uploader] ⚠️ Serveur non configuré. Banque non envoyée.")
+            logger.warning("[Uploader] ⚠️ Serveur non configuré. Banque non envoyée.")
             return False
         
-        # Préparer le payload (camelCase pour le backend)
+        # Endpoint /api/user?resource=bank
+        bank_url = self.api_url.replace("/ingest", "/user?resource=bank")
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_token}"
+        }
         captured_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-        
+        snapshot = snapshot_from_items(bank_items)
+
+        # Un seul envoi de banque à la fois : le diff doit partir de la dernière version acquittée
+        with self.bank_lock:
+            try:
+                previous = bank_snapshots.get(self.server, profile_id)
+                delta_enabled = config_manager.get("bank_delta_upload", False) and self.bank_delta_supported is not False
+                if previous and delta_enabled:
+                    diff = diff_snapshots(previous["items"], snapshot)
+                    if is_empty_diff(diff):
+                        # Rien n'est envoyé : la version acquittée reste celle du serveur
+                        logger.info("[Uploader] Banque inchangée depuis la version %s, rien à envoyer.", previous["version"])
+                        return False
+
+                    result = self._post_bank_delta(bank_url, headers, profile_id, previous["version"], diff, captured_at)
+                    if result is not None:
+                        if result:
+                            bank_snapshots.put(self.server, profile_id, result, snapshot)
+                        return bool(result)
+                    # Versions en désaccord ou patch refusé : envoi complet
+
+                version = self._post_bank_full(bank_url, headers, profile_id, bank_items, previous, captured_at)
+                if version:
+                    bank_snapshots.put(self.server, profile_id, version, snapshot)
+                return bool(version)
+
+            except Exception as e:
+                logger.error("[Uploader] Exception réseau (banque): %s", e)
+                return False
+
+    def _post_bank_delta(self, bank_url, headers, profile_id, base_version, diff, captured_at):
+        """
+        Envoie un patch de banque.
+        Retourne la nouvelle version si le patch est accepté, False en cas d'erreur,
+        ou None s'il faut renvoyer le contenu complet (version en désaccord, patch non supporté).
+        """
+        version = base_version + 1
+        payload = {
+            "server": self.server,
+            "profileId": profile_id,
+            "mode": "delta",
+            "baseVersion": base_version,
+            "version": version,
+            "added": [{"gid": entry["gid"], "quantity": entry["quantity"], "key": entry["key"]} for entry in diff["added"]],
+            "changed": [{"gid": entry["gid"], "quantity": entry["quantity"], "key": entry["key"]} for entry in diff["changed"]],
+            "removed": [{"gid": entry["gid"], "key": entry["key"]} for entry in diff["removed"]],
+            "capturedAt": captured_at
+        }
+        changes = len(diff["added"]) + len(diff["changed"]) + len(diff["removed"])
+        logger.info("[Uploader] Envoi patch banque v%s→v%s: %s ajouts, %s modifications, %s retraits",
+                    base_version, version, len(diff["added"]), len(diff["changed"]), len(diff["removed"]))
+        response = requests.post(bank_url, json=payload, headers=headers, timeout=30)
+
+        if response.status_code in [200, 201]:
+            logger.info("[Uploader] ✅ Patch banque accepté (%s changements).", changes)
+            return self._bank_version(response, version)
+        if response.status_code in [409, 412]:
+            logger.info("[Uploader] Version de banque en désaccord avec le serveur (%s), envoi complet.", response.status_code)
+            return None
+        if response.status_code in [400, 404, 415, 422]:
+            logger.info("[Uploader] Patchs de banque non supportés (%s), envoi complet.", response.status_code)
+            self.bank_delta_supported = False
+            return None
+        logger.error("[Uploader] ❌ Erreur envoi patch banque (%s): %s", response.status_code, response.text)
+        return False
+
+    def _post_bank_full(self, bank_url, headers, profile_id, bank_items, previous, captured_at):
+        """Envoie le contenu complet de la banque. Retourne la version acquittée, ou None en cas d'erreur."""
+        version = (previous["version"] + 1) if previous else 1
         payload = {
             "server": self.server,
             "profileId": profile_id,  # Peut être None si non configuré
@@ -203,28 +491,26 @@ class BatchUploader(threading.Thread):
                 {"gid": item["gid"], "quantity": item["quantity"]}
                 for item in bank_items
             ],
+            "version": version,
             "capturedAt": captured_at
         }
-        
+
+        logger.info("[Uploader] Envoi banque: %s items vers %s", len(bank_items), bank_url)
+        response = requests.post(bank_url, json=payload, headers=headers, timeout=30)
+
+        if response.status_code in [200, 201]:
+            logger.info("[Uploader] ✅ Banque envoyée: %s items.", len(bank_items))
+            return self._bank_version(response, version)
+        logger.error("[Uploader] ❌ Erreur envoi banque (%s): %s", response.status_code, response.text)
+        return None
+
+    @staticmethod
+    def _bank_version(response, default):
+        """Version retournée par le serveur (champ "version"), sinon celle envoyée."""
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_token}"
-            }
-            
-            # Endpoint /api/user?resource=bank
-            bank_url = self.api_url.replace("/ingest", "/user?resource=bank")
-            
-            print(f"[Uploader] Envoi banque: {len(bank_items)} items vers {bank_url}")
-            response = requests.post(bank_url, json=payload, headers=headers, timeout=30)
-            
-            if response.status_code in [200, 201]:
-                print(f"[Uploader] ✅ Banque envoyée: {len(bank_items)} items.")
-                return True
-            else:
-                print(f"[Uploader] ❌ Erreur envoi banque ({response.status_code}): {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"[Uploader] Exception réseau (banque): {e}")
-            return False
+            version = response.json().get("version")
+            if isinstance(version, int):
+                return version
+        except Exception:
+            pass
+        return default
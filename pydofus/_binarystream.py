@@ -2,12 +2,102 @@
 # -*- coding: utf-8 -*-
 
 from struct import *
+from array import array
+import mmap
+import sys
+import zlib
+
+# Struct objects are compiled once per format and byte order
+_STRUCTS = {}
+
+# array typecodes of the fixed-size integer/float types
+_ARRAY_TYPECODES = {"b": "b", "B": "B", "h": "h", "H": "H", "i": "i",
+                    "I": "I", "q": "q", "Q": "Q", "f": "f", "d": "d"}
+
+
+def _get_struct(fmt):
+    compiled = _STRUCTS.get(fmt)
+    if compiled is None:
+        compiled = _STRUCTS[fmt] = Struct(fmt)
+    return compiled
+
+
+class _Structs:
+    """Precompiled scalar formats for one byte order"""
+    def __init__(self, big_endian):
+        prefix = ">" if big_endian else "<"
+        self.prefix = prefix
+        self.swap = big_endian != (sys.byteorder == "big")
+        self.char = _get_struct(prefix + "b")
+        self.uchar = _get_struct(prefix + "B")
+        self.bool = _get_struct(prefix + "?")
+        self.int16 = _get_struct(prefix + "h")
+        self.uint16 = _get_struct(prefix + "H")
+        self.int32 = _get_struct(prefix + "i")
+        self.uint32 = _get_struct(prefix + "I")
+        self.int64 = _get_struct(prefix + "q")
+        self.uint64 = _get_struct(prefix + "Q")
+        self.float = _get_struct(prefix + "f")
+        self.double = _get_struct(prefix + "d")
+
+
+_BIG_ENDIAN = _Structs(True)
+_LITTLE_ENDIAN = _Structs(False)
+
+
+def _read_array(data, typecode, count, swap):
+    values = array(_ARRAY_TYPECODES[typecode])
+    if len(data) != count * values.itemsize:
+        raise error("unpack requires a buffer of %d bytes" % (count * values.itemsize))
+    values.frombytes(data)
+    if swap:
+        values.byteswap()
+    return values
+
+
+def _inflate(stream, chunk_size=None):
+    """zlib-decompress a stream in memory, returns (data, compressed size).
+    With `chunk_size`, the compressed data is read and inflated by chunks
+    through a decompressobj instead of being loaded at once."""
+    if not chunk_size:
+        compressed = stream.read()
+        return zlib.decompress(compressed), len(compressed)
+    decompressor = zlib.decompressobj()
+    data = bytearray()
+    compressed_size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        compressed_size += len(chunk)
+        data += decompressor.decompress(chunk)
+    data += decompressor.flush()
+    if not decompressor.eof:
+        raise zlib.error("incomplete or truncated stream")
+    return data, compressed_size
+
+
+def _xor_bytes(data, key):
+    """XOR `data` with a repeated key (str or bytes), in a single big-integer operation"""
+    if isinstance(key, str):
+        key = key.encode('latin-1')
+    length = len(data)
+    if not length:
+        return bytes()
+    stream = (key * (length // len(key) + 1))[:length]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(length, 'big')
+
 
 class _BinaryStream:
     """Allow some binary operations on a stream opened in binary mode"""
     def __init__(self, base_stream, big_endian=False):
         self._base_stream = base_stream
         self._big_endian = big_endian
+        self._structs = _BIG_ENDIAN if big_endian else _LITTLE_ENDIAN
+        # The length of a read-only stream can't change: measured once
+        writable = getattr(base_stream, "writable", None)
+        self._fixed_length = not (writable is not None and writable())
+        self._length = None
 
     # Comment functions
 
@@ -19,10 +109,11 @@ class _BinaryStream:
 
     def bytes_available(self):
         position = self._base_stream.tell()
-        self._base_stream.seek(0, 2)
-        eof = self._base_stream.tell()
-        self._base_stream.seek(position, 0)
-        return eof - position
+        if self._length is None or not self._fixed_length:
+            self._base_stream.seek(0, 2)
+            self._length = self._base_stream.tell()
+            self._base_stream.seek(position, 0)
+        return self._length - position
 
     # Write functions
 
@@ -74,11 +165,7 @@ class _BinaryStream:
         self._pack(str(length) + 's', value)
 
     def _pack(self, fmt, data):
-        if self._big_endian:
-            fmt = ">" + fmt
-        else:
-            fmt = "<" + fmt
-        return self.write_bytes(pack(fmt, data))
+        return self.write_bytes(_get_struct(self._structs.prefix + fmt).pack(data))
 
     # Read functions
 
@@ -100,49 +187,211 @@ class _BinaryStream:
             return False
 
     def read_char(self):
-        return self._unpack('b')
+        return self._structs.char.unpack(self._base_stream.read(1))[0]
 
     def read_uchar(self):
-        return self._unpack('B')
+        return self._structs.uchar.unpack(self._base_stream.read(1))[0]
 
     def read_bool(self):
-        return self._unpack('?')
+        return self._structs.bool.unpack(self._base_stream.read(1))[0]
 
     def read_int16(self):
-        return self._unpack('h', 2)
+        return self._structs.int16.unpack(self._base_stream.read(2))[0]
 
     def read_uint16(self):
-        return self._unpack('H', 2)
+        return self._structs.uint16.unpack(self._base_stream.read(2))[0]
 
     def read_int32(self):
-        return self._unpack('i', 4)
+        return self._structs.int32.unpack(self._base_stream.read(4))[0]
 
     def read_uint32(self):
-        return self._unpack('I', 4)
+        return self._structs.uint32.unpack(self._base_stream.read(4))[0]
 
     def read_int64(self):
-        return self._unpack('q', 8)
+        return self._structs.int64.unpack(self._base_stream.read(8))[0]
 
     def read_uint64(self):
-        return self._unpack('Q', 8)
+        return self._structs.uint64.unpack(self._base_stream.read(8))[0]
 
     def read_float(self):
-        return self._unpack('f', 4)
+        return self._structs.float.unpack(self._base_stream.read(4))[0]
 
     def read_double(self):
-        return self._unpack('d', 8)
+        return self._structs.double.unpack(self._base_stream.read(8))[0]
 
     def read_string(self):
         length = self.read_uint16()
-        return self._unpack(str(length) + 's', length)
+        return self.read_string_bytes(length)
 
     def read_string_bytes(self, length):
-        return self._unpack(str(length) + 's', length)
+        string = self._base_stream.read(length)
+        if len(string) != length:
+            raise error("unpack requires a buffer of %d bytes" % length)
+        return string
+
+    # Bulk reads: one read and one conversion for `count` values
+
+    def read_array(self, typecode, count):
+        """array of `count` values of a struct typecode (b, B, h, H, i, I, q, Q, f, d)"""
+        size = _get_struct(typecode).size
+        return _read_array(self._base_stream.read(count * size), typecode,
+                           count, self._structs.swap)
+
+    def read_int16_array(self, count):
+        return self.read_array("h", count)
+
+    def read_uint16_array(self, count):
+        return self.read_array("H", count)
+
+    def read_int32_array(self, count):
+        return self.read_array("i", count)
+
+    def read_uint32_array(self, count):
+        return self.read_array("I", count)
+
+    def read_double_array(self, count):
+        return self.read_array("d", count)
 
     def _unpack(self, fmt, length=1):
         bytes = self.read_bytes(length)
-        if self._big_endian:
-            fmt = ">" + fmt
+        return _get_struct(self._structs.prefix + fmt).unpack(bytes)[0]
+
+
+class _BufferStream:
+    """Read-only _BinaryStream over an in-memory buffer (bytes, bytearray,
+    memoryview or mmap): values are decoded in place with unpack_from and
+    the position is a plain cursor, no stream call per read"""
+    def __init__(self, data, big_endian=False):
+        self._data = data
+        self._big_endian = big_endian
+        self._structs = _BIG_ENDIAN if big_endian else _LITTLE_ENDIAN
+        self._pos = 0
+        self._length = len(data)
+
+    @classmethod
+    def from_stream(cls, stream, big_endian=False, use_mmap=True):
+        """Whole content of a stream, memory-mapped when it is a regular file"""
+        if use_mmap:
+            try:
+                data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, OSError, ValueError):
+                data = None
+            if data is not None:
+                return cls(data, big_endian)
+        stream.seek(0)
+        return cls(stream.read(), big_endian)
+
+    def data(self):
+        return self._data
+
+    def position(self, value=None):
+        if value is None:
+            return self._pos
         else:
-            fmt = "<" + fmt
-        return unpack(fmt, bytes)[0]
+            self._pos = value
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._length
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def bytes_available(self):
+        return self._length - self._pos
+
+    def read_byte(self):
+        return self.read_bytes(1)
+
+    def read_bytes(self, length=None):
+        start = self._pos
+        if length is None:
+            end = self._length
+        else:
+            end = min(start + length, self._length)
+        self._pos = end
+        return bytes(self._data[start:end])
+
+    def read(self, length=None):
+        return self.read_bytes(length)
+
+    def _read_struct(self, compiled):
+        pos = self._pos
+        value = compiled.unpack_from(self._data, pos)[0]
+        self._pos = pos + compiled.size
+        return value
+
+    def read_char(self):
+        return self._read_struct(self._structs.char)
+
+    def read_uchar(self):
+        return self._read_struct(self._structs.uchar)
+
+    def read_bool(self):
+        return self._read_struct(self._structs.bool)
+
+    def read_int16(self):
+        return self._read_struct(self._structs.int16)
+
+    def read_uint16(self):
+        return self._read_struct(self._structs.uint16)
+
+    def read_int32(self):
+        return self._read_struct(self._structs.int32)
+
+    def read_uint32(self):
+        return self._read_struct(self._structs.uint32)
+
+    def read_int64(self):
+        return self._read_struct(self._structs.int64)
+
+    def read_uint64(self):
+        return self._read_struct(self._structs.uint64)
+
+    def read_float(self):
+        return self._read_struct(self._structs.float)
+
+    def read_double(self):
+        return self._read_struct(self._structs.double)
+
+    def read_string(self):
+        return self.read_string_bytes(self._read_struct(self._structs.uint16))
+
+    def read_string_bytes(self, length):
+        start = self._pos
+        end = start + length
+        if end > self._length:
+            raise error("unpack requires a buffer of %d bytes" % length)
+        self._pos = end
+        return bytes(self._data[start:end])
+
+    def read_array(self, typecode, count):
+        """array of `count` values of a struct typecode (b, B, h, H, i, I, q, Q, f, d)"""
+        start = self._pos
+        end = start + count * _get_struct(typecode).size
+        if end > self._length:
+            raise error("unpack requires a buffer of %d bytes" % (end - start))
+        self._pos = end
+        return _read_array(self._data[start:end], typecode, count, self._structs.swap)
+
+    def read_int16_array(self, count):
+        return self.read_array("h", count)
+
+    def read_uint16_array(self, count):
+        return self.read_array("H", count)
+
+    def read_int32_array(self, count):
+        return self.read_array("i", count)
+
+    def read_uint32_array(self, count):
+        return self.read_array("I", count)
+
+    def read_double_array(self, count):
+        return self.read_array("d", count)
+
+    def _unpack(self, fmt, length=1):
+        return self._read_struct(_get_struct(self._structs.prefix + fmt))
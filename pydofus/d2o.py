@@ -1,8 +1,17 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-from ._binarystream import _BinaryStream
+from ._binarystream import _BufferStream
 from collections import OrderedDict
+from struct import Struct
+
+_INT32 = Struct(">i")
+_UINT32 = Struct(">I")
+_UINT16 = Struct(">H")
+_DOUBLE = Struct(">d")
+
+# Class id written in place of a null object reference
+NULL_OBJECT_ID = -1431655766
 
 # Exceptions
 
@@ -25,31 +34,33 @@ class D2OReader:
         self._stream_start_index = 7
         self._classes = OrderedDict()
         self._counter = 0
+        self._index = OrderedDict()
 
-        # Load the D2O
-        D2O_file_binary = _BinaryStream(self._stream, True)
+        # Load the D2O (memory-mapped when the stream is a file)
+        D2O_file_binary = _BufferStream.from_stream(self._stream, True)
         self._D2O_file_binary = D2O_file_binary
+        self._data = D2O_file_binary.data()
 
         string_header = D2O_file_binary.read_bytes(3)
         base_offset = 0
         if string_header != b'D2O':
-            self._stream.seek(0)
+            D2O_file_binary.seek(0)
             string_header = D2O_file_binary.read_string()
-            if string_header != "AKSF":
+            if string_header != b"AKSF":
                 raise InvalidD2OFile("Malformated game data file.")
-            D2O_file_binary.read_short()
+            D2O_file_binary.read_int16()
             base_offset = D2O_file_binary.read_int32()
-            self._stream.seek(base_offset, 1)
-            self._stream_start_index = self._stream.position + 7
+            D2O_file_binary.seek(base_offset, 1)
+            self._stream_start_index = D2O_file_binary.position() + 7
             string_header = D2O_file_binary.read_bytes(3)
             if string_header != b'D2O':
                 raise InvalidD2OFile("Malformated game data file.")
 
         offset = D2O_file_binary.read_int32()
-        self._stream.seek(base_offset + offset)
+        D2O_file_binary.seek(base_offset + offset)
         index_number = D2O_file_binary.read_int32()
         index = 0
-        index_dict = OrderedDict()
+        index_dict = self._index
 
         while index < index_number:
             index_id = D2O_file_binary.read_int32()
@@ -66,6 +77,7 @@ class D2OReader:
             self._read_class_definition(class_id, D2O_file_binary)
             class_index += 1
 
+        self._game_data_processor = None
         if D2O_file_binary.bytes_available():
             self._game_data_processor = _GameDataProcess(D2O_file_binary)
 
@@ -74,16 +86,71 @@ class D2OReader:
             return None
         counter = self._counter
         classes = self._classes
-        D2O_file_binary = self._D2O_file_binary
-        D2O_file_binary.position(self._stream_start_index)
+        data = self._data
+        unpack_class_id = _INT32.unpack_from
+        position = self._stream_start_index
         objects = list()
         i = 0
         while i < counter:
-            objects.append(
-                classes[D2O_file_binary.read_int32()].read(D2O_file_binary))
+            obj, position = classes[unpack_class_id(data, position)[0]].decode(
+                data, position + 4)
+            objects.append(obj)
             i += 1
         return objects
 
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, object_id):
+        return object_id in self._index
+
+    def iter_ids(self):
+        """Iterate over the object ids, in file order, without decoding anything"""
+        return iter(self._index)
+
+    def get(self, object_id, fields=None):
+        """Decode a single object from its index entry (None if the id is unknown).
+        With `fields`, only these top-level fields are decoded, the others are skipped."""
+        offset = self._index.get(object_id)
+        if offset is None:
+            return None
+        return self._decode_at(self._data, offset, self._fields_set(fields))
+
+    def iter_objects(self, fields=None):
+        """Yield (id, object) pairs in file order, decoding only `fields` if given"""
+        data = self._data
+        fields = self._fields_set(fields)
+        decode_at = self._decode_at
+        for object_id, offset in self._index.items():
+            yield object_id, decode_at(data, offset, fields)
+
+    def queryable_fields(self):
+        """Fields covered by the search index shipped in the file"""
+        if self._game_data_processor is None:
+            return []
+        return list(self._game_data_processor._queryable_field)
+
+    def query(self, field, value):
+        """Ids of the objects whose `field` equals `value` (or contains it, for
+        vector fields), read from the file's search index without decoding any
+        object. `value` can also be a predicate. Returns None if the field is
+        not indexed."""
+        if self._game_data_processor is None:
+            return None
+        return self._game_data_processor.query(self._data, field, value)
+
+    def _decode_at(self, data, offset, fields):
+        class_id = _INT32.unpack_from(data, offset)[0]
+        return self._classes[class_id].decode(data, offset + 4, fields)[0]
+
+    @staticmethod
+    def _fields_set(fields):
+        if fields is None:
+            return None
+        if isinstance(fields, str):
+            fields = (fields,)
+        return frozenset(fields)
+
     def get_class_definition(self, object_id):
         return self._classes[object_id]
 
@@ -108,10 +175,47 @@ class _GameDataClassDefinition:
             class_name.decode('utf-8')
         self._fields = list()
         self._d2o_reader = d2o_reader
+        self._decoders = None
 
     def fields(self):
         return self._fields
 
+    def compiled_fields(self):
+        """[(name, read, skip)] built once from the field types"""
+        if self._decoders is None:
+            classes = self._d2o_reader._classes
+            self._decoders = [
+                (field.name,
+                 _compile_reader(field.type_ids, 0, classes),
+                 _compile_skipper(field.type_ids, 0, classes))
+                for field in self._fields]
+        return self._decoders
+
+    def decode(self, data, pos, fields=None):
+        """Decode an object from a buffer, returns (object, position after it).
+        When `fields` is given, decoding stops once they are all read and the
+        returned position is then meaningless."""
+        obj = OrderedDict()
+        if fields is None:
+            for name, read, skip in self.compiled_fields():
+                obj[name], pos = read(data, pos)
+            return obj, pos
+        remaining = len(fields)
+        for name, read, skip in self.compiled_fields():
+            if name in fields:
+                obj[name], pos = read(data, pos)
+                remaining -= 1
+                if not remaining:
+                    break
+            else:
+                pos = skip(data, pos)
+        return obj, pos
+
+    def skip(self, data, pos):
+        for name, read, skip in self.compiled_fields():
+            pos = skip(data, pos)
+        return pos
+
     def read(self, D2O_file_binary):
         obj = OrderedDict()
         for field in self._fields:
@@ -129,11 +233,14 @@ class _GameDataField:
         self.name = name.decode('utf-8')
         self._inner_read_methods = list()
         self._inner_type_names = list()
+        self._inner_type_ids = list()
         self._d2o_reader = d2o_reader
 
     def read_type(self, D2O_file_binary):
         read_id = D2O_file_binary.read_int32()
         self.read_data = self._get_read_method(read_id, D2O_file_binary)
+        # Field type followed by the element types of nested vectors
+        self.type_ids = [read_id] + self._inner_type_ids
 
     def _get_read_method(self, read_id, D2O_file_binary):
         if read_id == -1:
@@ -150,9 +257,11 @@ class _GameDataField:
             return self._read_unsigned_integer
         elif read_id == -99:
             self._inner_type_names.append(D2O_file_binary.read_string())
+            inner_id = D2O_file_binary.read_int32()
             self._inner_read_methods = [self._get_read_method(
-                D2O_file_binary.read_int32(),
+                inner_id,
                 D2O_file_binary)] + self._inner_read_methods
+            self._inner_type_ids = [inner_id] + self._inner_type_ids
             return self._read_vector
         else:
             if read_id > 0:
@@ -198,6 +307,124 @@ class _GameDataField:
         return obj.read(D2O_file_binary)
 
 
+# Precompiled decoders: functions (data, pos) -> (value, new pos) working on the
+# whole file buffer with unpack_from, no stream calls nor per-value dispatch
+
+_FIXED_SIZES = {-1: 4, -2: 1, -4: 8, -5: 4, -6: 4}
+
+
+def _compile_reader(type_ids, depth, classes):
+    type_id = type_ids[depth]
+    if type_id in (-1, -5):
+        unpack_from = _INT32.unpack_from
+
+        def read(data, pos):
+            return unpack_from(data, pos)[0], pos + 4
+    elif type_id == -2:
+        def read(data, pos):
+            return data[pos] != 0, pos + 1
+    elif type_id == -3:
+        unpack_from = _UINT16.unpack_from
+
+        def read(data, pos):
+            end = pos + 2 + unpack_from(data, pos)[0]
+            return data[pos + 2:end].decode('utf-8'), end
+    elif type_id == -4:
+        unpack_from = _DOUBLE.unpack_from
+
+        def read(data, pos):
+            return unpack_from(data, pos)[0], pos + 8
+    elif type_id == -6:
+        unpack_from = _UINT32.unpack_from
+
+        def read(data, pos):
+            return unpack_from(data, pos)[0], pos + 4
+    elif type_id == -99:
+        return _compile_vector_reader(type_ids, depth, classes)
+    elif type_id > 0:
+        unpack_from = _INT32.unpack_from
+
+        def read(data, pos):
+            class_id = unpack_from(data, pos)[0]
+            if class_id == NULL_OBJECT_ID:
+                return None, pos + 4
+            return classes[class_id].decode(data, pos + 4)
+    else:
+        raise Exception("Unknown type '" + str(type_id) + "'.")
+    return read
+
+
+def _compile_vector_reader(type_ids, depth, classes):
+    unpack_from = _INT32.unpack_from
+    element_id = type_ids[depth + 1]
+    if element_id in (-1, -5, -6, -4):
+        # Vector of fixed-size numbers: a single unpack for the whole vector
+        code = {-1: 'i', -5: 'i', -6: 'I', -4: 'd'}[element_id]
+        size = _FIXED_SIZES[element_id]
+        structs = {}
+
+        def read(data, pos):
+            count = unpack_from(data, pos)[0]
+            pos += 4
+            vector_struct = structs.get(count)
+            if vector_struct is None:
+                vector_struct = structs[count] = Struct(">%d%s" % (count, code))
+            return list(vector_struct.unpack_from(data, pos)), pos + count * size
+        return read
+
+    read_element = _compile_reader(type_ids, depth + 1, classes)
+
+    def read(data, pos):
+        count = unpack_from(data, pos)[0]
+        pos += 4
+        vector = []
+        append = vector.append
+        for _ in range(count):
+            value, pos = read_element(data, pos)
+            append(value)
+        return vector, pos
+    return read
+
+
+def _compile_skipper(type_ids, depth, classes):
+    type_id = type_ids[depth]
+    size = _FIXED_SIZES.get(type_id)
+    if size is not None:
+        def skip(data, pos):
+            return pos + size
+        return skip
+    if type_id == -3:
+        unpack_from = _UINT16.unpack_from
+
+        def skip(data, pos):
+            return pos + 2 + unpack_from(data, pos)[0]
+        return skip
+    unpack_from = _INT32.unpack_from
+    if type_id == -99:
+        element_size = _FIXED_SIZES.get(type_ids[depth + 1])
+        if element_size is not None:
+            def skip(data, pos):
+                return pos + 4 + unpack_from(data, pos)[0] * element_size
+            return skip
+        skip_element = _compile_skipper(type_ids, depth + 1, classes)
+
+        def skip(data, pos):
+            count = unpack_from(data, pos)[0]
+            pos += 4
+            for _ in range(count):
+                pos = skip_element(data, pos)
+            return pos
+        return skip
+    if type_id > 0:
+        def skip(data, pos):
+            class_id = unpack_from(data, pos)[0]
+            if class_id == NULL_OBJECT_ID:
+                return pos + 4
+            return classes[class_id].skip(data, pos + 4)
+        return skip
+    raise Exception("Unknown type '" + str(type_id) + "'.")
+
+
 class _GameDataProcess:
     def __init__(self, D2O_file_binary):
         self._stream = D2O_file_binary
@@ -213,9 +440,46 @@ class _GameDataProcess:
         off = self._stream.position() + length + 4
         while length:
             available = self._stream.bytes_available()
-            string = self._stream.read_string()
+            string = self._stream.read_string().decode('utf-8')
             self._queryable_field.append(string)
             self._search_field_index[string] = self._stream.read_int32() + off
             self._search_field_type[string] = self._stream.read_int32()
             self._search_field_count[string] = self._stream.read_int32()
             length = length - (available - self._stream.bytes_available())
+
+    def query(self, data, field, match):
+        """Scan the sorted (value, ids) entries of a field's index.
+        Entries are: value, byte length of the ids block, ids (int32)"""
+        start = self._search_field_index.get(field)
+        if start is None:
+            return None
+        field_type = self._search_field_type[field]
+        if field_type not in _INDEX_VALUE_READERS:
+            return None
+        read_value = _INDEX_VALUE_READERS[field_type]
+        unpack_int = _INT32.unpack_from
+
+        predicate = match if callable(match) else None
+        # Values are stored in ascending order: an exact numeric match can stop early
+        stop_after = match if predicate is None and field_type != -3 else None
+
+        result = []
+        pos = start
+        for _ in range(self._search_field_count[field]):
+            value, pos = read_value(data, pos)
+            length = unpack_int(data, pos)[0]
+            pos += 4
+            if (predicate(value) if predicate is not None else value == match):
+                count = length // 4
+                result.extend(Struct(">%di" % count).unpack_from(data, pos))
+            elif stop_after is not None and value > stop_after:
+                break
+            pos += length
+        return result
+
+
+# Readers of the values stored in the search index, by field type
+_INDEX_VALUE_READERS = {
+    type_id: _compile_reader([type_id], 0, None)
+    for type_id in (-1, -2, -3, -4, -5, -6)
+}
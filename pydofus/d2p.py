@@ -3,6 +3,10 @@
 
 from ._binarystream import _BinaryStream
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import io
+import mmap
+import os
 
 # Exceptions
 
@@ -37,6 +41,9 @@ class D2PReader:
 
         self._loaded = False
 
+        self._files_view = None
+        self._buffer = None
+
         # Load the D2P
         D2P_file_binary = _BinaryStream(self._stream, True)
 
@@ -125,6 +132,57 @@ class D2PReader:
                                       read_bytes(position["length"]))
 
         self._loaded = True
+        self._files_view = None
+
+    # Lazy access
+
+    def _get_buffer(self):
+        """Archive content without loading it: mmap of the file, or the
+        buffer of an in-memory stream; None if neither is available"""
+        if self._buffer is None:
+            try:
+                self._buffer = memoryview(mmap.mmap(self._stream.fileno(), 0,
+                                                    access=mmap.ACCESS_READ))
+            except (AttributeError, OSError, ValueError):
+                getbuffer = getattr(self._stream, "getbuffer", None)
+                if getbuffer is not None:
+                    self._buffer = getbuffer().toreadonly()
+        return self._buffer
+
+    def __contains__(self, file_name):
+        return file_name in self._files_position
+
+    def names(self):
+        return list(self._files_position)
+
+    def open(self, file_name):
+        """Content of an embedded file as a read-only memoryview slice of the
+        archive (no copy). Raises KeyError for an unknown name."""
+        if self._loaded:
+            return memoryview(self._files[file_name])
+        position = self._files_position[file_name]
+        buffer = self._get_buffer()
+        if buffer is None:
+            self._stream.seek(position["offset"], 0)
+            return memoryview(self._stream.read(position["length"]))
+        return buffer[position["offset"]:position["offset"] + position["length"]]
+
+    def iter_files(self):
+        """Yield (name, memoryview) pairs, one file at a time"""
+        for file_name in self._files_position:
+            yield file_name, self.open(file_name)
+
+    def close(self):
+        """Release the mapping (views returned by open() must not be used afterwards)"""
+        buffer, self._buffer = self._buffer, None
+        if buffer is not None:
+            obj = buffer.obj
+            buffer.release()
+            if isinstance(obj, mmap.mmap):
+                try:
+                    obj.close()
+                except BufferError:
+                    pass # Views still exported: released with them
 
     # Accessors
 
@@ -135,6 +193,9 @@ class D2PReader:
         return self._properties
 
     def _get_files(self):
+        # Built once (and after load()), not on every access
+        if self._files_view is not None:
+            return self._files_view
         to_return = OrderedDict()
         for file_name, position in self._files_position.items():
             object_ = {"position": position}
@@ -142,6 +203,7 @@ class D2PReader:
                 object_["binary"] = self._files[file_name]
             to_return[file_name] = object_
 
+        self._files_view = to_return
         return to_return
 
     def _get_loaded(self):
@@ -232,3 +294,329 @@ class D2PBuilder:
     # Properties
 
     files = property(None, _set_files)
+
+
+class D2PArchiveSet:
+    """Lazy view over a D2P archive and the archives chained through its
+    "link" property (bitmap0.d2p -> bitmap1.d2p -> ...). Files are looked
+    up in chain order and returned as memoryviews of the mapped archives."""
+    def __init__(self, path):
+        self._readers = OrderedDict()
+        self._owner = OrderedDict() # file name -> reader of the first archive holding it
+        self.missing_links = []
+
+        while path is not None and path not in self._readers:
+            stream = open(path, "rb")
+            try:
+                reader = D2PReader(stream, False)
+            except Exception:
+                stream.close()
+                raise
+            self._readers[path] = reader
+            for file_name in reader._files_position:
+                self._owner.setdefault(file_name, reader)
+            path = self._resolve_link(path, reader.properties.get("link"))
+
+    def _resolve_link(self, path, link):
+        if not link:
+            return None
+        directory = os.path.dirname(path)
+        candidate = os.path.join(directory, link)
+        if os.path.exists(candidate):
+            return candidate
+        # Archives renamed with a suffix (bitmap0_2.d2p linking to "bitmap1.d2p")
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if "_" in stem:
+            link_stem, extension = os.path.splitext(link)
+            candidate = os.path.join(directory, link_stem + stem[stem.rindex("_"):] + extension)
+            if os.path.exists(candidate):
+                return candidate
+        self.missing_links.append(link)
+        return None
+
+    def archives(self):
+        return list(self._readers)
+
+    def __contains__(self, file_name):
+        return file_name in self._owner
+
+    def __len__(self):
+        return len(self._owner)
+
+    def names(self):
+        return list(self._owner)
+
+    def open(self, file_name):
+        """Content of a file as a memoryview (KeyError if no archive holds it)"""
+        return self._owner[file_name].open(file_name)
+
+    def iter_files(self):
+        """Yield (name, memoryview) pairs over all the chained archives"""
+        for file_name, reader in self._owner.items():
+            yield file_name, reader.open(file_name)
+
+    def close(self):
+        for reader in self._readers.values():
+            reader.close()
+            reader.stream.close()
+        self._readers.clear()
+        self._owner.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def export_files(path, target_dir, names=None, workers=None, chunk_size=256):
+    """Write the files of a D2P archive (and of its linked archives) to
+    target_dir, spread across `workers` processes (1: in the calling
+    process). Returns the number of files written."""
+    with D2PArchiveSet(path) as archives:
+        if names is None:
+            names = archives.names()
+        tasks = OrderedDict()
+        for file_name in names:
+            _export_target(target_dir, file_name)
+            reader = archives._owner[file_name]
+            position = reader._files_position[file_name]
+            archive_path = reader.stream.name
+            tasks.setdefault(archive_path, []).append(
+                (file_name, position["offset"], position["length"]))
+
+    chunks = [(archive_path, entries[i:i + chunk_size])
+              for archive_path, entries in tasks.items()
+              for i in range(0, len(entries), chunk_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        return sum(_export_chunk(archive_path, entries, target_dir)
+                   for archive_path, entries in chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_export_chunk, archive_path, entries, target_dir)
+                   for archive_path, entries in chunks]
+        return sum(future.result() for future in futures)
+
+
+def _export_target(target_dir, file_name):
+    """Output path of an archived file; names that are absolute or climb
+    out of target_dir with '..' are rejected"""
+    root = os.path.abspath(target_dir)
+    target = os.path.normpath(os.path.join(root, file_name))
+    if os.path.isabs(file_name) or os.path.commonpath([root, target]) != root \
+            or target == root:
+        raise ValueError("Archived file name escapes the target directory: %r"
+                         % (file_name,))
+    return target
+
+
+def _export_chunk(archive_path, entries, target_dir):
+    written = 0
+    with open(archive_path, "rb") as stream:
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for file_name, offset, length in entries:
+                target = _export_target(target_dir, file_name)
+                directory = os.path.dirname(target)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(target, "wb") as output:
+                    output.write(data[offset:offset + length])
+                written += 1
+    return written
+
+
+class D2PAppender:
+    """Update a D2P archive in place: new or changed files, then the index,
+    properties and 24-byte trailer, are appended after the current trailer.
+    The cost is proportional to the change, and the archive always ends
+    with a valid trailer: an interrupted commit leaves the previous content
+    readable. Space left by replaced or removed files and by former indexes
+    is reclaimed by compact()."""
+    def __init__(self, path):
+        self._path = path
+        self._pending = OrderedDict()
+        self._removed = set()
+        self._properties_changed = False
+        self._open()
+
+    def _open(self):
+        # Unbuffered: a failed write leaves nothing to be flushed later
+        self._stream = open(self._path, "r+b", buffering=0)
+        try:
+            reader = self._load_index()
+        except Exception:
+            self._stream.close()
+            raise
+        self._properties = OrderedDict(reader.properties)
+
+    def _load_index(self):
+        """File positions as stored in the archive (pending changes kept)"""
+        self._stream.seek(0)
+        reader = D2PReader(self._stream, False)
+        self._base_offset = reader._base_offset
+        self._indexes_offset = reader._indexes_offset
+        self._files_position = OrderedDict(
+            (file_name, dict(position))
+            for file_name, position in reader._files_position.items())
+        return reader
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self._stream.write(view):]
+
+    def _sync(self):
+        os.fsync(self._stream.fileno())
+
+    # Changes
+
+    def write_file(self, file_name, data):
+        """Add or replace a file; identical content is not rewritten"""
+        data = bytes(data)
+        position = self._files_position.get(file_name)
+        if position is not None and file_name not in self._pending \
+                and position["length"] == len(data):
+            self._stream.seek(position["offset"])
+            if self._stream.read(position["length"]) == data:
+                return False
+        self._pending[file_name] = data
+        self._removed.discard(file_name)
+        return True
+
+    def remove_file(self, file_name):
+        if self._pending.pop(file_name, None) is None \
+                and file_name not in self._files_position:
+            raise KeyError(file_name)
+        if file_name in self._files_position:
+            self._removed.add(file_name)
+
+    def set_property(self, property_type, property_value):
+        if property_value is None:
+            self._properties.pop(property_type, None)
+        else:
+            self._properties[property_type] = property_value
+        self._properties_changed = True
+
+    def has_changes(self):
+        return bool(self._pending or self._removed or self._properties_changed)
+
+    def wasted_bytes(self):
+        """Bytes of the data area no longer referenced by the index"""
+        live = sum(position["length"] for position in self._files_position.values())
+        return self._indexes_offset - self._base_offset - live
+
+    # Writing
+
+    def commit(self):
+        """Write the pending changes, returns the number of bytes written"""
+        if not self.has_changes():
+            return 0
+        for file_name in self._removed:
+            self._files_position.pop(file_name, None)
+        for file_name in self._pending:
+            self._files_position.pop(file_name, None)
+
+        # Everything is appended after the current trailer, which stays the
+        # last 24 bytes of the file until the new tail is complete: a copy of
+        # it is first written at the future end of file (it still points to
+        # the former index, left untouched), then the gap is filled and the
+        # copy finally replaced by the new trailer.
+        stream = self._stream
+        stream.seek(0, 2)
+        write_at = stream.tell()
+        stream.seek(write_at - 24)
+        old_trailer = stream.read(24)
+
+        offset = write_at
+        for file_name, data in self._pending.items():
+            self._files_position[file_name] = {"offset": offset, "length": len(data)}
+            offset += len(data)
+        tail = self._tail_bytes(offset, self._base_offset, self._files_position, self._properties)
+        end = offset + len(tail)
+
+        try:
+            stream.seek(end - 24)
+            self._write(old_trailer)
+            self._sync()
+            stream.seek(write_at)
+            for data in self._pending.values():
+                self._write(data)
+            self._write(tail[:-24])
+            self._sync()
+            self._write(tail[-24:])
+            self._sync()
+        except BaseException:
+            # Disk full, interruption...: back to the previous archive
+            try:
+                stream.truncate(write_at)
+            except OSError:
+                pass
+            self._load_index()
+            raise
+        written = end - write_at
+
+        self._indexes_offset = offset
+        self._pending = OrderedDict()
+        self._removed = set()
+        self._properties_changed = False
+        return written
+
+    @staticmethod
+    def _tail_bytes(indexes_offset, base_offset, files_position, properties):
+        """Index, properties and trailer, to be written at indexes_offset"""
+        buffer = io.BytesIO()
+        binary = _BinaryStream(buffer, True)
+        for file_name, position in files_position.items():
+            binary.write_string(file_name.encode())
+            binary.write_int32(position["offset"] - base_offset)
+            binary.write_int32(position["length"])
+        properties_offset = indexes_offset + buffer.tell()
+        for property_type, property_value in properties.items():
+            binary.write_string(property_type.encode())
+            binary.write_string(property_value.encode())
+
+        binary.write_uint32(base_offset)
+        binary.write_uint32(indexes_offset - base_offset)
+        binary.write_uint32(indexes_offset)
+        binary.write_uint32(len(files_position))
+        binary.write_uint32(properties_offset)
+        binary.write_uint32(len(properties))
+        return buffer.getvalue()
+
+    def compact(self):
+        """Rewrite the archive with only the live files, contiguous.
+        Pending changes are committed first. Returns the bytes reclaimed."""
+        self.commit()
+        size_before = os.path.getsize(self._path)
+        tmp_path = self._path + ".tmp"
+        files_position = OrderedDict()
+        with open(tmp_path, "wb") as target:
+            binary = _BinaryStream(target, True)
+            binary.write_bytes(b"\x02\x01")
+            base_offset = target.tell()
+            for file_name, position in self._files_position.items():
+                self._stream.seek(position["offset"])
+                files_position[file_name] = {"offset": target.tell(), "length": position["length"]}
+                binary.write_bytes(self._stream.read(position["length"]))
+            target.write(self._tail_bytes(target.tell(), base_offset, files_position, self._properties))
+            target.flush()
+            os.fsync(target.fileno())
+
+        self._stream.close()
+        os.replace(tmp_path, self._path)
+        self._open()
+        return size_before - os.path.getsize(self._path)
+
+    def close(self, commit=True):
+        if commit:
+            self.commit()
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(commit=exc_type is None)
+        return False
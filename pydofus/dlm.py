@@ -1,8 +1,8 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import zlib, tempfile, io
-from ._binarystream import _BinaryStream
+import zlib, io
+from ._binarystream import _BinaryStream, _BufferStream, _inflate, _xor_bytes
 from collections import OrderedDict
 
 
@@ -13,40 +13,45 @@ class InvalidDLMFile(Exception):
 
 
 class DLM:
-    def __init__(self, stream, key=None):
+    def __init__(self, stream, key=None, chunk_size=None):
         if key == None:
             raise InvalidDLMFile("Map decryption key is empty.")
 
         self._stream = stream
         self._key = key
+        # Inflate by chunks of this size (zlib.decompressobj) instead of at once
+        self._chunk_size = chunk_size
+        self._memory = OrderedDict()
 
     def read(self):
-        dlm_uncompressed = tempfile.TemporaryFile()
-        dlm_uncompressed.write(zlib.decompress(self._stream.read()))
-        dlm_uncompressed.seek(0)
+        data, compressed_size = _inflate(self._stream, self._chunk_size)
 
-        DLM_file_binary = _BinaryStream(dlm_uncompressed, True)
+        DLM_file_binary = _BufferStream(data, True)
 
         map = Map(DLM_file_binary, self._key)
         map.read()
 
-        dlm_uncompressed.close()
+        self._memory = OrderedDict()
+        self._memory["compressed"] = compressed_size
+        self._memory["uncompressed"] = len(data)
+        self._memory["decrypted"] = map.decrypted_size()
 
         return map.getObj()
 
+    def memory_usage(self):
+        """Bytes held in memory by the last read: compressed input, inflated
+        map and decrypted payload"""
+        return self._memory
+
     def write(self, obj):
-        buffer = tempfile.TemporaryFile()
+        buffer = io.BytesIO()
         buffer_stream = _BinaryStream(buffer, True)
 
         map = Map(buffer_stream, self._key)
         map.setObj(obj)
         map.write()
 
-        buffer.seek(0)
-
-        self._stream.write(zlib.compress(buffer.read()))
-
-        buffer.close()
+        self._stream.write(zlib.compress(buffer.getbuffer()))
 
 
 class Map:
@@ -59,10 +64,14 @@ class Map:
         self.bottomArrowCell = []
         self.leftArrowCell = []
         self.rightArrowCell = []
+        self._decrypted_size = 0
 
     def raw(self):
         return self._raw
 
+    def decrypted_size(self):
+        return self._decrypted_size
+
     def read(self):
         self._obj["header"] = self.raw().read_char()
         self._obj["mapVersion"] = self.raw().read_char()
@@ -75,12 +84,9 @@ class Map:
 
             if self._obj["encrypted"]:
                 self.encryptedData = self.raw().read_bytes(self.dataLen)
-                decryptedData = bytearray()
-                for i in range(0, self.dataLen):
-                    decryptedData.append(self.encryptedData[i] ^ ord(self._key[i % len(self._key)]))
-
-                cleanData = io.BytesIO(decryptedData)
-                self._raw = _BinaryStream(cleanData, True)
+                decryptedData = _xor_bytes(self.encryptedData, self._key)
+                self._decrypted_size = len(decryptedData)
+                self._raw = _BufferStream(decryptedData, True)
 
         self._obj["relativeId"] = self.raw().read_uint32()
         self._obj["mapType"] = self.raw().read_char()
@@ -218,9 +224,7 @@ class Map:
             self.raw().write_bool(self._obj["encrypted"])
             self.raw().write_char(self._obj["encryptionVersion"])
             self.raw().write_int32(len(cleanData.getbuffer())) # TODO: check len with getBuffer
-            encryptedData = input_stram.read_bytes()
-            for i in range(0, len(cleanData.getbuffer())):
-                self.raw().write_uchar(encryptedData[i] ^ ord(self._key[i % len(self._key)][0]))
+            self.raw().write_bytes(_xor_bytes(input_stram.read_bytes(), self._key))
         else:
             self.raw().write_bytes(input_stram.read_bytes())
 
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Bulk decoding of the maps (DLM) of a D2P archive across a process pool.
+
+Each worker opens the archive itself, decodes a chunk of maps and writes one
+row of integers per map into a shared memory block, so only the row numbers
+of failed maps travel back through the pool. The result is a columnar
+summary instead of the nested OrderedDicts of DLM.read().
+"""
+
+import io
+import os
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .d2p import D2PReader
+from .dlm import DLM
+
+COLUMNS = ("map_id", "map_version", "subarea_id", "layers", "cells",
+           "walkable_cells", "elements", "interactive_elements")
+
+# Maps per work unit: large enough to amortize the task overhead
+DEFAULT_CHUNK_SIZE = 64
+
+_ROW_SIZE = len(COLUMNS) * 8
+
+
+def summarize_map(obj):
+    """Summary row of a decoded map (DLM.read() output), in COLUMNS order"""
+    cell_ids = set()
+    elements = 0
+    interactive = 0
+    for layer in obj["layers"]:
+        for cell in layer["cells"]:
+            if cell["elementsCount"]:
+                cell_ids.add(cell["cellId"])
+            for element in cell["elements"]:
+                if element["elementName"] == "Graphical":
+                    elements += 1
+                    if element["identifier"]:
+                        interactive += 1
+    walkable = sum(1 for cell in obj["cells"] if cell.get("mov"))
+    return (obj["mapId"], obj["mapVersion"], obj["subareaId"],
+            obj["layersCount"], len(cell_ids), walkable, elements, interactive)
+
+
+class MapSummary:
+    """Columnar summary of a map set: one array('q') per column, row i
+    describing the map stored under names[i]"""
+    def __init__(self, names, columns, errors):
+        self.names = names
+        self.columns = columns
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def rows(self):
+        """Yield (name, OrderedDict row) pairs, failed maps excluded"""
+        failed = set(name for name, _ in self.errors)
+        for i, name in enumerate(self.names):
+            if name in failed:
+                continue
+            yield name, OrderedDict(
+                (column, values[i]) for column, values in self.columns.items())
+
+
+def list_maps(d2p_path):
+    """[(name, offset, length)] of the .dlm files of an archive"""
+    with open(d2p_path, "rb") as stream:
+        reader = D2PReader(stream, False)
+        return [(name, specs["position"]["offset"], specs["position"]["length"])
+                for name, specs in reader.files.items()
+                if name.endswith(".dlm")]
+
+
+def decode_maps(d2p_path, key, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Decode every map of a D2P archive and return a MapSummary.
+    `workers` processes are used (os.cpu_count() by default, 1 decodes in
+    the calling process)."""
+    maps = list_maps(d2p_path)
+    names = [name for name, _, _ in maps]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    tasks = [(row, offset, length)
+             for row, (_, offset, length) in enumerate(maps)]
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(len(maps), 1) * _ROW_SIZE)
+    try:
+        failures = []
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                failures.extend(_decode_into(shm.buf, d2p_path, key, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_decode_chunk, d2p_path, key, shm.name, chunk)
+                           for chunk in chunks]
+                for future in futures:
+                    failures.extend(future.result())
+
+        rows = shm.buf.cast("q")
+        try:
+            width = len(COLUMNS)
+            columns = OrderedDict()
+            for index, column in enumerate(COLUMNS):
+                columns[column] = array("q", rows[index:len(maps) * width:width])
+        finally:
+            rows.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    errors = [(names[row], message) for row, message in sorted(failures)]
+    return MapSummary(names, columns, errors)
+
+
+def _decode_chunk(d2p_path, key, shm_name, tasks):
+    """Worker: decode a chunk of maps into their rows of the shared block.
+    Returns [(row, error message)] for the maps that could not be decoded."""
+    # Pool processes share the parent's resource tracker: the block stays
+    # registered once and is unlinked by the parent only
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _decode_into(shm.buf, d2p_path, key, tasks)
+    finally:
+        shm.close()
+
+
+def _decode_into(buffer, d2p_path, key, tasks):
+    rows = buffer.cast("q")
+    failures = []
+    width = len(COLUMNS)
+    try:
+        with open(d2p_path, "rb") as stream:
+            for row, offset, length in tasks:
+                stream.seek(offset)
+                try:
+                    summary = summarize_map(DLM(io.BytesIO(stream.read(length)), key).read())
+                except Exception as e:
+                    failures.append((row, str(e) or e.__class__.__name__))
+                    continue
+                rows[row * width:(row + 1) * width] = array("q", summary)
+    finally:
+        rows.release()
+    return failures
@@ -1,8 +1,7 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import zlib, tempfile, io
-from ._binarystream import _BinaryStream
+from ._binarystream import _BufferStream, _inflate
 from collections import OrderedDict
 
 class InvalidELEFile(Exception):
@@ -11,23 +10,31 @@ class InvalidELEFile(Exception):
         self.message = message
 
 class ELE:
-    def __init__(self, stream):
+    def __init__(self, stream, chunk_size=None):
         self._stream = stream
+        # Inflate by chunks of this size (zlib.decompressobj) instead of at
+        # once, to avoid holding the whole compressed file for huge elements files
+        self._chunk_size = chunk_size
+        self._memory = OrderedDict()
 
     def read(self):
-        ele_uncompressed = tempfile.TemporaryFile()
-        ele_uncompressed.write(zlib.decompress(self._stream.read()))
-        ele_uncompressed.seek(0)
+        data, compressed_size = _inflate(self._stream, self._chunk_size)
 
-        raw = _BinaryStream(ele_uncompressed, True)
+        raw = _BufferStream(data, True)
 
         ele = Element(raw)
         ele.read()
 
-        ele_uncompressed.close()
+        self._memory = OrderedDict()
+        self._memory["compressed"] = compressed_size
+        self._memory["uncompressed"] = len(data)
 
         return ele.get_dict()
 
+    def memory_usage(self):
+        """Bytes held in memory by the last read: compressed input and inflated file"""
+        return self._memory
+
 
 class Element:
     def __init__(self, raw):
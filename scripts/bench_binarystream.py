@@ -0,0 +1,102 @@
+"""
+Benchmark of pydofus binary reads: full D2O decodes through the per-field
+readers, first on the previous _BinaryStream (format string built at each
+read) then on _BufferStream, against get_objects() and its compiled decoders.
+
+Usage: python scripts/bench_binarystream.py [file.d2o ...]
+"""
+import os
+import sys
+import time
+from struct import unpack
+
+# Add project root to path to allow importing pydofus
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from pydofus._binarystream import _BinaryStream
+from pydofus.d2o import D2OReader
+
+DEFAULT_FILES = ["Items.d2o", "Recipes.d2o", "ItemSets.d2o"]
+COMMON_DIR = os.path.join(os.path.dirname(__file__), '..', 'dofus_data', 'common')
+REPEAT = 5
+
+
+class _LegacyBinaryStream(_BinaryStream):
+    """Former implementation: format string built and parsed at each read, three seeks per bytes_available"""
+    def bytes_available(self):
+        position = self._base_stream.tell()
+        self._base_stream.seek(0, 2)
+        eof = self._base_stream.tell()
+        self._base_stream.seek(position, 0)
+        return eof - position
+
+    def read_bool(self):
+        return self._unpack('?')
+
+    def read_uint16(self):
+        return self._unpack('H', 2)
+
+    def read_int32(self):
+        return self._unpack('i', 4)
+
+    def read_uint32(self):
+        return self._unpack('I', 4)
+
+    def read_double(self):
+        return self._unpack('d', 8)
+
+    def read_string(self):
+        length = self.read_uint16()
+        return self._unpack(str(length) + 's', length)
+
+    def _unpack(self, fmt, length=1):
+        bytes = self.read_bytes(length)
+        if self._big_endian:
+            fmt = ">" + fmt
+        else:
+            fmt = "<" + fmt
+        return unpack(fmt, bytes)[0]
+
+
+def best_of(func):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(path):
+    with open(path, "rb") as f:
+        reader = D2OReader(f)
+        legacy_file = open(path, "rb")
+        legacy = _LegacyBinaryStream(legacy_file, True)
+        buffered = reader._D2O_file_binary
+
+        def decode_fields(stream):
+            # Former get_objects(): one read_* call per value
+            stream.position(reader._stream_start_index)
+            for _ in range(len(reader)):
+                reader.get_class_definition(stream.read_int32()).read(stream)
+
+        t_legacy = best_of(lambda: decode_fields(legacy))
+        t_buffered = best_of(lambda: decode_fields(buffered))
+        t_compiled = best_of(reader.get_objects)
+        legacy_file.close()
+
+    name = os.path.basename(path)
+    print(f"\n--- {name}: {len(reader)} objects, {os.path.getsize(path) / 1024:.0f} KB ---")
+    print(f"field readers, legacy _BinaryStream : {t_legacy * 1000:8.1f} ms")
+    print(f"field readers, _BufferStream        : {t_buffered * 1000:8.1f} ms  (x{t_legacy / t_buffered:.1f})")
+    print(f"get_objects, compiled decoders      : {t_compiled * 1000:8.1f} ms  (x{t_legacy / t_compiled:.1f})")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [os.path.join(COMMON_DIR, name) for name in DEFAULT_FILES]
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"File not found: {path}")
+            continue
+        bench(path)
@@ -0,0 +1,119 @@
+"""
+Benchmark of pydofus.dlm_bulk.decode_maps on a synthetic map archive, from
+1 to N worker processes.
+
+Usage: python scripts/bench_dlm_bulk.py [map count] [max workers]
+"""
+import io
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+
+# Add project root to path to allow importing pydofus
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from pydofus.d2p import D2PBuilder
+from pydofus.dlm import DLM
+from pydofus.dlm_bulk import decode_maps, summarize_map
+
+KEY = "649ae451ca33ec53bbcbcc33becf15f4"
+MAP_VERSION = 11
+CELLS_COUNT = 560
+
+
+def synthetic_map(map_id, rng):
+    """Compressed and encrypted DLM (version 11) with random layers and cells"""
+    body = bytearray()
+
+    def put(fmt, *values):
+        body.extend(struct.pack(">" + fmt, *values))
+
+    put("Ibi", 1, 1, 1000 + map_id % 50)  # relativeId, mapType, subareaId
+    for _ in range(4):
+        put("i", map_id + rng.randint(-5, 5))  # Neighbours
+    put("IiI", 0, 0, 0)  # shadowBonusOnEntities, background and grid colors
+    put("Hhhi", 100, 0, 0, 0)  # Zoom, tacticalModeTemplateId
+    for count in (rng.randint(0, 2), rng.randint(0, 2)):  # Background / foreground fixtures
+        put("b", count)
+        for _ in range(count):
+            put("ihhhhhbbbB", rng.randint(1, 9999), 0, 0, 0, 100, 100, 0, 0, 0, 255)
+    put("ii", 0, rng.randint(0, 1 << 30))  # Unknown, groundCRC
+
+    layers = rng.randint(1, 3)
+    put("b", layers)
+    for layer in range(layers):
+        cells = rng.randint(10, 120)
+        put("bh", layer, cells)
+        for _ in range(cells):
+            elements = rng.randint(1, 4)
+            put("hh", rng.randint(0, CELLS_COUNT - 1), elements)
+            for _ in range(elements):
+                identifier = rng.randint(1, 500000) if rng.random() < 0.05 else 0
+                put("bIbbbbbbhhbI", 2, rng.randint(1, 60000), 0, 0, 0, 0, 0, 0, 0, 0, 0, identifier)
+
+    for _ in range(CELLS_COUNT):
+        flags = rng.randint(0, 0x1FFF)
+        put("bhbbB", rng.choice([0, 0, 1]), flags, 0, 0, 0)
+        mov = not flags & 1
+        farm = bool(flags & 128)
+        if mov and not farm:  # Linked zone
+            put("B", 0)
+
+    key = KEY.encode()
+    encrypted = bytes(value ^ key[i % len(key)] for i, value in enumerate(body))
+    header = struct.pack(">bbI?bi", 77, MAP_VERSION, map_id, True, 1, len(encrypted))
+    return zlib.compress(header + encrypted)
+
+
+class _Template:
+    """Minimal D2PBuilder template: files and properties"""
+    def __init__(self, files):
+        self.files = files
+        self._properties = OrderedDict()
+
+
+def build_archive(path, count, seed=1):
+    rng = random.Random(seed)
+    files = OrderedDict()
+    for i in range(count):
+        map_id = 100000 + i
+        files["%d/%d.dlm" % (map_id % 10, map_id)] = {"binary": synthetic_map(map_id, rng)}
+    with open(path, "wb") as target:
+        D2PBuilder(_Template(files), target).build()
+    return files
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "maps.d2p")
+        files = build_archive(path, count)
+        print(f"Synthetic archive: {count} maps, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        # Parity with DLM.read() on a sample
+        summary = decode_maps(path, KEY, workers=1)
+        sample = list(files.items())[:50]
+        expected = [summarize_map(DLM(io.BytesIO(specs["binary"]), KEY).read()) for _, specs in sample]
+        rows = [tuple(row.values()) for _, row in list(summary.rows())[:50]]
+        print(f"Parity on {len(sample)} maps: {'OK' if rows == expected else 'MISMATCH'}, {len(summary.errors)} error(s)")
+
+        worker_counts = [1]
+        while worker_counts[-1] * 2 < max_workers:
+            worker_counts.append(worker_counts[-1] * 2)
+        if max_workers > 1:
+            worker_counts.append(max_workers)
+
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            decode_maps(path, KEY, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:2d} worker(s): {elapsed:6.2f}s  ({count / elapsed:,.0f} maps/s, x{baseline / elapsed:.1f})")
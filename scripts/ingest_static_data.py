@@ -109,7 +109,8 @@ def sync_recipes(conn, i18n_texts, dry_run=False):
     # Load Items D2O for fallback info
     print("Loading Items.d2o...")
     items_reader = D2OReader(open(items_path, "rb"))
-    items_dict = {item['id']: item for item in items_reader.get_objects()}
+    # Random access through the D2O index: only the needed fields are decoded
+    item_fields = ("nameId", "iconId", "level")
     
     print("Loading Recipes.d2o...")
     recipes_reader = D2OReader(open(recipes_path, "rb"))
@@ -139,11 +140,11 @@ def sync_recipes(conn, i18n_texts, dry_run=False):
             return ankama_to_db_id[ankama_id]
             
         # Case B: Not mapped, need to find or create
-        if ankama_id not in items_dict:
+        item_data = items_reader.get(ankama_id, fields=item_fields)
+        if item_data is None:
             # Item doesn't exist in D2O? Can't create it.
             return None
             
-        item_data = items_dict[ankama_id]
         name_id = item_data.get('nameId')
         item_name = i18n_texts.get(name_id)
         
@@ -202,7 +203,7 @@ def sync_recipes(conn, i18n_texts, dry_run=False):
         job_id = recipe['jobId']
         
         # Get level from item (Recipe level = Item level)
-        item_data = items_dict.get(result_ankama_id)
+        item_data = items_reader.get(result_ankama_id, fields=item_fields)
         level = item_data.get('level', 1) if item_data else 1
 
         # Resolve Result Item
@@ -0,0 +1,84 @@
+import sys
+import os
+import random
+import time
+
+# Add project root to path to allow importing core
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core import anomaly_filter
+from core.anomaly_filter import AnomalyFilter, pack_price_lists
+
+if anomaly_filter.np is None:
+    print("NumPy n'est pas installé : seul le chemin scalaire est disponible.")
+    sys.exit(0)
+
+
+def random_snapshot(rng):
+    """Snapshot brut aléatoire (lots x1/x10/x100/x1000), avec trous, bruit MAX_INT et valeurs aberrantes."""
+    base = rng.choice([1, 5, 80, 1500, 25000, 400000, 3000000])
+    prices = []
+    for _ in range(rng.randint(0, 12)):
+        for lot in (1, 10, 100, 1000):
+            roll = rng.random()
+            if roll < 0.2:
+                prices.append(0)
+            elif roll < 0.25:
+                prices.append(2147483647)
+            elif roll < 0.3:
+                prices.append(int(base * lot * rng.choice([0.01, 20, 200])) or 1)
+            else:
+                prices.append(max(1, int(base * lot * rng.uniform(0.5, 1.5))))
+    # Longueur pas forcément multiple de 4
+    if prices and rng.random() < 0.3:
+        prices = prices[:rng.randint(0, len(prices))]
+    return prices
+
+
+def verify_parity(count=20000, seed=1234):
+    print("\n--- Parité filter_prices / filter_prices_batch ---")
+    rng = random.Random(seed)
+    anomaly = AnomalyFilter()
+    snapshots = [random_snapshot(rng) for _ in range(count)]
+    # Cas limites
+    snapshots += [[], [0, 0, 0, 0], [100], [100, 2000], [100, 20000], [100, 1000, 10000], [5, 0, 0, 0, 500]]
+
+    batch = anomaly.filter_prices_many(snapshots)
+    mismatches = 0
+    for prices, (values, average) in zip(snapshots, batch):
+        expected_values, expected_average = anomaly.filter_prices(prices)
+        if values != expected_values or average != expected_average:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"Écart pour {prices}: {expected_values, expected_average} != {values, average}")
+    print(f"{len(snapshots)} snapshots, {mismatches} écart(s)")
+    return mismatches == 0
+
+
+def benchmark(count=100000, seed=42):
+    print("\n--- Débit ---")
+    rng = random.Random(seed)
+    anomaly = AnomalyFilter()
+    snapshots = [random_snapshot(rng) for _ in range(count)]
+
+    start = time.perf_counter()
+    for prices in snapshots:
+        anomaly.filter_prices(prices)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    flat, offsets = pack_price_lists(snapshots)
+    pack = time.perf_counter() - start
+    start = time.perf_counter()
+    anomaly.filter_prices_batch(flat, offsets)
+    vector = time.perf_counter() - start
+
+    print(f"Scalaire   : {scalar:.3f}s ({count / scalar:,.0f} snapshots/s)")
+    print(f"Vectorisé  : {vector:.3f}s ({count / vector:,.0f} snapshots/s) + pack {pack:.3f}s")
+    print(f"Accélération (hors pack) : x{scalar / vector:.1f}")
+
+
+if __name__ == "__main__":
+    ok = verify_parity()
+    benchmark()
+    sys.exit(0 if ok else 1)
@@ -59,6 +59,15 @@ def verify_recipes():
                     print(f"WARNING: Missing expected keys: {missing}")
                 else:
                     print("Structure looks correct.")
+
+                # Search index vs full decode
+                ingredient_id = recipes[0]['ingredientIds'][0]
+                indexed = sorted(reader.query('ingredientIds', ingredient_id) or [])
+                scanned = sorted(recipe_id for recipe_id, recipe in reader.iter_objects(['ingredientIds'])
+                                 if ingredient_id in recipe['ingredientIds'])
+                print(f"Recipes using ingredient {ingredient_id}: {len(indexed)} (index) / {len(scanned)} (scan)")
+                if indexed != scanned:
+                    print("WARNING: Search index and full decode disagree.")
     except Exception as e:
         print(f"Error reading Recipes.d2o: {e}")
 
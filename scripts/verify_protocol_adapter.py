@@ -0,0 +1,163 @@
+import sys
+import os
+import random
+import time
+
+# Add project root to path to allow importing core and labot
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core.protocol_adapter import ProtocolAdapter, ENVELOPE, LABOT, INCOMPLETE, scan_labot_frames
+from labot.data import Data, Msg
+
+SERVER = ("1.2.3.4", 5555, "10.0.0.1", 40000)
+
+
+def varint(value):
+    out = bytearray()
+    while value > 127:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def other_frames(count):
+    """Messages sans définition (seulement comptés par le sniffer)."""
+    return bytes(Msg(6000, Data(b"\x01\x02\x03")).bytes()) * count
+
+
+def labot_stream():
+    """Un message de prix (5752) au milieu de messages sans définition."""
+    data = Data()
+    items = ((289, (120, 1100, 10500)), (421, (15, 140, 1300)))
+    data.writeUnsignedShort(len(items))
+    for gid, prices in items:
+        data.writeVarInt(gid)
+        data.writeInt(0)
+        data.writeUnsignedShort(len(prices))
+        for price in prices:
+            data.writeVarLong(price)
+    return other_frames(3) + bytes(Msg(5752, data).bytes()) + other_frames(3), items
+
+
+def envelope_message():
+    body = b"\x10" + varint(7033) + b"\x1a\x06\x12\x04" + varint(500) + varint(600) + b"\x22\x80\x01" + bytes(128)
+    return b"\x0a\x13type.ankama.com/jcg\x12" + varint(len(body)) + body, body
+
+
+def feed(adapter, flow, payload):
+    """Même routage que SnifferService._handle_packet ; retourne les messages décodés."""
+    decoder = adapter.route(flow, payload)
+    decoder.feed(flow, payload, time.time())
+    if flow.protocol == ENVELOPE:
+        message = decoder.next_message(flow)
+        return [message] if message not in (None, INCOMPLETE) else []
+    decoded = []
+    if flow.protocol == LABOT:
+        for msg in adapter.decoders[LABOT].messages(flow):
+            if msg.msgType:
+                decoded.extend((entry["objectGID"], tuple(entry["prices"]))
+                               for entry in msg.json()["itemTypeDescriptions"])
+    return decoded
+
+
+def verify_labot(segment_size):
+    stream, items = labot_stream()
+    adapter = ProtocolAdapter()
+    flow = adapter.flow(SERVER, False, time.time())
+    decoded = []
+    for i in range(0, len(stream), segment_size):
+        decoded += feed(adapter, flow, stream[i:i + segment_size])
+    # Le trafic suivant : la détection exige plus d'un segment
+    decoded += feed(adapter, flow, other_frames(2))
+    ok = flow.protocol == LABOT and decoded == list(items) and not flow.buffer
+    print(f"[{'OK' if ok else 'FAIL'}] labot, segments de {segment_size} octets: {decoded}")
+    return ok
+
+
+def verify_envelope():
+    message, body = envelope_message()
+    adapter = ProtocolAdapter()
+    flow = adapter.flow(SERVER, False, time.time())
+    # Capture démarrée en cours de session : le premier segment est une suite sans préfixe
+    feed(adapter, flow, message[40:])
+    undecided = flow.protocol is None
+    results = []
+    for start, end in ((0, 40), (40, 100), (100, None)):
+        results += feed(adapter, flow, message[start:end])
+    ok = undecided and flow.protocol == ENVELOPE and results == [(b"jcg", body)]
+    print(f"[{'OK' if ok else 'FAIL'}] enveloppe, premier segment sans préfixe: {undecided}")
+    return ok
+
+
+def verify_envelope_override():
+    """Un flux attribué à tort à labot repasse en enveloppe au premier préfixe."""
+    message, body = envelope_message()
+    adapter = ProtocolAdapter()
+    flow = adapter.flow(SERVER, False, time.time())
+    flow.protocol = LABOT
+    results = feed(adapter, flow, message[:60]) + feed(adapter, flow, message[60:])
+    ok = flow.protocol == ENVELOPE and results == [(b"jcg", body)]
+    print(f"[{'OK' if ok else 'FAIL'}] flux labot basculé en enveloppe par le préfixe")
+    return ok
+
+
+def verify_random_segments(flows=300, segments=5, seed=1):
+    """Des suites d'enveloppe (octets quelconques) ne doivent jamais passer pour du labot."""
+    rng = random.Random(seed)
+    message, body = envelope_message()
+    locked = 0
+    recovered = 0
+    for _ in range(flows):
+        adapter = ProtocolAdapter()
+        flow = adapter.flow(SERVER, False, time.time())
+        for _ in range(segments):
+            feed(adapter, flow, rng.randbytes(rng.randint(20, 1460)))
+        locked += flow.protocol == LABOT
+        recovered += feed(adapter, flow, message) == [(b"jcg", body)]
+    ok = locked == 0 and recovered == flows
+    print(f"[{'OK' if ok else 'FAIL'}] segments aléatoires: {locked}/{flows} flux pris pour du labot, "
+          f"{recovered}/{flows} messages d'enveloppe décodés ensuite")
+    return ok
+
+
+def verify_detection():
+    stream, _ = labot_stream()
+    message, _ = envelope_message()
+    checks = [
+        (scan_labot_frames(stream), (len(stream), 7, 1)),
+        (scan_labot_frames(stream[:20])[1:], (3, 0)),
+        (scan_labot_frames(b"\x00\x00ab"), None),
+    ]
+    ok = all(got == expected for got, expected in checks)
+    print(f"[{'OK' if ok else 'FAIL'}] trames: {[got for got, _ in checks]}")
+    return ok
+
+
+def bench_labot(messages=20000, segment_size=1460):
+    stream, _ = labot_stream()
+    stream *= messages // 7
+    adapter = ProtocolAdapter()
+    flow = adapter.flow(SERVER, False, time.time())
+    count = 0
+    start = time.perf_counter()
+    for i in range(0, len(stream), segment_size):
+        payload = stream[i:i + segment_size]
+        decoder = adapter.route(flow, payload)
+        decoder.feed(flow, payload, time.time())
+        if flow.protocol != LABOT:
+            continue
+        for msg in adapter.decoders[LABOT].messages(flow):
+            if msg.msgType:
+                msg.json()
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"labot: {count} messages, {len(stream) / 1e6:.1f} Mo en {elapsed * 1000:.0f} ms "
+          f"({len(stream) / 1e6 / elapsed:.1f} Mo/s)")
+
+
+if __name__ == "__main__":
+    results = [verify_detection(), verify_envelope(), verify_envelope_override(), verify_random_segments()]
+    results += [verify_labot(size) for size in (7, 64, 1460)]
+    bench_labot()
+    sys.exit(0 if all(results) else 1)
@@ -2,37 +2,44 @@ import customtkinter as ctk
 import threading
 import sys
 import os
-import time
 import webbrowser
 from tkinter import messagebox
 from PIL import Image, ImageTk
 from ui.overlay import OverlayWindow
+from ui.update_bus import UIUpdateBus
 from core.sniffer_service import SnifferService
 from core.game_data import game_data
+from core.learning_queue import PendingLearningStore
+from core.observation_store import observation_store
 from network.uploader import BatchUploader
+from network.async_core import network_core
+from core.metrics import metrics
+from core.tracing import tracer
 from network.profiles_client import profiles_client
 from utils.config import config_manager, DOFUS_SERVERS
 from core.updater import UpdateManager
 from core.constants import APP_NAME, VERSION, UPDATE_URL
 
+# Rafraîchissement de l'interface (~30 Hz) et taille maximale de la console
+UI_REFRESH_MS = 33
+MAX_CONSOLE_LINES = 1000
+# Rafraîchissement du panneau de métriques
+METRICS_REFRESH_MS = 1000
+
 class ConsoleRedirector:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
+    """Redirige stdout vers le bus : le texte est inséré dans la console par le thread Tk."""
+    def __init__(self, ui_bus):
+        self.ui_bus = ui_bus
 
     def write(self, str):
-        try:
-            self.text_widget.configure(state="normal")
-            self.text_widget.insert("end", str)
-            self.text_widget.see("end")
-            self.text_widget.configure(state="disabled")
-        except:
-            pass
+        if str:
+            self.ui_bus.post_text(str)
 
     def flush(self):
         pass
 
 class CenteredInputDialog(ctk.CTkToplevel):
-    def __init__(self, parent, title, text, prices=None, strict_mode=False):
+    def __init__(self, parent, title, text, prices=None, strict_mode=False, on_created=None):
         super().__init__(parent)
         self.title(title)
         
@@ -55,6 +62,7 @@ class CenteredInputDialog(ctk.CTkToplevel):
         self.resizable(False, False)
         
         self.result = None
+        self.auto_resolved = False # Fermé par le programme (nom trouvé en arrière-plan)
         
         if strict_mode:
             self.attributes("-topmost", True)
@@ -100,6 +108,8 @@ class CenteredInputDialog(ctk.CTkToplevel):
         
         self.transient(parent)
         self.grab_set()
+        if on_created:
+            on_created(self)
         self.wait_window(self)
         
     def on_ok(self, event=None):
@@ -146,7 +156,8 @@ class MainWindow(ctk.CTk):
             print(f"Could not load icon: {e}")
         
         self.sniffer = None
-        self.uploader = BatchUploader()
+        self.ui_bus = UIUpdateBus()
+        self.uploader = BatchUploader(on_ack=self.on_upload_ack)
         self.overlay = None
         self.session_count = 0
         
@@ -157,16 +168,18 @@ class MainWindow(ctk.CTk):
         # Lancer la vérification des mises à jour après 1 seconde
         self.after(1000, self.check_updates)
         
-        # Queue for unknown items
-        self.unknown_items_queue = []
+        # Items inconnus en attente d'identification (dédupliqués par GID)
+        self.pending_items = PendingLearningStore(game_data, on_resolved=self.on_item_auto_resolved)
         self.is_asking_name = False
+        self.current_dialog = None
         
         self.create_widgets()
         
         # Redirect stdout to log console
-        sys.stdout = ConsoleRedirector(self.log_console)
+        sys.stdout = ConsoleRedirector(self.ui_bus)
+        self.after(UI_REFRESH_MS, self._drain_ui_bus)
         
-        # Start uploader thread
+        # Start uploader (coroutine on the network core)
         self.uploader.start()
         
         # Handle window closing
@@ -210,7 +223,7 @@ class MainWindow(ctk.CTk):
         self.refresh_profiles_btn.grid(row=0, column=4, padx=(0, 10), pady=5)
         
         # Load profiles in background
-        threading.Thread(target=self._load_profiles_async, daemon=True).start()
+        network_core.run_in_lane("background", self._load_profiles_async)
         
         # Overlay Mode
         self.overlay_label = ctk.CTkLabel(self.config_frame, text="Overlay:")
@@ -234,6 +247,14 @@ class MainWindow(ctk.CTk):
         self.disable_upload_var = ctk.BooleanVar(value=config_manager.get("disable_upload", False))
         self.disable_upload_check = ctk.CTkCheckBox(self.config_frame, text="Désactiver l'envoi (Debug)", variable=self.disable_upload_var, command=self.on_disable_upload_change)
         self.disable_upload_check.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+        # Traces de performance (profilage)
+        self.trace_var = ctk.BooleanVar(value=config_manager.get("trace_enabled", False))
+        self.trace_check = ctk.CTkCheckBox(self.config_frame, text="Traces de performance", variable=self.trace_var, command=self.on_trace_change)
+        self.trace_check.grid(row=5, column=1, padx=10, pady=5, sticky="w")
+
+        self.trace_export_btn = ctk.CTkButton(self.config_frame, text="Profiler + exporter", width=150, command=self.profile_and_export)
+        self.trace_export_btn.grid(row=5, column=3, padx=10, pady=5, sticky="w")
         
         # API Token (Hidden/Hardcoded)
         # self.token_label = ctk.CTkLabel(self.config_frame, text="API Token:")
@@ -276,6 +297,10 @@ class MainWindow(ctk.CTk):
         self.lbl_session_count = ctk.CTkLabel(self.info_frame, text="Total session: 0", font=("Roboto", 12))
         self.lbl_session_count.grid(row=0, column=2, padx=10, pady=5, sticky="e")
 
+        # Statistiques du pipeline (visibles seulement si "metrics_enabled")
+        self.lbl_metrics = ctk.CTkLabel(self.info_frame, text="", font=("Consolas", 11), justify="left", anchor="w")
+        self.after(METRICS_REFRESH_MS, self._refresh_metrics_panel)
+
         # --- Logs ---
         self.log_frame = ctk.CTkFrame(self)
         self.log_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
@@ -312,7 +337,7 @@ class MainWindow(ctk.CTk):
     def refresh_profiles(self):
         """Rafraîchit la liste des profils depuis le backend."""
         print("Rafraîchissement des profils...")
-        threading.Thread(target=self._load_profiles_async, daemon=True).start()
+        network_core.run_in_lane("background", self._load_profiles_async)
     
     def _load_profiles_async(self):
         """Charge les profils de manière asynchrone."""
@@ -321,7 +346,7 @@ class MainWindow(ctk.CTk):
             if names:
                 self.profile_names = ["(Aucun)"] + names
                 # Mettre à jour le combo dans le thread principal
-                self.after(0, self._update_profile_combo)
+                self.ui_bus.post_call(self._update_profile_combo)
                 print(f"Profils chargés: {len(names)} disponibles")
             else:
                 print("Aucun profil trouvé ou erreur de connexion")
@@ -360,6 +385,35 @@ class MainWindow(ctk.CTk):
         config_manager.set("disable_upload", val)
         print(f"Désactivation upload changée pour : {val}")
 
+    def on_trace_change(self):
+        val = self.trace_var.get()
+        config_manager.set("trace_enabled", val)
+        print(f"Traces de performance : {'activées' if val else 'désactivées'}")
+
+    def profile_and_export(self):
+        """Active les traces, profile les threads de capture pendant N secondes puis exporte la trace."""
+        seconds = config_manager.get("trace_profile_seconds", 10)
+        if not tracer.enabled:
+            self.trace_var.set(True)
+            self.on_trace_change()
+        threads = [self.sniffer] if self.sniffer and self.sniffer.is_alive() else None
+        if not tracer.start_profiler(seconds, threads=threads):
+            print("Un profilage est déjà en cours.")
+            return
+        self.trace_export_btn.configure(state="disabled")
+        print(f"Profilage en cours ({seconds} s)...")
+
+        def _export():
+            tracer.profiler.join()
+            try:
+                path = tracer.export_chrome_trace()
+                print(f"Trace enregistrée : {os.path.abspath(path)} (à ouvrir dans chrome://tracing ou ui.perfetto.dev)")
+            except Exception as e:
+                print(f"Erreur export trace: {e}")
+            self.ui_bus.post_call(lambda: self.trace_export_btn.configure(state="normal"))
+
+        threading.Thread(target=_export, daemon=True).start()
+
     def _update_overlay_visibility(self):
         mode = config_manager.get("overlay_mode", "Auto")
         should_show = False
@@ -411,17 +465,11 @@ class MainWindow(ctk.CTk):
         print(f"[Banque] Contenu reçu: {item_count} items")
         
         # Afficher la notification sur l'overlay (thread-safe)
-        self.after(0, lambda: self._show_bank_overlay(item_count))
+        self.ui_bus.post_call(lambda: self._show_bank_overlay(item_count))
         
-        # Upload async via le BatchUploader
+        # Upload async via le BatchUploader (voie "upload" du cœur réseau, sans bloquer le sniffer)
         if self.uploader:
-            # Run in a separate thread to avoid blocking sniffer
-            import threading
-            threading.Thread(
-                target=self.uploader.upload_bank_content, 
-                args=(bank_items,),
-                daemon=True
-            ).start()
+            network_core.run_in_lane("upload", self.uploader.upload_bank_content, bank_items)
     
     def _show_bank_overlay(self, item_count):
         """Affiche la notification banque sur l'overlay (appelé depuis le thread principal)."""
@@ -429,70 +477,111 @@ class MainWindow(ctk.CTk):
             self.overlay.show_bank_notification(item_count)
 
     def on_unknown_item(self, gid, prices):
-        # This runs in sniffer thread. We need to ask main thread.
-        # Add to queue and schedule processing
-        self.unknown_items_queue.append((gid, prices))
-        self.after(0, self._process_unknown_item_queue)
+        # This runs in sniffer thread. A GID already pending only merges its prices.
+        if self.pending_items.add(gid, prices):
+            self.ui_bus.post_call(self._process_unknown_item_queue)
         
         # Return None immediately to unblock sniffer
         return None
 
+    def on_item_auto_resolved(self, gid, name, samples):
+        # Runs in the resolver thread: the name was found before the user answered
+        self.ui_bus.post_call(lambda: self._apply_auto_resolved(gid, name, samples))
+
+    def _apply_auto_resolved(self, gid, name, samples):
+        game_data.known_items[str(gid)] = name
+        print(f"Item {gid} identifié automatiquement : {name}")
+
+        if self.current_dialog and self.current_dialog.gid == gid and self.current_dialog.winfo_exists():
+            self.current_dialog.auto_resolved = True
+            self.current_dialog.on_cancel()
+
+        timestamp, prices = samples[-1]
+        self._emit_learned_observation(gid, name, prices, timestamp)
+
     def _process_unknown_item_queue(self):
         if self.is_asking_name:
             return
             
-        if not self.unknown_items_queue:
+        entry = self.pending_items.next_pending()
+        if not entry:
             return
             
         self.is_asking_name = True
-        gid, prices = self.unknown_items_queue.pop(0)
-        self._ask_item_name(gid, prices)
+        self._ask_item_name(entry)
+
+    def _ask_item_name(self, entry):
+        gid = entry["gid"]
+        _, prices = entry["samples"][-1]
+        text = f"Item inconnu détecté (GID: {gid}).\nEntrez le nom de l'objet :"
+        if entry["count"] > 1:
+            text = f"Item inconnu détecté (GID: {gid}, vu {entry['count']} fois).\nEntrez le nom de l'objet :"
+
+        def register(dialog):
+            dialog.gid = gid
+            self.current_dialog = dialog
 
-    def _ask_item_name(self, gid, prices):
         # Show dialog
         strict_mode = self.strict_popup_var.get()
-        dialog = CenteredInputDialog(self, text=f"Item inconnu détecté (GID: {gid}).\nEntrez le nom de l'objet :", title="Item Inconnu", prices=prices, strict_mode=strict_mode)
+        dialog = CenteredInputDialog(self, text=text, title="Item Inconnu", prices=list(prices), strict_mode=strict_mode, on_created=register)
+        self.current_dialog = None
         name = dialog.result
         
-        if name and name.strip():
+        if dialog.auto_resolved:
+            pass
+        elif name and name.strip():
             clean_name = name.strip()
-            # Save it immediately
-            game_data.save_user_item(gid, clean_name)
-            print(f"Item {gid} identifié comme : {clean_name}")
-            
-            # Process the observation now that we have the name
-            try:
-                # Re-use filter logic from sniffer (accessing via self.sniffer if available)
-                if self.sniffer:
-                    # Determine processing strategy based on item type
-                    is_equipment = game_data.is_equipment(gid)
-                    category = game_data.get_item_category(gid)
-                    if not category:
-                        category = "Catégorie Inconnue"
-
-                    if is_equipment:
-                        average = min(prices)
-                    else:
-                        filtered_prices, average = self.sniffer.filter.filter_prices(prices)
-                    
-                    if average > 0:
-                        observation = {
-                            "gid": gid,
-                            "name": clean_name,
-                            "category": category,
-                            "prices": prices,
-                            "average_price": average,
-                            "timestamp": int(time.time() * 1000)
-                        }
-                        
-                        self.on_observation(observation)
-            except Exception as e:
-                print(f"Erreur lors du traitement post-identification : {e}")
+            # Latest prices merged while the dialog was open (None if resolved in the meantime)
+            samples = self.pending_items.resolve(gid)
+            if samples is not None:
+                # Save it immediately
+                game_data.save_user_item(gid, clean_name)
+                print(f"Item {gid} identifié comme : {clean_name}")
+
+                # Process the observation now that we have the name
+                timestamp, prices = samples[-1]
+                self._emit_learned_observation(gid, clean_name, prices, timestamp)
+        else:
+            self.pending_items.discard(gid)
             
         self.is_asking_name = False
         # Process next item if any
         self.after(100, self._process_unknown_item_queue)
 
+    def _emit_learned_observation(self, gid, name, prices, timestamp):
+        """Construit et envoie l'observation d'un item qui vient d'être identifié."""
+        try:
+            # Re-use filter logic from sniffer (accessing via self.sniffer if available)
+            if not self.sniffer:
+                return
+
+            # Determine processing strategy based on item type
+            is_equipment = game_data.is_equipment(gid)
+            category = game_data.get_item_category(gid)
+            if not category:
+                category = "Catégorie Inconnue"
+
+            if is_equipment:
+                valid_prices = [p for p in prices if p > 0]
+                average = min(valid_prices) if valid_prices else 0
+            else:
+                filtered_prices, average = self.sniffer.filter.filter_prices(prices)
+            
+            if average > 0:
+                observation = {
+                    "gid": gid,
+                    "name": name,
+                    "category": category,
+                    "prices": prices,
+                    "average_price": average,
+                    "timestamp": timestamp
+                }
+
+                observation_store.add(config_manager.get("server"), observation)
+                self.on_observation(observation)
+        except Exception as e:
+            print(f"Erreur lors du traitement post-identification : {e}")
+
     def on_sniffer_error(self, error_msg):
         self.stop_sniffer()
         print(f"ERREUR CRITIQUE: {error_msg}")
@@ -527,8 +616,8 @@ class MainWindow(ctk.CTk):
             self.overlay.withdraw()
 
     def on_observation(self, obs):
-        # This runs in the sniffer thread, so we need to schedule UI updates
-        self.after(0, lambda: self._update_ui_with_obs(obs))
+        # This runs in the sniffer thread: UI updates go through the bus
+        self.ui_bus.post_observation(obs)
         
         # Add to upload queue if not disabled
         if not config_manager.get("disable_upload", False):
@@ -536,18 +625,94 @@ class MainWindow(ctk.CTk):
         else:
             print(f"[DEBUG] Upload désactivé, observation ignorée : {obs['name']} (GID: {obs['gid']})")
 
-    def _update_ui_with_obs(self, obs):
-        category = obs.get('category', 'Inconnue')
-        print(f"[OBS] {obs['name']} (GID: {obs['gid']}) ({category}) - Moy: {obs['average_price']} k")
-        
-        # Update Session Info
-        self.session_count += 1
+    def on_upload_ack(self, batch, latency):
+        # Appelé depuis le thread de l'uploader quand le backend a confirmé un lot
+        self.ui_bus.post_call(lambda: self._show_upload_ack(latency))
+
+    def _show_upload_ack(self, latency):
+        if self.overlay:
+            self.overlay.show_upload_ack(latency["count"], latency["max"])
+
+    def _drain_ui_bus(self):
+        """Applique en une fois toutes les mises à jour produites depuis le dernier passage."""
+        # Replanifié d'abord : un appel peut ouvrir un dialogue modal (boucle d'événements imbriquée)
+        self.after(UI_REFRESH_MS, self._drain_ui_bus)
+
+        text, observations, calls = self.ui_bus.drain()
+
+        for obs in observations:
+            category = obs.get('category', 'Inconnue')
+            text += f"[OBS] {obs['name']} (GID: {obs['gid']}) ({category}) - Moy: {obs['average_price']} k\n"
+
+        if text:
+            self._append_console(text)
+        if observations:
+            self._update_ui_with_obs(observations[-1], len(observations))
+        for call in calls:
+            try:
+                call()
+            except Exception as e:
+                print(f"Erreur mise à jour UI: {e}")
+
+    def _refresh_metrics_panel(self):
+        """Résumé des métriques du pipeline, rafraîchi chaque seconde."""
+        self.after(METRICS_REFRESH_MS, self._refresh_metrics_panel)
+        if not metrics.enabled:
+            if self.lbl_metrics.winfo_ismapped():
+                self.lbl_metrics.grid_remove()
+            return
+
+        snapshot = metrics.snapshot()
+
+        def total(name, *labels):
+            values = snapshot.get(name, {})
+            if labels:
+                return sum(value for key, value in values.items() if key[:len(labels)] == labels)
+            return sum(values.values())
+
+        lookups = total("tracker_game_data_name_lookups_total")
+        cached = total("tracker_game_data_name_lookups_total", "user") + total("tracker_game_data_name_lookups_total", "known")
+        hit_rate = f"{100 * cached / lookups:.0f}%" if lookups else "-"
+        callback = snapshot.get("tracker_sniffer_callback_seconds", {}).get((), {})
+        upload = snapshot.get("tracker_uploader_request_seconds", {}).get((), {})
+
+        self.lbl_metrics.configure(text=(
+            f"Segments: {total('tracker_sniffer_segments_total')}  "
+            f"Messages: {total('tracker_sniffer_messages_total')}  "
+            f"Obs: {total('tracker_sniffer_observations_total', 'emitted') + total('tracker_sniffer_observations_total', 'suspicious')}  "
+            f"Inconnus: {total('tracker_sniffer_observations_total', 'unknown_item')}  "
+            f"Cache noms: {hit_rate}\n"
+            f"Traitement segment p95: {1000 * callback.get('p95', 0):.1f} ms  "
+            f"Envoi p95: {1000 * upload.get('p95', 0):.0f} ms  "
+            f"File: {total('tracker_uploader_queue_size')}  "
+            f"Envoyées: {total('tracker_uploader_rows_total', 'sent')}  "
+            f"Perdues: {total('tracker_uploader_rows_total', 'failed')}  "
+            f"Images: {total('tracker_asset_worker_icons_total', 'uploaded')}"
+        ))
+        if not self.lbl_metrics.winfo_ismapped():
+            self.lbl_metrics.grid(row=1, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="w")
+
+    def _append_console(self, text):
+        try:
+            self.log_console.configure(state="normal")
+            self.log_console.insert("end", text)
+            line_count = int(self.log_console.index("end-1c").split(".")[0])
+            if line_count > MAX_CONSOLE_LINES:
+                self.log_console.delete("1.0", f"{line_count - MAX_CONSOLE_LINES + 1}.0")
+            self.log_console.see("end")
+            self.log_console.configure(state="disabled")
+        except Exception:
+            pass
+
+    def _update_ui_with_obs(self, obs, count=1):
+        # Update Session Info (only the latest observation of the batch is displayed)
+        self.session_count += count
         self.lbl_last_item.configure(text=f"Dernier item: {obs['name']}")
         self.lbl_last_price.configure(text=f"Prix: {obs['average_price']:,} k".replace(",", " "))
         self.lbl_session_count.configure(text=f"Total session: {self.session_count}")
 
         if self.overlay:
-            self.overlay.update_info(obs['name'], obs['average_price'])
+            self.overlay.update_info(obs['name'], obs['average_price'], count)
     
     def on_close(self):
         upload_queue = self.uploader.get_queue_size()
@@ -606,11 +771,11 @@ class MainWindow(ctk.CTk):
             try:
                 available, remote_version = self.updater.check_for_updates()
                 if available:
-                    self.after(0, lambda: self.show_update_dialog(remote_version))
+                    self.ui_bus.post_call(lambda: self.show_update_dialog(remote_version))
             except Exception as e:
                 print(f"Erreur update: {e}")
 
-        threading.Thread(target=_check, daemon=True).start()
+        network_core.run_in_lane("background", _check)
 
     def show_update_dialog(self, remote_version):
         """Affiche une popup proposant la mise à jour"""
@@ -645,13 +810,13 @@ class MainWindow(ctk.CTk):
 
         def _download():
             def update_progress(p):
-                self.after(0, lambda: progress_bar.set(p))
+                self.ui_bus.post_call(lambda: progress_bar.set(p))
 
             success = self.updater.download_and_install(progress_callback=update_progress)
             
             if not success:
-                self.after(0, lambda: messagebox.showerror("Erreur", "Échec du téléchargement de la mise à jour."))
-                self.after(0, progress_window.destroy)
+                self.ui_bus.post_call(lambda: messagebox.showerror("Erreur", "Échec du téléchargement de la mise à jour."))
+                self.ui_bus.post_call(progress_window.destroy)
 
         threading.Thread(target=_download, daemon=True).start()
 
@@ -664,4 +829,9 @@ class MainWindow(ctk.CTk):
             self.uploader.stop()
         if game_data.asset_worker:
             game_data.asset_worker.stop()
+        observation_store.close()
+        network_core.stop()
+        config_manager.flush()
+        if game_data.journal_entries:
+            game_data.compact_user_items()
         super().destroy()
@@ -30,6 +30,9 @@ class OverlayWindow(ctk.CTkToplevel):
         self.count = 0
         self.label_count = ctk.CTkLabel(self.header_frame, text="Items: 0", font=("Roboto", 10), text_color="gray")
         self.label_count.pack(side="right")
+
+        self.label_ack = ctk.CTkLabel(self.header_frame, text="", font=("Roboto", 10), text_color="gray")
+        self.label_ack.pack(side="right", padx=(0, 8))
         
         # Main Info: Item Name + Price
         self.info_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
@@ -53,12 +56,16 @@ class OverlayWindow(ctk.CTkToplevel):
         )
         self.btn_toggle.pack(fill="x", padx=10, pady=(0, 10))
 
-    def update_info(self, item_name, price):
+    def update_info(self, item_name, price, count=1):
         self.label_item.configure(text=item_name)
         self.label_price.configure(text=f"{price:,} k/u".replace(",", " "), text_color="#4ade80")
-        self.count += 1
+        self.count += count
         self.label_count.configure(text=f"Items: {self.count}")
 
+    def show_upload_ack(self, count, max_latency):
+        """Indique que le dernier lot est bien arrivé sur le backend."""
+        self.label_ack.configure(text=f"✓ {count} envoyés ({max_latency:.1f}s)", text_color="#4ade80")
+
     def show_bank_notification(self, item_count):
         """Affiche une notification temporaire quand la banque est capturée."""
         self.label_item.configure(text=f"📦 Banque capturée")
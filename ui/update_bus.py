@@ -0,0 +1,49 @@
+import queue
+
+# Types de messages transportés par le bus
+TEXT = 0
+OBSERVATION = 1
+CALL = 2
+
+
+class UIUpdateBus:
+    """
+    File thread-safe entre les threads producteurs (sniffer, uploader, workers)
+    et la boucle Tk. Les producteurs ne touchent jamais aux widgets : seul le
+    thread principal vide le bus, périodiquement, et applique les mises à jour en bloc.
+    """
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def post_text(self, text):
+        """Fragment de texte destiné à la console de logs."""
+        self._queue.put((TEXT, text))
+
+    def post_observation(self, obs):
+        """Observation à afficher (seule la plus récente met à jour les labels/l'overlay)."""
+        self._queue.put((OBSERVATION, obs))
+
+    def post_call(self, func):
+        """Fonction à exécuter dans le thread Tk (remplace self.after(0, ...) depuis un autre thread)."""
+        self._queue.put((CALL, func))
+
+    def drain(self, max_items=5000):
+        """
+        Vide le bus. Retourne (texte, observations, appels) :
+        les fragments de texte sont concaténés en une seule chaîne.
+        """
+        texts = []
+        observations = []
+        calls = []
+        for _ in range(max_items):
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == TEXT:
+                texts.append(payload)
+            elif kind == OBSERVATION:
+                observations.append(payload)
+            else:
+                calls.append(payload)
+        return "".join(texts), observations, calls
@@ -1,6 +1,9 @@
+import atexit
 import json
 import os
 import sys
+import threading
+from types import MappingProxyType
 
 def get_app_path():
     """Returns the base path of the application (executable dir or project root)."""
@@ -40,39 +43,173 @@ DEFAULT_CONFIG = {
     "overlay_mode": "Auto",
     "debug_mode": False,
     "disable_upload": False,
+    "ingest_format": "auto", # auto (compact + repli JSON), compact, json
+    "coalesce_window": 30,   # Fenêtre (s) de fusion des doublons (server, gid), 0 = désactivé
+    "coalesce_mode": "latest", # latest (dernière observation) ou merge (max des lots)
+    "upload_batch_min": 10,     # Bornes de la taille de lot adaptative
+    "upload_batch_max": 500,
+    "upload_linger_min": 1.0,   # Bornes (s) de l'attente avant envoi d'un lot incomplet
+    "upload_linger_max": 10.0,
+    "aggregate_window": 3600,   # Durée (s) des fenêtres d'agrégats de quantiles par item
+    "aggregate_upload": False,  # Joindre les agrégats terminés aux lots (format compact uniquement)
+    "bank_delta_upload": False, # Envoyer la banque en patchs (le backend doit accepter mode=delta)
+    "observation_store": True,  # Historique local des observations (dofus_data/observations)
+    "observation_retention_days": 90, # Segments journaliers supprimés au-delà (0 = jamais)
+    "log_levels": {},           # Niveau par catégorie, ex: {"sniffer": "WARNING", "uploader": "DEBUG"}
+    "log_file": None,           # Chemin d'un fichier de logs JSON lines (désactivé si None)
+    "log_rate_period": 5.0,     # Limitation des messages répétitifs : fenêtre (s)...
+    "log_rate_burst": 5,        # ... et nombre de messages identiques autorisés par fenêtre
+    "metrics_enabled": False,   # Compteurs/latences du pipeline (panneau + endpoint Prometheus)
+    "metrics_port": 9464,       # Port local de l'endpoint /metrics (0 = pas d'endpoint)
+    "trace_enabled": False,     # Spans par message (capture → enqueue), exportables en Chrome trace
+    "trace_buffer_size": 20000, # Nombre de spans conservés
+    "trace_profile_seconds": 10, # Durée du profilage par échantillonnage lancé depuis l'interface
     "profile_id": None,      # UUID du profil sélectionné
     "profile_name": None     # Nom du profil pour affichage
 }
 
+# Délai de regroupement des sauvegardes : plusieurs set() rapprochés = une seule écriture
+SAVE_DEBOUNCE_SECONDS = 0.5
+
 class ConfigManager:
+    """
+    Configuration partagée par l'application.
+
+    Les lectures se font sur un instantané immuable (remplacé en bloc à chaque
+    changement), donc sans verrou ni accès disque. Le fichier n'est relu que si
+    son inode, sa date de modification ou sa taille ont changé. Les écritures
+    sont atomiques et regroupées, et les abonnés sont notifiés des changements.
+    """
     def __init__(self):
-        self.config = DEFAULT_CONFIG.copy()
+        self.lock = threading.RLock()
+        self.snapshot = MappingProxyType(DEFAULT_CONFIG.copy())
+        self._file_signature = None
+        self._pending = {} # Modifications locales pas encore écrites sur disque
+        self._save_timer = None
+        self._subscribers = []
         self.load()
         # Force save to ensure config file exists with defaults if it didn't exist
         if not os.path.exists(CONFIG_FILE):
             self.save()
+        atexit.register(self.flush)
+
+    @property
+    def config(self):
+        """Vue en lecture seule de la configuration courante."""
+        return self.snapshot
+
+    def _signature(self):
+        try:
+            st = os.stat(CONFIG_FILE)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
 
     def load(self):
-        if os.path.exists(CONFIG_FILE):
+        """Relit config.json depuis le disque (les modifications locales en attente restent prioritaires)."""
+        signature = self._signature()
+        if signature is None:
+            return
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except Exception as e:
+            print(f"Error loading config: {e}")
+            return
+
+        with self.lock:
+            self._file_signature = signature
+            new_config = dict(self.snapshot)
+            new_config.update(loaded)
+            new_config.update(self._pending)
+            changes = self._publish(new_config)
+        self._notify(changes)
+
+    def reload_if_changed(self):
+        """Relit le fichier uniquement s'il a été modifié depuis la dernière lecture/écriture."""
+        if self._signature() != self._file_signature:
+            self.load()
+            return True
+        return False
+
+    def save(self):
+        """Écrit la configuration de manière atomique (fichier temporaire + os.replace)."""
+        with self.lock:
+            data = dict(self.snapshot)
+            self._pending = {}
+            if self._save_timer:
+                self._save_timer.cancel()
+                self._save_timer = None
+            tmp_path = CONFIG_FILE + ".tmp"
             try:
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                    loaded = json.load(f)
-                    self.config.update(loaded)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4)
+                os.replace(tmp_path, CONFIG_FILE)
+                # Notre propre écriture ne doit pas déclencher de rechargement
+                self._file_signature = self._signature()
             except Exception as e:
-                print(f"Error loading config: {e}")
+                print(f"Error saving config: {e}")
 
-    def save(self):
-        try:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, indent=4)
-        except Exception as e:
-            print(f"Error saving config: {e}")
+    def flush(self):
+        """Écrit immédiatement les modifications en attente, s'il y en a."""
+        with self.lock:
+            if self._pending:
+                self.save()
 
     def get(self, key, default=None):
-        return self.config.get(key, default)
+        return self.snapshot.get(key, default)
 
     def set(self, key, value):
-        self.config[key] = value
-        self.save()
+        with self.lock:
+            if key in self.snapshot and self.snapshot[key] == value:
+                return
+            new_config = dict(self.snapshot)
+            new_config[key] = value
+            self._pending[key] = value
+            changes = self._publish(new_config)
+
+            if self._save_timer:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        self._notify(changes)
+
+    def subscribe(self, callback, keys=None):
+        """
+        Enregistre callback(changes, snapshot), appelé à chaque changement de configuration
+        (set() ou fichier modifié). `keys` limite les notifications à certaines clés.
+        Le callback s'exécute dans le thread à l'origine du changement.
+        """
+        subscription = (callback, frozenset(keys) if keys else None)
+        with self.lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def _publish(self, new_config):
+        """Remplace l'instantané et retourne les clés modifiées (lock acquis)."""
+        old = self.snapshot
+        self.snapshot = MappingProxyType(new_config)
+        return {k: v for k, v in new_config.items() if k not in old or old[k] != v}
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        with self.lock:
+            subscribers = list(self._subscribers)
+        snapshot = self.snapshot
+        for callback, keys in subscribers:
+            relevant = changes if keys is None else {k: v for k, v in changes.items() if k in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant, snapshot)
+            except Exception as e:
+                print(f"Error in config subscriber: {e}")
 
 config_manager = ConfigManager()
@@ -0,0 +1,248 @@
+"""
+Journalisation structurée de l'application, basée sur le module standard logging.
+
+- Une catégorie par composant (sniffer, uploader, asset_worker, game_data...),
+  chacune avec son niveau : logger.debug("GID %s", gid) ne formate rien si le
+  niveau DEBUG est désactivé.
+- Les messages répétitifs (même catégorie + même gabarit) sont limités à
+  `log_rate_burst` par fenêtre de `log_rate_period` secondes.
+- Un tampon circulaire en mémoire garde les derniers enregistrements sans verrou.
+- Une sortie fichier optionnelle au format JSON lines ("log_file").
+"""
+import collections
+import json
+import logging
+import sys
+import threading
+
+from utils.config import config_manager
+
+ROOT_LOGGER = "tracker"
+CATEGORIES = ["sniffer", "parser", "uploader", "asset_worker", "game_data", "ui"]
+RING_BUFFER_SIZE = 2000
+
+
+def get_logger(category):
+    """Retourne le logger d'une catégorie (configure la journalisation au premier appel)."""
+    if not _state["configured"]:
+        setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Laisse passer au plus `burst` messages identiques par fenêtre de `period` secondes.
+    Le nombre de messages supprimés est reporté sur le premier message de la fenêtre suivante.
+    """
+    MAX_KEYS = 1024
+
+    def __init__(self, period=5.0, burst=5):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._windows = {} # (logger, gabarit) -> [début de fenêtre, nombre, supprimés]
+
+    def filter(self, record):
+        # Le même filtre est partagé par plusieurs handlers : décision calculée une seule fois
+        decision = getattr(record, "_rate_decision", None)
+        if decision is None:
+            decision = self._decide(record)
+            record._rate_decision = decision
+        return decision
+
+    def _decide(self, record):
+        key = (record.name, record.msg)
+        now = record.created
+        window = self._windows.get(key)
+
+        if window is None or now - window[0] >= self.period:
+            if len(self._windows) >= self.MAX_KEYS:
+                self._windows.clear()
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            self._windows[key] = [now, 1, 0]
+            return True
+
+        window[1] += 1
+        if window[1] <= self.burst:
+            return True
+        window[2] += 1
+        return False
+
+
+class ConsoleFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("[%(levelname)s] %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (+{suppressed} messages similaires ignorés)"
+        return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement ; les champs passés via extra={"fields": {...}} sont inclus."""
+    def format(self, record):
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "category": record.name.rsplit(".", 1)[-1],
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """Écrit sur le sys.stdout courant (qui peut être redirigé vers l'interface après le démarrage)."""
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Garde les derniers enregistrements dans un deque borné.
+    deque.append / popleft sont atomiques : pas de verrou côté producteur.
+    """
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+
+    def handle(self, record):
+        rv = self.filter(record)
+        if rv:
+            self.records.append(record)
+        return rv
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def drain(self, max_records=None):
+        """Retire et retourne les enregistrements en attente (les plus anciens d'abord)."""
+        drained = []
+        while self.records and (max_records is None or len(drained) < max_records):
+            try:
+                drained.append(self.records.popleft())
+            except IndexError:
+                break
+        return drained
+
+    def snapshot(self):
+        return list(self.records)
+
+
+_state = {
+    "configured": False,
+    "lock": threading.Lock(),
+    "console": None,
+    "ring": None,
+    "file": None,
+    "file_path": None,
+    "rate_limit": None,
+}
+
+
+def setup_logging():
+    """Installe les handlers et applique les niveaux depuis la configuration (idempotent)."""
+    with _state["lock"]:
+        if _state["configured"]:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.propagate = False
+
+        rate_limit = RateLimitFilter(
+            period=config_manager.get("log_rate_period", 5.0),
+            burst=config_manager.get("log_rate_burst", 5)
+        )
+
+        console = ConsoleHandler()
+        console.setFormatter(ConsoleFormatter())
+        console.addFilter(rate_limit)
+        root.addHandler(console)
+
+        ring = RingBufferHandler()
+        ring.addFilter(rate_limit)
+        root.addHandler(ring)
+
+        _state.update(console=console, ring=ring, rate_limit=rate_limit, configured=True)
+
+    apply_config(config_manager.config)
+    config_manager.subscribe(
+        lambda changes, snapshot: apply_config(snapshot),
+        keys=["debug_mode", "log_levels", "log_file", "log_rate_period", "log_rate_burst"]
+    )
+
+
+def apply_config(snapshot):
+    """Applique niveaux, limitation de débit et sortie fichier depuis un instantané de config."""
+    root = logging.getLogger(ROOT_LOGGER)
+    debug_mode = snapshot.get("debug_mode", False)
+    root.setLevel(logging.DEBUG if debug_mode else logging.INFO)
+
+    levels = snapshot.get("log_levels") or {}
+    for category in set(CATEGORIES) | set(levels):
+        level = levels.get(category)
+        logger = logging.getLogger(f"{ROOT_LOGGER}.{category}")
+        # getLevelName renvoie un entier pour un nom connu, sinon "Level X" (Python 3.10+)
+        level_no = logging.getLevelName(str(level).upper()) if level else None
+        if not isinstance(level_no, int):
+            level_no = None
+        if level and level_no is None:
+            root.warning("Niveau de log invalide pour '%s': %r (ignoré)", category, level)
+        if level_no is not None and not debug_mode:
+            logger.setLevel(level_no)
+        else:
+            logger.setLevel(logging.NOTSET) # Hérite du niveau racine
+
+    rate_limit = _state["rate_limit"]
+    if rate_limit:
+        rate_limit.period = snapshot.get("log_rate_period", 5.0)
+        rate_limit.burst = snapshot.get("log_rate_burst", 5)
+
+    _set_log_file(snapshot.get("log_file"))
+
+
+def _set_log_file(path):
+    with _state["lock"]:
+        if path == _state["file_path"]:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        if _state["file"]:
+            root.removeHandler(_state["file"])
+            _state["file"].close()
+            _state["file"] = None
+        _state["file_path"] = path
+        if not path:
+            return
+        try:
+            handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        except Exception as e:
+            print(f"Impossible d'ouvrir le fichier de log {path}: {e}")
+            return
+        handler.setFormatter(JsonLinesFormatter())
+        if _state["rate_limit"]:
+            handler.addFilter(_state["rate_limit"])
+        root.addHandler(handler)
+        _state["file"] = handler
+
+
+def get_ring_buffer():
+    """Tampon circulaire des derniers enregistrements (None avant setup_logging)."""
+    return _state["ring"]